@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+"""Calcfunction to group the distributed q-points into batches with a balanced computational cost."""
+from aiida.engine import calcfunction
+from aiida.orm import Dict, FolderData, Int, KpointsData
+import numpy
+
+from aiida_quantumespresso_ph.utils.cost import estimate_qpoint_costs, get_irreps_from_retrieved, partition_qpoints
+
+
+@calcfunction
+def batch_qpoints(retrieved: FolderData, num_batches: Int, **qpoints):
+    """Group the distributed q-points into a number of batches with a balanced estimated computational cost.
+
+    The cost of each q-point is estimated from the irreducible representations written by the initialization run. Each
+    batch is returned as a single ``KpointsData`` with an explicit list of q-points, such that a single ``ph.x`` run
+    computes all of them.
+
+    :param retrieved: the ``retrieved`` output of the initialization ``PhCalculation``.
+    :param num_batches: the number of batches to create.
+    :param qpoints: the ``KpointsData`` of each q-point as returned by ``distribute_qpoints``, with link labels of the
+        form ``qpoint_N`` where ``N`` is the q-point index. This can be a subset of all the q-points.
+    :return: a dictionary of ``KpointsData`` with link labels of form ``batch_M`` and a ``Dict`` with link label
+        ``batches`` that maps each batch label on the list of indices of the dynamical matrix files of its q-points.
+    """
+    indices = sorted(int(key.split('_')[-1]) for key in qpoints)
+
+    # The q-point labels start at zero, whereas the costs are ordered by the dynamical matrix indices, starting at one
+    costs = estimate_qpoint_costs(indices[-1] + 1, get_irreps_from_retrieved(retrieved))
+    costs = [costs[index] for index in indices]
+    partition = partition_qpoints(costs, num_batches.value)
+
+    results = {}
+    batches = {}
+
+    for number, batch in enumerate(partition, start=1):
+        points = [qpoints[f'qpoint_{indices[index - 1]}'] for index in batch]
+        kpoints = KpointsData()
+        kpoints.set_cell(points[0].cell)
+        kpoints.set_kpoints(numpy.concatenate([point.get_kpoints(cartesian=True) for point in points]), cartesian=True)
+        results[f'batch_{number}'] = kpoints
+        batches[f'batch_{number}'] = [indices[index - 1] + 1 for index in batch]
+
+    results['batches'] = Dict(batches)
+
+    return results
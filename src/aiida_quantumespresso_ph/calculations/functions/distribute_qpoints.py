@@ -7,6 +7,8 @@ from aiida.orm import FolderData, KpointsData
 from aiida.plugins import CalculationFactory
 from numpy import linalg, pi
 
+from aiida_quantumespresso_ph.data.dynamical_matrix import parse_qpoints_file
+
 
 @calcfunction
 def distribute_qpoints(retrieved: FolderData) -> Dict[str, KpointsData]:
@@ -41,12 +43,9 @@ def distribute_qpoints(retrieved: FolderData) -> Dict[str, KpointsData]:
     dynmat_prefix = PhCalculation._OUTPUT_DYNAMICAL_MATRIX_PREFIX  # pylint: disable=protected-access
     dynmat_file = f'{dynmat_prefix}0'
 
-    with retrieved.open(dynmat_file, 'r') as handle:
-        lines = handle.readlines()
-
     try:
-        _ = [float(i) for i in lines[0].split()]
-    except (IndexError, ValueError) as exception:
+        _, coordinates = parse_qpoints_file(retrieved.base.repository.get_object_content(dynmat_file))
+    except ValueError as exception:
         raise ValueError(f'File `{dynmat_file}` does not contain the list of q-points') from exception
 
     cell = structure.cell
@@ -54,10 +53,9 @@ def distribute_qpoints(retrieved: FolderData) -> Dict[str, KpointsData]:
     fact = 2. * pi / alat
 
     # Read q-points, converting them from 2pi/a coordinates to inverse angstrom
-    qpoint_coordinates = [[float(i) * fact for i in j.split()] for j in lines[2:]]
     qpoints = {}
 
-    for index, qpoint_coordinate in enumerate(qpoint_coordinates):
+    for index, qpoint_coordinate in enumerate(coordinates * fact):
         qpoint = KpointsData()
         qpoint.set_cell(cell)
         qpoint.set_kpoints([qpoint_coordinate], cartesian=True)
@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+"""Calcfunction to generate the irreducible q-points of a ``ph.x`` calculation from the symmetries of the crystal."""
+from aiida.engine import calcfunction
+from aiida.orm import Dict, FolderData, KpointsData, StructureData
+from aiida.plugins import CalculationFactory
+from numpy import linalg, pi
+
+from aiida_quantumespresso_ph.data.dynamical_matrix import format_qpoints_file
+from aiida_quantumespresso_ph.utils.qpoints import get_irreducible_qpoints
+
+
+@calcfunction
+def generate_qpoints(parameters: Dict, structure: StructureData, qpoints: KpointsData):
+    """Generate the irreducible q-points of a q-point mesh as they would be computed by ``ph.x``.
+
+    The q-points are returned in the same format as ``distribute_qpoints``. In addition, a ``FolderData`` is returned
+    with the dynamical matrix file that lists the q-points, as written by the initialization run of ``ph.x``.
+
+    :param parameters: the ``output_parameters`` of the ``PwCalculation`` preceding the ``PhCalculation``.
+    :param structure: the structure of the ``PwCalculation``.
+    :param qpoints: a ``KpointsData`` with an unshifted q-point mesh.
+    :return: a dictionary of ``KpointsData`` with link labels of form ``qpoint_N`` where ``N`` is the q-point index,
+        and a ``FolderData`` with link label ``folder`` that contains the list of q-points.
+    """
+    PhCalculation = CalculationFactory('quantumespresso.ph')
+
+    mesh, offset = qpoints.get_kpoints_mesh()
+
+    if any(offset):
+        raise ValueError(f'the q-point mesh should not be shifted, but got offset: {offset}')
+
+    cell = structure.cell
+    coordinates = get_irreducible_qpoints(parameters.get_dict(), cell, mesh)
+    results = {}
+
+    for index, coordinate in enumerate(coordinates):
+        qpoint = KpointsData()
+        qpoint.set_cell(cell)
+        qpoint.set_kpoints([coordinate], cartesian=True)
+        results[f'qpoint_{index}'] = qpoint
+
+    # Write the q-points in units of 2pi/a, as in the file written by ``ph.x``
+    fact = 2. * pi / linalg.norm(cell[0])
+    content = format_qpoints_file(mesh, coordinates / fact)
+
+    dynmat_prefix = PhCalculation._OUTPUT_DYNAMICAL_MATRIX_PREFIX  # pylint: disable=protected-access
+    folder = FolderData()
+    folder.base.repository.put_object_from_bytes(content.encode('utf-8'), f'{dynmat_prefix}0')
+    results['folder'] = folder
+
+    return results
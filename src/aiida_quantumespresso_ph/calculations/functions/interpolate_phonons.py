@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+"""Calcfunction to interpolate the phonon dispersion and density of states without ``q2r.x`` and ``matdyn.x``."""
+from aiida import orm
+from aiida.engine import calcfunction
+from qe_tools import CONSTANTS
+
+from aiida_quantumespresso_ph.data.dynamical_matrix import DynamicalMatrixData
+from aiida_quantumespresso_ph.utils.interpolation import (
+    get_density_of_states,
+    get_force_constants,
+    get_frequencies,
+    get_path_directions,
+    get_smearing,
+)
+
+
+def _get_kpoints(kpoints: orm.KpointsData):
+    """Return the list of k-points in crystal coordinates of an explicit list or a mesh of k-points."""
+    try:
+        return kpoints.get_kpoints()
+    except AttributeError:
+        return kpoints.get_kpoints_mesh(print_list=True)
+
+
+@calcfunction
+def interpolate_phonons(
+    dynamical_matrices: DynamicalMatrixData,
+    kpoints_dispersion: orm.KpointsData,
+    kpoints_dos: orm.KpointsData = None,
+    parameters: orm.Dict = None
+):
+    """Compute the phonon dispersion and optionally the density of states from the dynamical matrices of a q-point grid.
+
+    The outputs are the same as those of the ``MatdynCalculation`` of ``aiida-quantumespresso``: the bands are in THz
+    and the density of states is in states * cm on a grid in cm^-1. The k-points are in crystal coordinates of the cell
+    of the dynamical matrices, as the ``q_in_cryst_coord`` input of ``matdyn.x``.
+
+    :param dynamical_matrices: the ``DynamicalMatrixData`` with the dynamical matrices of all q-points of the grid.
+    :param kpoints_dispersion: the k-points of the phonon dispersion.
+    :param kpoints_dos: optional mesh of k-points on which the density of states is computed.
+    :param parameters: optional ``Dict`` with the ``INPUT`` namelist of ``matdyn.x``, of which only the ``asr``, the
+        ``deltaE`` and the ``degauss`` in cm^-1 are used. The density of states is computed with a Gaussian smearing,
+        which requires a ``degauss`` larger than zero, see ``get_smearing``.
+    :return: dictionary with the ``output_parameters``, the ``output_phonon_bands`` and the ``output_phonon_dos``.
+    """
+    parameters = parameters.get_dict() if parameters is not None else {}
+    asr = parameters.get('INPUT', {}).get('asr', 'no')
+
+    force_constants = get_force_constants(dynamical_matrices, asr=asr)
+    kpoints = _get_kpoints(kpoints_dispersion)
+    frequencies = get_frequencies(force_constants, kpoints, get_path_directions(kpoints))
+
+    bands = orm.BandsData()
+
+    if kpoints_dispersion.base.attributes.get('mesh', None) is None:
+        bands.set_kpointsdata(kpoints_dispersion)
+    else:
+        bands.set_kpoints(kpoints)
+
+    bands.set_bands(frequencies * CONSTANTS.invcm_to_THz, units='THz')
+
+    output_parameters = {
+        'asr': asr,
+        'mesh': dynamical_matrices.mesh,
+        'number_of_kpoints': len(kpoints),
+        'number_of_bands': frequencies.shape[1],
+        'number_of_force_constants': len(force_constants['lattice_vectors']),
+        'non_analytic_correction': 'born_charges' in force_constants,
+    }
+    results = {'output_parameters': orm.Dict(output_parameters), 'output_phonon_bands': bands}
+
+    if kpoints_dos is not None:
+        step, smearing = get_smearing(parameters)
+        frequencies = get_frequencies(force_constants, _get_kpoints(kpoints_dos))
+        grid, density = get_density_of_states(frequencies, step, smearing)
+        dos = orm.XyData()
+        dos.set_x(grid, 'frequency', 'cm^(-1)')
+        dos.set_y(density, 'dos', 'states * cm')
+        results['output_phonon_dos'] = dos
+
+    return results
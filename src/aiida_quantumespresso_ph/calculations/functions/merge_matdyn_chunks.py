@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+"""Calcfunction to merge the phonon frequencies computed by ``matdyn.x`` on chunks of the k-points."""
+from aiida import orm
+from aiida.engine import calcfunction
+import numpy
+from qe_tools import CONSTANTS
+
+from aiida_quantumespresso_ph.utils.interpolation import get_density_of_states, get_smearing
+
+
+def _sort_chunks(kwargs: dict, prefix: str) -> list:
+    """Return the values of the chunks with the given prefix in the order of their number."""
+    keys = sorted((key for key in kwargs if key.startswith(prefix)), key=lambda key: int(key.split('_')[-1]))
+    return [kwargs[key] for key in keys]
+
+
+def _concatenate(bands: dict, prefix: str, overlap: int = 0) -> numpy.ndarray:
+    """Return the bands of the chunks with the given prefix concatenated in the order of their number.
+
+    The first ``overlap`` k-points of each chunk but the first are dropped, since they are those of the previous chunk.
+    """
+    chunks = [chunk.get_bands() for chunk in _sort_chunks(bands, prefix)]
+    return numpy.concatenate(chunks[:1] + [chunk[overlap:] for chunk in chunks[1:]])
+
+
+def _merge_parameters(kwargs: dict, number_of_kpoints: int) -> dict:
+    """Return the output parameters of the first chunk of the dispersion, with the values of all chunks merged.
+
+    The wall times of all chunks are added up, their warnings are collected and the number of k-points is that of the
+    whole dispersion.
+    """
+    chunks = [value.get_dict() for value in _sort_chunks(kwargs, 'output_parameters_dispersion_')]
+    chunks += [value.get_dict() for value in _sort_chunks(kwargs, 'output_parameters_dos_')]
+    result = dict(chunks[0])
+    result['wall_time_seconds'] = sum(chunk.get('wall_time_seconds', 0) for chunk in chunks)
+    result['warnings'] = [warning for chunk in chunks for warning in chunk.get('warnings', [])]
+    result['number_of_kpoints'] = number_of_kpoints
+    return result
+
+
+@calcfunction
+def merge_matdyn_chunks(
+    kpoints_dispersion: orm.KpointsData, parameters: orm.Dict = None, overlap: orm.Int = None, **kwargs
+):
+    """Merge the phonon bands computed by ``MatdynCalculation`` on the chunks of ``split_kpoints``.
+
+    The bands of the chunks of the dispersion are concatenated into the bands of all its k-points. The density of states
+    is computed from the frequencies of the chunks of the DOS mesh, as by ``interpolate_phonons``, with a Gaussian
+    smearing of width ``degauss``, since the tetrahedron method of ``matdyn.x`` requires all the k-points of the mesh in
+    a single run.
+
+    :param kpoints_dispersion: the k-points of the whole dispersion.
+    :param parameters: optional ``Dict`` with the ``INPUT`` namelist of ``matdyn.x``, of which the ``deltaE`` and the
+        ``degauss`` in cm^-1 are used for the density of states.
+    :param overlap: optional number of k-points of the previous chunk with which each chunk of the dispersion but the
+        first starts, see ``split_kpoints``.
+    :param kwargs: the ``output_phonon_bands`` of each chunk, with link labels of the form ``dispersion_N`` for the
+        dispersion and ``dos_N`` for the DOS mesh, where ``N`` is the number of the chunk, and optionally the
+        ``output_parameters`` of each chunk, with link labels of the form ``output_parameters_dispersion_N`` and
+        ``output_parameters_dos_N``.
+    :return: dictionary with the merged ``output_phonon_bands``, the merged ``output_parameters`` if those of the chunks
+        of the dispersion are given and, if there are chunks of the DOS mesh, the ``output_phonon_dos``.
+    """
+    bands = orm.BandsData()
+
+    if kpoints_dispersion.base.attributes.get('mesh', None) is None:
+        bands.set_kpointsdata(kpoints_dispersion)
+    else:
+        bands.set_kpoints(kpoints_dispersion.get_kpoints_mesh(print_list=True))
+
+    bands.set_bands(_concatenate(kwargs, 'dispersion_', overlap.value if overlap is not None else 0), units='THz')
+    results = {'output_phonon_bands': bands}
+
+    if any(key.startswith('output_parameters_dispersion_') for key in kwargs):
+        results['output_parameters'] = orm.Dict(_merge_parameters(kwargs, len(bands.get_kpoints())))
+
+    if any(key.startswith('dos_') for key in kwargs):
+        step, smearing = get_smearing(parameters.get_dict() if parameters is not None else {})
+        frequencies = _concatenate(kwargs, 'dos_') / CONSTANTS.invcm_to_THz
+        grid, density = get_density_of_states(frequencies, step, smearing)
+        dos = orm.XyData()
+        dos.set_x(grid, 'frequency', 'cm^(-1)')
+        dos.set_y(density, 'dos', 'states * cm')
+        results['output_phonon_dos'] = dos
+
+    return results
@@ -2,31 +2,89 @@
 """merge data from mulitple ph runs called by one PhBase."""
 from aiida import orm
 from aiida.engine import calcfunction
+import numpy
 
 
 @calcfunction
-def merge_para_ph_outputs(**kwargs):
-    """Calcfunction to merge outputs from multiple parallelized `ph.x` calculations with different q-points."""
+def merge_para_ph_outputs(batches=None, interrupted_wall_times=None, **kwargs):
+    """Calcfunction to merge outputs from multiple parallelized `ph.x` calculations with different q-points.
 
-    # Get the outputs, sorted by label
-    outputs = [el[1].get_dict() for el in sorted(list(kwargs.items()), key=lambda l: l[0])]
+    The q-points and frequencies of the ``dynamical_matrix_N`` entries of the outputs are not merged into the output
+    parameters, which would store them in the database, but into the arrays of an ``ArrayData``, which are stored in the
+    repository and only loaded when accessed. Its ``indices`` array contains the index of each q-point, its ``q_points``
+    array the q-points in the units of the ``q_points_units`` of the output parameters and its ``frequencies`` array the
+    frequencies of each q-point in the ``frequencies_units``.
 
-    merged = {}
+    :param batches: optional ``Dict`` that maps the keys of outputs that computed a batch of q-points on the list of
+        indices of these q-points. The other keys should be of the form ``output_N`` where ``N`` is the q-point index.
+    :param interrupted_wall_times: optional ``Dict`` with the wall time of the runs that were interrupted before the
+        calculation of an output was recovered, with the same keys as the outputs. It is added to the total wall time.
+    :param kwargs: the ``output_parameters`` of the outputs. The keys of the form ``merged_N`` and
+        ``merged_frequencies_N`` are instead the ``output_parameters`` and ``frequencies`` returned by previous calls
+        for other outputs, such that the outputs can be merged incrementally or hierarchically.
+    :return: dictionary with the merged ``output_parameters`` and the ``frequencies`` of all q-points.
+    """
+    batches = batches.get_dict() if batches is not None else {}
+    interrupted_wall_times = interrupted_wall_times.get_dict() if interrupted_wall_times is not None else {}
 
-    total_walltime = 0
-    number_irreps = []
+    partials = []
 
-    for index, output in enumerate(outputs):
+    for key in [key for key in kwargs if key.startswith('merged_frequencies_')]:
+        number = key.split('_')[-1]
+        partials.append((kwargs.pop(f'merged_{number}'), kwargs.pop(key)))
+
+    # Get the outputs with the indices of the q-points they computed, sorted by the index of the first q-point
+    outputs = [(batches.get(key, [int(key.split('_')[-1])]), value.get_dict()) for key, value in kwargs.items()]
+    outputs.sort(key=lambda item: item[0])
+
+    result = {}
+
+    total_walltime = sum(interrupted_wall_times.values())
+    number_irreps = {}
+    qpoints = {}
+    frequencies = {}
+
+    for partial, partial_frequencies in partials:
+        partial = partial.get_dict()
+        indices = partial_frequencies.get_array('indices').tolist()
+        qpoints.update(zip(indices, partial_frequencies.get_array('q_points')))
+        frequencies.update(zip(indices, partial_frequencies.get_array('frequencies')))
+        number_irreps.update(zip(indices, partial.pop('number_of_irr_representations_for_each_q', [])))
+        total_walltime += partial.pop('wall_time_seconds', 0)
+
+        for number, labels in partial.pop('symmetry_labels', {}).items():
+            result.setdefault('symmetry_labels', {})[number] = labels
+
+        result.update(partial)
+
+    for indices, output in outputs:
 
         total_walltime += output.pop('wall_time_seconds', 0)
-        number_irreps.extend(output.pop('number_of_irr_representations_for_each_q', []))
-        merged[f'dynamical_matrix_{index + 1}'] = output.pop('dynamical_matrix_1')
+
+        for index, irreps in zip(indices, output.pop('number_of_irr_representations_for_each_q', [])):
+            number_irreps[index] = irreps
+
+        for number, index in enumerate(indices, start=1):
+            dynamical_matrix = output.pop(f'dynamical_matrix_{number}')
+            qpoints[index] = dynamical_matrix['q_point']
+            frequencies[index] = [numpy.nan if value is None else value for value in dynamical_matrix['frequencies']]
+            result['q_points_units'] = dynamical_matrix.get('q_point_units', '2pi/lattice_parameter')
+            result['frequencies_units'] = dynamical_matrix.get('frequencies_units', 'cm-1')
+
+        for number, labels in output.pop('symmetry_labels', {}).items():
+            result.setdefault('symmetry_labels', {})[str(indices[int(number) - 1])] = labels
 
         for key, value in output.items():
-            merged[key] = value
+            result[key] = value
+
+    indices = sorted(qpoints)
+    arrays = orm.ArrayData()
+    arrays.set_array('indices', numpy.array(indices, dtype=int))
+    arrays.set_array('q_points', numpy.array([qpoints[index] for index in indices], dtype=float).reshape(-1, 3))
+    arrays.set_array('frequencies', numpy.array([frequencies[index] for index in indices], dtype=float))
 
-    merged['wall_time_seconds'] = total_walltime
-    merged['number_of_irr_representations_for_each_q'] = number_irreps
-    merged['number_of_qpoints'] = len(outputs)
+    result['wall_time_seconds'] = total_walltime
+    result['number_of_irr_representations_for_each_q'] = [number_irreps[index] for index in sorted(number_irreps)]
+    result['number_of_qpoints'] = len(indices)
 
-    return orm.Dict(dict=merged)
+    return {'output_parameters': orm.Dict(result), 'frequencies': arrays}
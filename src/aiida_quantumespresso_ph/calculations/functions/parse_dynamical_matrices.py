@@ -0,0 +1,17 @@
+# -*- coding: utf-8 -*-
+"""Calcfunction to parse the dynamical matrix files of a ``ph.x`` calculation into a ``DynamicalMatrixData``."""
+from aiida.engine import calcfunction
+from aiida.orm import FolderData
+
+from aiida_quantumespresso_ph.data.dynamical_matrix import DynamicalMatrixData
+
+
+@calcfunction
+def parse_dynamical_matrices(retrieved: FolderData) -> DynamicalMatrixData:
+    """Parse the dynamical matrix files of all q-points of a grid into a ``DynamicalMatrixData``.
+
+    :param retrieved: a ``FolderData`` with the dynamical matrix files of all q-points, e.g. the ``retrieved`` output of
+        a ``PhCalculation`` on a grid of q-points or the output of ``recollect_qpoints``.
+    :return: the ``DynamicalMatrixData`` with the arrays of all q-points.
+    """
+    return DynamicalMatrixData.from_folder(retrieved)
@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+"""Calcfunction to parse the phonon DOS written by a ``matdyn.x`` run in the job script of another ``matdyn.x`` run."""
+from aiida.engine import calcfunction
+from aiida.orm import FolderData, XyData
+from aiida.plugins import CalculationFactory
+import numpy
+
+
+@calcfunction
+def parse_matdyn_dos(retrieved: FolderData) -> XyData:
+    """Parse the phonon density of states from the retrieved folder of a ``MatdynCalculation``.
+
+    The DOS is parsed as by the ``MatdynParser``, which only parses it if ``dos`` is set in the parameters of the
+    calculation itself. This is not the case if the DOS was computed by a second run of ``matdyn.x`` appended to the job
+    script of a calculation of the dispersion.
+
+    :param retrieved: the ``retrieved`` output of the ``MatdynCalculation``.
+    :return: the ``XyData`` with the DOS as a function of the frequency in cm^-1.
+    """
+    filename = CalculationFactory('quantumespresso.matdyn')._PHONON_DOS_NAME  # pylint: disable=protected-access
+
+    with retrieved.base.repository.open(filename) as handle:
+        dos_array = numpy.genfromtxt(handle)
+
+    output_dos = XyData()
+    output_dos.set_x(dos_array[:, 0], 'frequency', 'cm^(-1)')
+    output_dos.set_y(dos_array[:, 1], 'dos', 'states * cm')
+
+    return output_dos
@@ -1,38 +1,72 @@
 # -*- coding: utf-8 -*-
 """Calcfunction to collect the dynamical matrices of individual ``PhCalculation``s into a single ``FolderData``."""
+import os
+
 from aiida.engine import calcfunction
 from aiida.orm import FolderData
 from aiida.plugins import CalculationFactory
 
 
 @calcfunction
-def recollect_qpoints(**kwargs):
+def recollect_qpoints(batches=None, **kwargs):
     """Collect dynamical matrix files into a single folder.
 
     A different number is put at the end of each final dynamical matrix file, obtained from the input link, which
     corresponds to its place in the list of q-points originally generated by distribute_qpoints.
 
+    The files are streamed from the repository of the retrieved folders into the merged folder. Since the objects of the
+    repository are addressed by the hash of their content, the stored merged folder references the same objects as the
+    retrieved folders and the content is not stored twice.
+
+    :param batches: optional ``Dict`` that maps the keys of folders that computed a batch of q-points on the list of
+        indices of these q-points. The dynamical matrix files of such a folder are numbered in the order of this list.
     :param kwargs: keys are the string representation of the q-point index and the value is the
         corresponding retrieved folder object. A special case is the folder at key '0' which is
-        the folder of the initialization calculation.
+        the folder of the initialization calculation. The folders with keys of the form ``merged_N`` were returned by a
+        previous call for other q-points, such that the folders can be collected hierarchically, and their dynamical
+        matrix files are collected as they are.
     :return: FolderData object containing the dynamic matrix files of the computed PhBaseWorkChains
     """
     PhCalculation = CalculationFactory('quantumespresso.ph')
     dynmat_prefix = PhCalculation._OUTPUT_DYNAMICAL_MATRIX_PREFIX  # pylint: disable=protected-access
+    dynmat_dirname, dynmat_basename = os.path.split(dynmat_prefix)
+    batches = batches.get_dict() if batches is not None else {}
 
-    # Initialize the merged folder, by creating the subdirectory for the dynamical matrix files
-    merged_folder = FolderData()
+    # Maps the name of each dynamical matrix file in the merged folder on its source folder and relative filepath
+    sources = {}
 
     for key, retrieved_folder in kwargs.items():
+
+        if key.startswith('merged_'):
+            for filename in retrieved_folder.base.repository.list_object_names(dynmat_dirname):
+                sources[filename] = (retrieved_folder, f'{dynmat_dirname}/{filename}')
+            continue
+
+        if key in batches:
+            # A single q-point is computed without the ``ldisp`` flag, in which case the file is not numbered
+            numbered = len(batches[key]) > 1
+
+            for number, index in enumerate(batches[key], start=1):
+                filepath_src = f'{dynmat_prefix}{number}' if numbered else dynmat_prefix
+                sources[f'{dynmat_basename}{index}'] = (retrieved_folder, filepath_src)
+            continue
+
         index = key.split('_')[-1]
         filepath_src = dynmat_prefix
         filepath_dst = f'{dynmat_prefix}{index}'
 
-        if int(index) == 0:
-            with retrieved_folder.base.repository.open(filepath_dst, 'rb') as handle:
-                merged_folder.base.repository.put_object_from_filelike(handle, filepath_dst)
-        else:
-            with retrieved_folder.base.repository.open(filepath_src, 'rb') as handle:
-                merged_folder.base.repository.put_object_from_filelike(handle, filepath_dst)
+        # A q-point computed on the full grid with ``start_q`` and ``last_q`` has its file numbered by its index
+        filenames = retrieved_folder.base.repository.list_object_names(dynmat_dirname)
+
+        if int(index) == 0 or dynmat_basename not in filenames:
+            filepath_src = filepath_dst
+
+        sources[f'{dynmat_basename}{index}'] = (retrieved_folder, filepath_src)
+
+    merged_folder = FolderData()
+
+    for filename, (retrieved_folder, filepath_src) in sources.items():
+        with retrieved_folder.base.repository.open(filepath_src, 'rb') as handle:
+            merged_folder.base.repository.put_object_from_filelike(handle, f'{dynmat_dirname}/{filename}')
 
     return merged_folder
@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+"""Calcfunction to choose between running a ``ph.x`` calculation serially or parallelized over the q-points."""
+from aiida.engine import calcfunction
+from aiida.orm import Dict, KpointsData, StructureData
+
+from aiida_quantumespresso_ph.utils.cost import estimate_wall_times
+from aiida_quantumespresso_ph.utils.history import estimate_number_of_irreps, predict_qpoint_wall_time
+from aiida_quantumespresso_ph.utils.qpoints import get_number_of_qpoints
+
+
+@calcfunction
+def select_parallelization(
+    parameters: Dict, structure: StructureData, qpoints: KpointsData, settings: Dict, cost_model: Dict = None
+):
+    """Estimate the time to solution of the serial and the parallel mode and select the fastest one.
+
+    The average wall time of a q-point is predicted by the ``cost_model`` if it is given, with the number of irreducible
+    representations estimated from the calculations it was fitted on. Otherwise, it is estimated from the wall time of
+    the parent ``PwCalculation``, assuming that the linear response of each of the ``3 * N`` irreducible representations
+    of a q-point without symmetry costs about as much as the self-consistent calculation.
+
+    :param parameters: the ``output_parameters`` of the ``PwCalculation`` preceding the ``PhCalculation``.
+    :param structure: the structure of the ``PwCalculation``.
+    :param qpoints: the ``KpointsData`` with the q-points of the ``PhCalculation``.
+    :param settings: ``Dict`` with the ``number_of_cores`` of the ``PhCalculation`` and ``parent_number_of_cores`` of
+        the ``PwCalculation``, and optionally any keyword argument of ``estimate_wall_times``.
+    :param cost_model: optional ``Dict`` with the model fitted on the history of ``ph.x`` calculations, as returned by
+        ``aiida_quantumespresso_ph.utils.history.get_cost_model``.
+    :return: ``Dict`` with the selected ``mode``, either ``serial`` or ``parallel``, and the estimates it is based on.
+    """
+    parameters = parameters.get_dict()
+    settings = settings.get_dict()
+    number_of_cores = settings.pop('number_of_cores')
+    parent_number_of_cores = settings.pop('parent_number_of_cores')
+    number_of_atoms = len(structure.sites)
+    number_of_qpoints = get_number_of_qpoints(parameters, structure.cell, qpoints)
+
+    if cost_model is not None:
+        qpoint_seconds = predict_qpoint_wall_time(
+            cost_model.get_dict(), number_of_atoms, estimate_number_of_irreps(cost_model.get_dict(), number_of_atoms),
+            parameters['number_of_k_points'], number_of_cores
+        )
+        source = 'cost_model'
+    else:
+        scf_core_seconds = parameters['wall_time_seconds'] * parent_number_of_cores
+        qpoint_seconds = 3 * number_of_atoms * scf_core_seconds / number_of_cores
+        source = 'parent_calculation'
+
+    serial, parallel = estimate_wall_times(number_of_qpoints, qpoint_seconds, **settings)
+
+    return Dict({
+        'mode': 'parallel' if parallel < serial else 'serial',
+        'source': source,
+        'number_of_qpoints': number_of_qpoints,
+        'estimated_qpoint_seconds': qpoint_seconds,
+        'estimated_serial_seconds': serial,
+        'estimated_parallel_seconds': parallel,
+    })
@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+"""Calcfunction to split a list or mesh of k-points into chunks of consecutive k-points."""
+from aiida.engine import calcfunction
+from aiida.orm import Int, KpointsData
+import numpy
+
+
+@calcfunction
+def split_kpoints(kpoints: KpointsData, num_chunks: Int, overlap: Int = None):
+    """Split a list or mesh of k-points into a number of explicit lists of consecutive k-points of similar size.
+
+    A mesh is first expanded into the list of all its k-points. The cell of the k-points is copied into each chunk, if
+    it is defined, and the k-points are kept in crystal coordinates.
+
+    For a path, ``matdyn.x`` takes the direction of the non-analytic term at Gamma from the preceding k-point. With an
+    ``overlap``, each chunk but the first starts with the last k-points of the previous chunk, such that a Gamma point
+    at the start of a chunk is computed with the same direction as without chunks.
+
+    :param kpoints: the ``KpointsData`` with a list or a mesh of k-points.
+    :param num_chunks: the number of chunks, which is reduced to the number of k-points if there are fewer.
+    :param overlap: optional number of k-points of the previous chunk that are prepended to each chunk but the first.
+    :return: a dictionary of ``KpointsData`` with link labels of form ``chunk_N``, where ``N`` starts from one and
+        follows the order of the k-points.
+    """
+    try:
+        points = kpoints.get_kpoints()
+    except AttributeError:
+        points = kpoints.get_kpoints_mesh(print_list=True)
+
+    overlap = overlap.value if overlap is not None else 0
+    sizes = [len(chunk) for chunk in numpy.array_split(points, min(num_chunks.value, len(points)))]
+    results = {}
+    start = 0
+
+    for number, size in enumerate(sizes, start=1):
+        chunk = points[max(start - overlap, 0):start + size]
+        start += size
+        results[f'chunk_{number}'] = KpointsData()
+
+        if kpoints.base.attributes.get('cell', None) is not None:
+            results[f'chunk_{number}'].set_cell(kpoints.cell)
+
+        results[f'chunk_{number}'].set_kpoints(chunk)
+
+    return results
@@ -0,0 +1,5 @@
+# -*- coding: utf-8 -*-
+"""Data types of the ``aiida-quantumespresso-ph`` plugin package."""
+from .dynamical_matrix import DynamicalMatrixData
+
+__all__ = ('DynamicalMatrixData',)
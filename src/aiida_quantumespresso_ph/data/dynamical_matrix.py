@@ -0,0 +1,379 @@
+# -*- coding: utf-8 -*-
+"""Data type for the dynamical matrices computed by ``ph.x`` on a grid of q-points.
+
+The dynamical matrix files written by ``ph.x`` are parsed at once into NumPy arrays: the numerical blocks of each file
+are converted with a single call to ``numpy.array`` instead of line by line. The arrays are stored in the repository,
+with a separate array for each star of q-points, such that the dynamical matrices of a single q-point can be loaded
+without loading those of the whole grid.
+"""
+import os
+import re
+from typing import Dict, List, Optional, Tuple
+
+from aiida.orm import ArrayData
+import numpy
+
+MATRIX_TITLE = 'Dynamical  Matrix in cartesian axes'
+DIAGONALIZATION_TITLE = 'Diagonalizing the dynamical matrix'
+DIELECTRIC_TITLE = 'Dielectric Tensor:'
+EFFECTIVE_CHARGES_TITLE = 'Effective Charges E-U: Z_{alpha}{s,beta}'
+THZ_TO_CM = 33.35641
+
+REGEX_QPOINT = re.compile(r'q = \(\s*(\S+)\s+(\S+)\s+(\S+)\s*\)')
+REGEX_SPECIES = re.compile(r"^\s*\d+\s+'([^']*)'\s+(\S+)\s*$")
+REGEX_FREQUENCY = re.compile(r'(?:freq|omega)\s*\(\s*\d+\s*\)\s*=.*?=\s*(\S+)\s*\[cm-1\]')
+REGEX_ATOM = re.compile(r'atom #\s*\d+')
+
+
+def _to_array(text: str, shape: Tuple[int, ...]) -> numpy.ndarray:
+    """Convert all the numbers in a block of text at once into an array of the given shape."""
+    return numpy.array(text.split(), dtype=float).reshape(shape)
+
+
+def parse_qpoints_file(content: str) -> Tuple[List[int], numpy.ndarray]:
+    """Parse the file with the list of irreducible q-points written by ``ph.x``, i.e. the one numbered zero.
+
+    :param content: the content of the file.
+    :return: tuple with the q-point mesh and the array of q-points in cartesian coordinates in units of 2pi/a.
+    :raises ValueError: if the content is not a list of q-points.
+    """
+    tokens = content.split()
+
+    try:
+        mesh = [int(value) for value in tokens[:3]]
+        number_of_qpoints = int(tokens[3])
+        qpoints = _to_array(' '.join(tokens[4:4 + 3 * number_of_qpoints]), (number_of_qpoints, 3))
+    except (IndexError, ValueError) as exception:
+        raise ValueError('the content is not a list of q-points written by `ph.x`') from exception
+
+    return mesh, qpoints
+
+
+def format_qpoints_file(mesh: List[int], qpoints: numpy.ndarray) -> str:
+    """Return the content of the file with the list of irreducible q-points, in the format written by ``ph.x``.
+
+    :param mesh: the q-point mesh.
+    :param qpoints: the q-points in cartesian coordinates in units of 2pi/a.
+    """
+    lines = [''.join(f'{value:4d}' for value in mesh), f'{len(qpoints):4d}']
+    lines.extend(''.join(f'{value:24.15E}' for value in qpoint) for qpoint in qpoints)
+    return '\n'.join(lines + [''])
+
+
+def parse_dynamical_matrix_file(content: str) -> dict:  # pylint: disable=too-many-locals
+    """Parse a dynamical matrix file written by ``ph.x`` for a star of q-points.
+
+    :param content: the content of the file.
+    :return: dictionary with the ``ibrav``, ``celldm``, optional ``cell`` in units of ``celldm(1)``, the labels and
+        ``masses`` of the ``species`` in Rydberg atomic units, the ``atomic_species`` indices and ``positions`` of the
+        atoms in units of ``celldm(1)``, the ``q_points`` of the star in cartesian coordinates in units of 2pi/a, the
+        complex ``dynamical_matrices`` with shape ``(number of q-points, 3 * nat, 3 * nat)``, the ``frequencies`` at
+        the first q-point in cm^-1 and, if present, the ``dielectric_tensor`` and the ``born_charges``.
+    :raises ValueError: if the content is not a dynamical matrix file.
+    """
+    lines = content.splitlines()
+
+    if not lines or 'Dynamical matrix file' not in lines[0]:
+        raise ValueError('the content is not a dynamical matrix file written by `ph.x`')
+
+    header = lines[2].split()
+    number_of_species, number_of_atoms, ibrav = (int(value) for value in header[:3])
+    parsed = {'ibrav': ibrav, 'celldm': [float(value) for value in header[3:9]], 'cell': None}
+    start = 3
+
+    if ibrav == 0:
+        parsed['cell'] = _to_array(' '.join(lines[4:7]), (3, 3))
+        start = 7
+
+    species = [REGEX_SPECIES.match(line) for line in lines[start:start + number_of_species]]
+    parsed['species'] = [match.group(1).strip() for match in species]
+    parsed['masses'] = numpy.array([float(match.group(2)) for match in species])
+    start += number_of_species
+
+    atoms = _to_array(' '.join(lines[start:start + number_of_atoms]), (number_of_atoms, 5))
+    parsed['atomic_species'] = atoms[:, 1].astype(int)
+    parsed['positions'] = atoms[:, 2:]
+
+    body, _, diagonalization = '\n'.join(lines[start + number_of_atoms:]).partition(DIAGONALIZATION_TITLE)
+    body, _, dielectric = body.partition(DIELECTRIC_TITLE)
+    qpoints = []
+    matrices = []
+
+    for block in body.split(MATRIX_TITLE)[1:]:
+        match = REGEX_QPOINT.search(block)
+        qpoints.append([float(value) for value in match.groups()])
+
+        # Each block of two atoms consists of their indices followed by the 3x3 complex matrix, in rows of 6 numbers
+        values = _to_array(block[match.end():], (number_of_atoms, number_of_atoms, 20))[..., 2:]
+        values = values.reshape(number_of_atoms, number_of_atoms, 3, 3, 2)
+        phi = values[..., 0] + 1j * values[..., 1]
+        matrices.append(phi.transpose(0, 2, 1, 3).reshape(3 * number_of_atoms, 3 * number_of_atoms))
+
+    parsed['q_points'] = numpy.array(qpoints)
+    parsed['dynamical_matrices'] = numpy.array(matrices)
+    parsed['frequencies'] = numpy.array([
+        numpy.nan if '*' in value else float(value) for value in REGEX_FREQUENCY.findall(diagonalization)
+    ])
+    parsed['dielectric_tensor'] = None
+    parsed['born_charges'] = None
+
+    if dielectric:
+        dielectric, _, charges = dielectric.partition(EFFECTIVE_CHARGES_TITLE)
+        parsed['dielectric_tensor'] = _to_array(dielectric, (3, 3))
+
+        if charges:
+            charges = charges.partition('Effective Charges')[0]
+            parsed['born_charges'] = _to_array(REGEX_ATOM.sub('', charges), (number_of_atoms, 3, 3))
+
+    return parsed
+
+
+class DynamicalMatrixData(ArrayData):
+    """Data type for the dynamical matrices computed by ``ph.x`` on a grid of q-points.
+
+    The irreducible q-points are numbered from one, as the dynamical matrix files of ``ph.x``. For each irreducible
+    q-point, the q-points of its star, the complex dynamical matrices at these q-points and the frequencies at the
+    irreducible q-point are stored in the ``q_points_N``, ``dynamical_matrices_N`` and ``frequencies_N`` arrays, where
+    ``N`` is its number. The q-points are in cartesian coordinates in units of 2pi/a, the dynamical matrices in Rydberg
+    atomic units and the frequencies in cm^-1, as in the files of ``ph.x``.
+    """
+
+    @classmethod
+    def from_files(cls, contents: Dict[int, str]) -> 'DynamicalMatrixData':
+        """Create a new instance from the contents of the dynamical matrix files written by ``ph.x``.
+
+        :param contents: dictionary with the content of each file by its number, where number zero is the file with the
+            list of irreducible q-points.
+        :return: an unstored instance.
+        """
+        mesh, qpoints = parse_qpoints_file(contents[0])
+        node = cls()
+        node.base.attributes.set('mesh', mesh)
+        node.base.attributes.set('number_of_qpoints', len(qpoints))
+        node.set_array('irreducible_q_points', qpoints)
+
+        for number in range(1, len(qpoints) + 1):
+            parsed = parse_dynamical_matrix_file(contents[number])
+
+            if number == 1:
+                node.base.attributes.set('ibrav', parsed['ibrav'])
+                node.base.attributes.set('celldm', parsed['celldm'])
+                node.base.attributes.set('species', parsed['species'])
+                node.set_array('masses', parsed['masses'])
+                node.set_array('atomic_species', parsed['atomic_species'])
+                node.set_array('positions', parsed['positions'])
+
+                for name in ('cell', 'dielectric_tensor', 'born_charges'):
+                    if parsed[name] is not None:
+                        node.set_array(name, parsed[name])
+
+            node.set_array(f'q_points_{number}', parsed['q_points'])
+            node.set_array(f'dynamical_matrices_{number}', parsed['dynamical_matrices'])
+            node.set_array(f'frequencies_{number}', parsed['frequencies'])
+
+        return node
+
+    @classmethod
+    def from_folder(cls, folder, prefix: Optional[str] = None) -> 'DynamicalMatrixData':
+        """Create a new instance from the dynamical matrix files in a ``FolderData``, e.g. of ``recollect_qpoints``.
+
+        :param folder: the ``FolderData`` with the files.
+        :param prefix: the relative filepath of the files without their number, by default the one of ``PhCalculation``.
+        :return: an unstored instance.
+        """
+        if prefix is None:
+            from aiida.plugins import CalculationFactory
+            PhCalculation = CalculationFactory('quantumespresso.ph')
+            prefix = PhCalculation._OUTPUT_DYNAMICAL_MATRIX_PREFIX  # pylint: disable=protected-access
+
+        dirname, basename = os.path.split(prefix)
+        numbers = [
+            int(filename[len(basename):])
+            for filename in folder.base.repository.list_object_names(dirname)
+            if filename.startswith(basename) and filename[len(basename):].isdigit()
+        ]
+
+        return cls.from_files({
+            number: folder.base.repository.get_object_content(f'{prefix}{number}') for number in sorted(numbers)
+        })
+
+    @property
+    def mesh(self) -> List[int]:
+        """Return the q-point mesh."""
+        return self.base.attributes.get('mesh')
+
+    @property
+    def number_of_qpoints(self) -> int:
+        """Return the number of irreducible q-points."""
+        return self.base.attributes.get('number_of_qpoints')
+
+    @property
+    def number_of_atoms(self) -> int:
+        """Return the number of atoms in the unit cell."""
+        return len(self.get_array('atomic_species'))
+
+    @property
+    def species(self) -> List[str]:
+        """Return the labels of the species."""
+        return self.base.attributes.get('species')
+
+    def get_cell(self) -> numpy.ndarray:
+        """Return the lattice vectors as rows in units of ``celldm(1)``, as defined by ``ibrav`` in ``pw.x``.
+
+        :raises ValueError: if the Bravais lattice index is not one of 0, 1, 2, 3, 4, 6 and 8.
+        """
+        ibrav = self.base.attributes.get('ibrav')
+        celldm = self.base.attributes.get('celldm')
+
+        if ibrav == 0:
+            return self.get_array('cell')
+
+        cells = {
+            1: [[1., 0., 0.], [0., 1., 0.], [0., 0., 1.]],
+            2: [[-.5, 0., .5], [0., .5, .5], [-.5, .5, 0.]],
+            3: [[.5, .5, .5], [-.5, .5, .5], [-.5, -.5, .5]],
+            4: [[1., 0., 0.], [-.5, numpy.sqrt(3.) / 2., 0.], [0., 0., celldm[2]]],
+            6: [[1., 0., 0.], [0., 1., 0.], [0., 0., celldm[2]]],
+            8: [[1., 0., 0.], [0., celldm[1], 0.], [0., 0., celldm[2]]],
+        }
+
+        if ibrav not in cells:
+            raise ValueError(f'the Bravais lattice index `ibrav = {ibrav}` is not supported.')
+
+        return numpy.array(cells[ibrav])
+
+    def get_masses(self) -> numpy.ndarray:
+        """Return the mass of each atom in Rydberg atomic units."""
+        return self.get_array('masses')[self.get_array('atomic_species') - 1]
+
+    def get_star(self, number: int) -> Tuple[numpy.ndarray, numpy.ndarray]:
+        """Return the q-points and dynamical matrices of the star of an irreducible q-point.
+
+        Only the arrays of this star are loaded from the repository.
+
+        :param number: the number of the irreducible q-point, starting from one.
+        :return: tuple with the q-points and the complex dynamical matrices.
+        """
+        return self.get_array(f'q_points_{number}'), self.get_array(f'dynamical_matrices_{number}')
+
+    def get_dynamical_matrix(self, number: int) -> numpy.ndarray:
+        """Return the complex dynamical matrix at an irreducible q-point.
+
+        :param number: the number of the irreducible q-point, starting from one.
+        """
+        return self.get_array(f'dynamical_matrices_{number}')[0]
+
+    def get_frequencies(self, number: int) -> numpy.ndarray:
+        """Return the frequencies in cm^-1 at an irreducible q-point.
+
+        :param number: the number of the irreducible q-point, starting from one.
+        """
+        return self.get_array(f'frequencies_{number}')
+
+    def get_q_points(self) -> Tuple[numpy.ndarray, numpy.ndarray]:
+        """Return all q-points of the grid and the number of the irreducible q-point of the star of each of them."""
+        stars = [self.get_array(f'q_points_{number}') for number in range(1, self.number_of_qpoints + 1)]
+        numbers = numpy.concatenate([numpy.full(len(star), number) for number, star in enumerate(stars, start=1)])
+        return numpy.concatenate(stars), numbers
+
+    def get_dielectric_tensor(self) -> Optional[numpy.ndarray]:
+        """Return the dielectric tensor, or ``None`` if it was not computed."""
+        return self.get_array('dielectric_tensor') if 'dielectric_tensor' in self.get_arraynames() else None
+
+    def get_born_charges(self) -> Optional[numpy.ndarray]:
+        """Return the Born effective charges with shape ``(nat, 3, 3)``, or ``None`` if they were not computed."""
+        return self.get_array('born_charges') if 'born_charges' in self.get_arraynames() else None
+
+    def get_file_content(self, number: int) -> str:
+        """Return the content of a dynamical matrix file in the format written by ``ph.x``, as read by ``q2r.x``.
+
+        The eigenvectors of the diagonalized dynamical matrix at the end of the file are not written, since they are not
+        stored. Only the frequencies are written.
+
+        :param number: the number of the file, where number zero is the file with the list of irreducible q-points.
+        """
+        if number == 0:
+            return format_qpoints_file(self.mesh, self.get_array('irreducible_q_points'))
+
+        celldm = ''.join(f'{value:11.7f}' for value in self.base.attributes.get('celldm'))
+        ibrav = self.base.attributes.get('ibrav')
+        lines = ['Dynamical matrix file', '', f'{len(self.species):3d}{self.number_of_atoms:5d}{ibrav:3d}{celldm}']
+
+        if ibrav == 0:
+            lines.append('Basis vectors')
+            lines.extend('  ' + ''.join(f'{value:15.9f}' for value in vector) for vector in self.get_array('cell'))
+
+        for index, (label, mass) in enumerate(zip(self.species, self.get_array('masses')), start=1):
+            lines.append(f"{index:5d}  '{label:<6s}'  {mass:20.10f}")
+
+        atoms = zip(self.get_array('atomic_species'), self.get_array('positions'))
+
+        for index, (kind, position) in enumerate(atoms, start=1):
+            lines.append(f'{index:5d}{kind:5d}' + ''.join(f'{value:18.10f}' for value in position))
+
+        qpoints, matrices = self.get_star(number)
+
+        for qpoint, matrix in zip(qpoints, matrices):
+            lines.extend(['', f'     {MATRIX_TITLE}', '', self._format_qpoint(qpoint), ''])
+
+            for atom_a in range(self.number_of_atoms):
+                for atom_b in range(self.number_of_atoms):
+                    lines.append(f'{atom_a + 1:5d}{atom_b + 1:5d}')
+                    block = matrix[3 * atom_a:3 * atom_a + 3, 3 * atom_b:3 * atom_b + 3]
+                    lines.extend(
+                        ''.join(f'{value.real:12.8f}{value.imag:12.8f}  ' for value in row).rstrip() for row in block
+                    )
+
+        lines.extend(self._format_dielectric())
+        lines.extend(['', f'     {DIAGONALIZATION_TITLE}', '', self._format_qpoint(qpoints[0]), '', '*' * 74])
+        lines.extend(
+            f'     freq ({index:5d}) ={value / THZ_TO_CM:15.6f} [THz] ={value:15.6f} [cm-1]'
+            for index, value in enumerate(self.get_frequencies(number), start=1)
+        )
+        lines.append('*' * 74)
+
+        return '\n'.join(lines + [''])
+
+    @staticmethod
+    def _format_qpoint(qpoint) -> str:
+        """Return the line with a q-point as written by ``ph.x``."""
+        return '     q = ( ' + ''.join(f'{value:14.9f}' for value in qpoint) + ' ) '
+
+    def _format_dielectric(self) -> List[str]:
+        """Return the lines with the dielectric tensor and Born effective charges as written by ``ph.x``."""
+        dielectric_tensor = self.get_dielectric_tensor()
+
+        if dielectric_tensor is None:
+            return []
+
+        lines = ['', f'     {DIELECTRIC_TITLE}', '']
+        lines.extend(''.join(f'{value:24.12f}' for value in row) for row in dielectric_tensor)
+        born_charges = self.get_born_charges()
+
+        if born_charges is not None:
+            lines.extend(['', f'     {EFFECTIVE_CHARGES_TITLE}', ''])
+
+            for index, charges in enumerate(born_charges, start=1):
+                lines.append(f'     atom # {index:4d}')
+                lines.extend(''.join(f'{value:24.12f}' for value in row) for row in charges)
+
+        return lines
+
+    def write_files(self, dirpath, prefix: str = 'dynamical-matrix-') -> List[str]:
+        """Write all dynamical matrix files in the format written by ``ph.x``, e.g. as input for ``q2r.x``.
+
+        :param dirpath: the directory in which the files are written.
+        :param prefix: the filename of the files without their number.
+        :return: the list of filepaths of the written files.
+        """
+        filepaths = []
+
+        for number in range(self.number_of_qpoints + 1):
+            filepath = os.path.join(dirpath, f'{prefix}{number}')
+
+            with open(filepath, 'w', encoding='utf-8') as handle:
+                handle.write(self.get_file_content(number))
+
+            filepaths.append(filepath)
+
+        return filepaths
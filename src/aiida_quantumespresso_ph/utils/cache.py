@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+"""Utilities to reuse the force constants computed by ``q2r.x`` from the same dynamical matrices and parameters.
+
+The force constants are a function of the content of the dynamical matrix files and of the parameters of ``q2r.x`` only.
+The cache key is a hash of both, where the content of the files is represented by the keys of their objects in the
+repository, which are themselves the hash of the content, such that the files are not read. The key is stored as an
+extra on the ``force_constants`` output of ``q2r.x``, such that an existing node can be found with a query, even if the
+dynamical matrix files are in another node. This is not the case for the caching mechanism of AiiDA, which hashes the
+input nodes of the calculation.
+"""
+import hashlib
+import json
+import os
+from typing import Optional
+
+FORCE_CONSTANTS_CACHE_EXTRA = 'force_constants_cache_key'
+
+
+def get_force_constants_cache_key(dynmat_folder, parameters: Optional[dict] = None) -> Optional[str]:
+    """Return the cache key of the force constants of the dynamical matrices in a folder and the ``q2r.x`` parameters.
+
+    The dynamical matrix files are taken from the repository of a stored ``FolderData``. For a ``RemoteData``, they are
+    taken from the ``retrieved`` folder of the calculation that created it, if any, since a ``PhCalculation`` retrieves
+    them. The files of an unstored folder do not have their content-addressed key yet, so no cache key is returned.
+
+    :param dynmat_folder: the ``FolderData`` or ``RemoteData`` with the dynamical matrix files.
+    :param parameters: the parameters of ``q2r.x`` as a dictionary.
+    :return: the hexadecimal SHA-256 hash, or ``None`` if the dynamical matrix files are not available.
+    """
+    from aiida import orm
+    from aiida.plugins import CalculationFactory
+
+    PhCalculation = CalculationFactory('quantumespresso.ph')
+    prefix = PhCalculation._OUTPUT_DYNAMICAL_MATRIX_PREFIX  # pylint: disable=protected-access
+    dirname = os.path.dirname(prefix)
+
+    if isinstance(dynmat_folder, orm.RemoteData):
+        try:
+            dynmat_folder = dynmat_folder.creator.outputs.retrieved
+        except AttributeError:
+            return None
+
+    if not dynmat_folder.is_stored:
+        return None
+
+    try:
+        filenames = sorted(dynmat_folder.base.repository.list_object_names(dirname))
+    except (FileNotFoundError, NotADirectoryError):
+        return None
+
+    if not filenames:
+        return None
+
+    digest = hashlib.sha256(json.dumps(parameters or {}, sort_keys=True).encode('utf-8'))
+
+    for filename in filenames:
+        digest.update(filename.encode('utf-8'))
+        digest.update(dynmat_folder.base.repository.get_object(f'{dirname}/{filename}').key.encode('utf-8'))
+
+    return digest.hexdigest()
+
+
+def get_cached_force_constants(key: str):
+    """Return the most recent ``ForceConstantsData`` with the given cache key, or ``None`` if there is none.
+
+    :param key: the cache key returned by ``get_force_constants_cache_key``.
+    """
+    from aiida import orm
+    from aiida.plugins import DataFactory
+
+    builder = orm.QueryBuilder()
+    builder.append(
+        DataFactory('quantumespresso.force_constants'),
+        filters={f'extras.{FORCE_CONSTANTS_CACHE_EXTRA}': key},
+        tag='force_constants',
+    )
+    builder.order_by({'force_constants': {'ctime': 'desc'}})
+    builder.limit(1)
+
+    result = builder.first()
+
+    return result[0] if result else None
@@ -0,0 +1,224 @@
+# -*- coding: utf-8 -*-
+"""Utilities to estimate the relative computational cost of the q-points of a ``ph.x`` calculation."""
+import math
+import re
+from typing import Dict, List, Optional, Tuple
+from xml.etree import ElementTree
+
+from aiida.orm import FolderData
+
+PATTERNS_FILENAME_REGEX = re.compile(r'^patterns\.(\d+)\.xml$')
+
+
+def parse_patterns(content: str) -> dict:
+    """Parse the content of a ``patterns.N.xml`` file written by ``ph.x`` in the ``_ph0/{prefix}.phsave`` folder.
+
+    :param content: the content of the XML file.
+    :return: dictionary with the rank of the small group of q, the number of irreducible representations and the number
+        of perturbations of each irreducible representation.
+    :raises ValueError: if the content cannot be parsed.
+    """
+    try:
+        root = ElementTree.fromstring(content)
+    except ElementTree.ParseError as exception:
+        raise ValueError('the patterns file is not valid XML') from exception
+
+    try:
+        number_of_irreps = int(root.findtext('.//NUMBER_IRR_REP'))
+        qpoint_group_rank = int(root.findtext('.//QPOINT_GROUP_RANK'))
+    except (TypeError, ValueError) as exception:
+        raise ValueError('the patterns file does not contain the irreducible representations') from exception
+
+    perturbations = [int(element.text) for element in root.iter('NUMBER_OF_PERTURBATIONS')]
+
+    return {
+        'number_of_irreps': number_of_irreps,
+        'qpoint_group_rank': qpoint_group_rank,
+        'number_of_perturbations': perturbations,
+    }
+
+
+def get_irreps_from_retrieved(retrieved: FolderData) -> Dict[int, dict]:
+    """Return the irreducible representation info of each q-point from the retrieved folder of a ``PhCalculation``.
+
+    The ``patterns.N.xml`` files are only present if they were explicitly added to the retrieve list, which is done by
+    the initialization run of the ``PhParallelizeQpointsWorkChain``. Files that cannot be parsed are skipped.
+
+    :param retrieved: the ``retrieved`` output of a ``PhCalculation``.
+    :return: dictionary with the parsed patterns of each q-point, where the keys are the q-point indices starting at 1.
+    """
+    irreps = {}
+
+    for filename in retrieved.base.repository.list_object_names():
+        match = PATTERNS_FILENAME_REGEX.match(filename)
+
+        if match is None:
+            continue
+
+        try:
+            irreps[int(match.group(1))] = parse_patterns(retrieved.base.repository.get_object_content(filename))
+        except ValueError:
+            continue
+
+    return irreps
+
+
+def estimate_qpoint_costs(number_of_qpoints: int, irreps: Optional[Dict[int, dict]] = None) -> List[float]:
+    """Estimate the relative computational cost of each q-point of a ``ph.x`` calculation.
+
+    The cost of a q-point is taken to be proportional to the number of irreducible representations times the number of
+    k-points in the irreducible wedge of the small group of q. The latter scales as the size of the star of q, which is
+    the ratio of the rank of the crystal group (that of the Gamma point, which ``ph.x`` always computes first) and the
+    rank of the small group of q. For q-points other than Gamma, the wavefunctions at both k and k+q are required,
+    which doubles the number of k-points. Missing information results in an average estimate for that q-point.
+
+    :param number_of_qpoints: the total number of q-points.
+    :param irreps: the parsed irreducible representation info, as returned by ``get_irreps_from_retrieved``.
+    :return: list with the estimated relative cost of each q-point, in the order of the q-points.
+    """
+    irreps = irreps or {}
+    group_rank = max([value['qpoint_group_rank'] for value in irreps.values()] or [1])
+    mean_irreps = sum(value['number_of_irreps'] for value in irreps.values()) / len(irreps) if irreps else 1
+    costs = []
+
+    for index in range(1, number_of_qpoints + 1):
+        try:
+            number_of_irreps = irreps[index]['number_of_irreps']
+            star_size = group_rank / irreps[index]['qpoint_group_rank']
+        except KeyError:
+            number_of_irreps = mean_irreps
+            star_size = 1
+
+        costs.append(number_of_irreps * star_size * (1 if index == 1 else 2))
+
+    return costs
+
+
+def partition_qpoints(costs: List[float], num_batches: int) -> List[List[int]]:
+    """Partition the q-points in a number of batches with a balanced total cost.
+
+    The longest processing time first heuristic is used: the q-points are assigned in order of decreasing cost to the
+    batch with the lowest total cost so far. Empty batches are discarded.
+
+    :param costs: list with the estimated cost of each q-point.
+    :param num_batches: the number of batches.
+    :return: list of batches, each a sorted list of the q-point indices, starting at 1, that belong to it.
+    """
+    if num_batches < 1:
+        raise ValueError(f'the number of batches should be a positive integer, but got: {num_batches}')
+
+    batches = [[] for _ in range(num_batches)]
+    loads = [0.] * num_batches
+
+    for index in sorted(range(len(costs)), key=lambda index: (-costs[index], index)):
+        batch = loads.index(min(loads))
+        batches[batch].append(index + 1)
+        loads[batch] += costs[index]
+
+    return [sorted(batch) for batch in batches if batch]
+
+
+def split_irreps(number_of_irreps: int, max_irreps_per_job: int) -> List[List[int]]:
+    """Split the irreducible representations of a q-point in consecutive ranges of at most a given size.
+
+    :param number_of_irreps: the number of irreducible representations of the q-point.
+    :param max_irreps_per_job: the maximum number of irreducible representations in each range.
+    :return: list of ranges, each given by the ``start_irr`` and ``last_irr`` that define it in the ``ph.x`` input.
+    """
+    if max_irreps_per_job < 1:
+        raise ValueError(f'the number of irreps per job should be a positive integer, but got: {max_irreps_per_job}')
+
+    return [[start, min(start + max_irreps_per_job - 1, number_of_irreps)]
+            for start in range(1, number_of_irreps + 1, max_irreps_per_job)]
+
+
+def calibrate_seconds_per_cost(
+    wall_time_seconds: float,
+    number_of_qpoints: int,
+    irreps: Optional[Dict[int, dict]] = None,
+    num_machines: int = 1,
+    init_time_factor: float = 10.,
+) -> float:
+    """Calibrate the wall time of a unit of the relative cost of ``estimate_qpoint_costs`` from the initialization run.
+
+    During the initialization, ``ph.x`` computes the unperturbed wavefunctions at k+q for each q-point, which costs one
+    band structure calculation on the k-points of the irreducible wedge of the small group of q. Hence its wall time,
+    divided by the sum of the sizes of the stars of the q-points, measures the time to compute the bands on the k-points
+    of the crystal for the actual number of plane waves and the actual parallelization. The self-consistent linear
+    response of an irreducible representation takes roughly ``init_time_factor`` times longer.
+
+    :param wall_time_seconds: the wall time of the initialization run.
+    :param number_of_qpoints: the total number of q-points.
+    :param irreps: the parsed irreducible representation info, as returned by ``get_irreps_from_retrieved``.
+    :param num_machines: the number of machines used by the initialization run.
+    :param init_time_factor: the ratio of the time to compute an irreducible representation and to compute the bands.
+    :return: the estimated wall time in seconds of a unit of relative cost on a single machine.
+    """
+    irreps = irreps or {}
+    group_rank = max([value['qpoint_group_rank'] for value in irreps.values()] or [1])
+    star_sizes = [
+        group_rank / irreps[index]['qpoint_group_rank'] if index in irreps else 1
+        for index in range(1, number_of_qpoints + 1)
+    ]
+
+    return wall_time_seconds * num_machines * init_time_factor / max(sum(star_sizes), 1)
+
+
+def estimate_job_resources(
+    cost: float,
+    seconds_per_cost: float,
+    target_wallclock_seconds: float,
+    max_num_machines: int = 1,
+    safety_factor: float = 2.,
+    min_wallclock_seconds: int = 600,
+    max_wallclock_seconds: int = 86400,
+) -> Tuple[int, int]:
+    """Estimate the number of machines and the wall time to request for a job with a given relative cost.
+
+    The number of machines is increased, assuming ideal scaling, until the estimated wall time is below the target.
+
+    :param cost: the estimated relative cost of the job.
+    :param seconds_per_cost: the wall time of a unit of relative cost on a single machine.
+    :param target_wallclock_seconds: the wall time above which more machines are requested for the job.
+    :param max_num_machines: the maximum number of machines for a job.
+    :param safety_factor: the factor with which the estimated wall time is multiplied.
+    :param min_wallclock_seconds: the minimum wall time to request.
+    :param max_wallclock_seconds: the maximum wall time to request.
+    :return: tuple with the number of machines and the wall time in seconds.
+    """
+    seconds = cost * seconds_per_cost * safety_factor
+    num_machines = min(max(math.ceil(seconds / target_wallclock_seconds), 1), max_num_machines)
+    wallclock_seconds = min(max(math.ceil(seconds / num_machines), min_wallclock_seconds), max_wallclock_seconds)
+
+    return num_machines, int(wallclock_seconds)
+
+
+def estimate_wall_times(
+    number_of_qpoints: int,
+    qpoint_seconds: float,
+    queue_seconds: float = 600.,
+    collection_seconds: float = 60.,
+    init_time_factor: float = 10.,
+    max_child_factor: float = 2.,
+) -> Tuple[float, float]:
+    """Estimate the time to solution of a ``ph.x`` calculation run serially and parallelized over the q-points.
+
+    The serial run is a single job that computes all q-points. The parallel run consists of the initialization job,
+    which computes the bands at k+q for all q-points and hence takes about ``init_time_factor`` times less than a single
+    q-point per q-point, followed by the jobs of the q-points that run concurrently, of which the most expensive one is
+    ``max_child_factor`` times more expensive than the average. Finally, the results are collected. Each job has to wait
+    in the queue of the scheduler first.
+
+    :param number_of_qpoints: the number of irreducible q-points.
+    :param qpoint_seconds: the average wall time of a single q-point.
+    :param queue_seconds: the time a job waits in the queue of the scheduler.
+    :param collection_seconds: the time to collect the results of the parallel run.
+    :param init_time_factor: the ratio of the time to compute a q-point and to compute the bands at k+q.
+    :param max_child_factor: the ratio of the wall time of the most expensive and of the average q-point.
+    :return: tuple with the estimated serial and parallel time to solution in seconds.
+    """
+    serial = queue_seconds + number_of_qpoints * qpoint_seconds
+    initialization = queue_seconds + number_of_qpoints * qpoint_seconds / init_time_factor
+    parallel = initialization + queue_seconds + max_child_factor * qpoint_seconds + collection_seconds
+
+    return serial, parallel
@@ -0,0 +1,203 @@
+# -*- coding: utf-8 -*-
+"""Utilities to fit a model of the wall time of ``ph.x`` calculations on the finished calculations in the database.
+
+The wall time per q-point of a ``PhCalculation`` is modelled as a power law of the number of atoms, the average number
+of irreducible representations per q-point, the number of k-points of the parent ``PwCalculation`` and the number of
+cores:
+
+    t = exp(c0) * atoms^c1 * irreps^c2 * kpoints^c3 * cores^c4
+
+The coefficients are obtained with a least squares fit of the logarithm of the wall time on the history of successfully
+finished calculations, which is queried in bulk. Since the query can be expensive for large databases, the fitted model
+is cached on disk and only refitted once it is older than a given age.
+
+The number of irreducible representations of a q-point is only known after the symmetry analysis of ``ph.x``. Before
+that, it is estimated from the number of modes ``3 * atoms`` with the average number of irreducible representations per
+mode of the history, see ``estimate_number_of_irreps``.
+"""
+import json
+import pathlib
+import time
+from typing import List, Optional, Union
+
+import numpy
+
+MIN_NUMBER_OF_SAMPLES = 10
+MAX_AGE_SECONDS = 86400
+
+
+def get_number_of_cores(resources: dict) -> int:
+    """Return the total number of MPI processes of the scheduler resources of a calculation.
+
+    :param resources: the ``resources`` option of a calculation.
+    :return: the number of cores, or the number of machines if the number of processes per machine is not defined.
+    """
+    if resources.get('tot_num_mpiprocs'):
+        return int(resources['tot_num_mpiprocs'])
+
+    return int(resources.get('num_machines', 1) * (resources.get('num_mpiprocs_per_machine', None) or 1))
+
+
+def query_ph_history(limit: Optional[int] = None) -> List[dict]:
+    """Return the samples for the cost model from the successfully finished ``PhCalculation``s in the database.
+
+    A single query is performed, which joins each ``PhCalculation`` with its output parameters and with the output
+    parameters of the ``PwCalculation`` that created its ``parent_folder``. Calculations without computed q-points, such
+    as initialization runs, or with incomplete information are skipped.
+
+    :param limit: the maximum number of calculations to query, the most recent ones first.
+    :return: list of samples, each a dictionary with the wall time per q-point and the features of the model.
+    """
+    from aiida import orm
+    from aiida.plugins import CalculationFactory
+
+    builder = orm.QueryBuilder()
+    builder.append(
+        CalculationFactory('quantumespresso.ph'),
+        filters={'attributes.exit_status': 0},
+        project=['attributes.resources'],
+        tag='ph',
+    )
+    builder.append(
+        orm.Dict,
+        with_incoming='ph',
+        edge_filters={'label': 'output_parameters'},
+        project=[
+            'attributes.wall_time_seconds',
+            'attributes.number_of_atoms',
+            'attributes.number_of_irr_representations_for_each_q',
+        ],
+    )
+    builder.append(orm.RemoteData, with_outgoing='ph', edge_filters={'label': 'parent_folder'}, tag='remote')
+    builder.append(orm.CalcJobNode, with_outgoing='remote', tag='pw')
+    builder.append(
+        orm.Dict,
+        with_incoming='pw',
+        edge_filters={'label': 'output_parameters'},
+        project=['attributes.number_of_k_points'],
+    )
+    builder.order_by({'ph': {'ctime': 'desc'}})
+
+    if limit is not None:
+        builder.limit(limit)
+
+    samples = []
+
+    for resources, wall_time_seconds, number_of_atoms, irreps, number_of_k_points in builder.iterall():
+        if not all((resources, wall_time_seconds, number_of_atoms, irreps, number_of_k_points)):
+            continue
+
+        samples.append({
+            'wall_time_seconds': wall_time_seconds / len(irreps),
+            'number_of_atoms': number_of_atoms,
+            'number_of_irreps': sum(irreps) / len(irreps),
+            'number_of_k_points': number_of_k_points,
+            'number_of_cores': get_number_of_cores(resources),
+        })
+
+    return samples
+
+
+def _get_features(number_of_atoms, number_of_irreps, number_of_k_points, number_of_cores) -> List[float]:
+    """Return the features of the model, i.e. a constant and the logarithms of the variables."""
+    return [1.] + list(numpy.log([number_of_atoms, number_of_irreps, number_of_k_points, number_of_cores]))
+
+
+def fit_cost_model(samples: List[dict]) -> Optional[dict]:
+    """Fit the model of the wall time per q-point on the given samples.
+
+    :param samples: list of samples as returned by ``query_ph_history``.
+    :return: dictionary with the ``coefficients`` of the model, the geometric mean of the number of irreducible
+        representations per mode ``irreps_per_mode``, the ``number_of_samples`` and the ``created`` time, or ``None`` if
+        there are fewer than ``MIN_NUMBER_OF_SAMPLES`` samples.
+    """
+    if len(samples) < MIN_NUMBER_OF_SAMPLES:
+        return None
+
+    features = numpy.array([
+        _get_features(
+            sample['number_of_atoms'], sample['number_of_irreps'], sample['number_of_k_points'],
+            sample['number_of_cores']
+        ) for sample in samples
+    ])
+    targets = numpy.log([sample['wall_time_seconds'] for sample in samples])
+    coefficients, *_ = numpy.linalg.lstsq(features, targets, rcond=None)
+    irreps_per_mode = numpy.exp(
+        numpy.mean(numpy.log([sample['number_of_irreps'] / (3 * sample['number_of_atoms']) for sample in samples]))
+    )
+
+    return {
+        'coefficients': coefficients.tolist(),
+        'irreps_per_mode': float(irreps_per_mode),
+        'number_of_samples': len(samples),
+        'created': time.time(),
+    }
+
+
+def estimate_number_of_irreps(model: dict, number_of_atoms: int) -> float:
+    """Return the number of irreducible representations of a q-point estimated before the symmetry analysis.
+
+    The number of modes ``3 * number_of_atoms`` is an upper bound, which is reached without symmetry. It is scaled by
+    the average number of irreducible representations per mode of the calculations the model was fitted on, such that
+    the prediction uses the same feature as the fit. Models cached without this average fall back on the upper bound.
+
+    :param model: the model as returned by ``fit_cost_model``.
+    :param number_of_atoms: the number of atoms in the unit cell.
+    """
+    return model.get('irreps_per_mode', 1.) * 3 * number_of_atoms
+
+
+def predict_qpoint_wall_time(
+    model: dict, number_of_atoms: int, number_of_irreps: float, number_of_k_points: int, number_of_cores: int
+) -> float:
+    """Return the wall time in seconds of a single q-point predicted by the model.
+
+    :param model: the model as returned by ``fit_cost_model``.
+    :param number_of_atoms: the number of atoms in the unit cell.
+    :param number_of_irreps: the number of irreducible representations of the q-point.
+    :param number_of_k_points: the number of k-points of the parent ``PwCalculation``.
+    :param number_of_cores: the number of cores of the calculation.
+    """
+    features = _get_features(number_of_atoms, number_of_irreps, number_of_k_points, number_of_cores)
+    return float(numpy.exp(numpy.dot(model['coefficients'], features)))
+
+
+def get_default_cache_filepath() -> pathlib.Path:
+    """Return the default filepath of the cached model, which is specific to the loaded profile."""
+    from aiida.manage import get_manager
+    from aiida.manage.configuration import get_config
+
+    profile = get_manager().get_profile()
+    return pathlib.Path(get_config().dirpath) / 'aiida-quantumespresso-ph' / f'ph_cost_model_{profile.name}.json'
+
+
+def get_cost_model(
+    filepath: Union[str, pathlib.Path, None] = None,
+    max_age: float = MAX_AGE_SECONDS,
+    refresh: bool = False
+) -> Optional[dict]:
+    """Return the model of the wall time per q-point, fitted on the history of the database and cached on disk.
+
+    :param filepath: the filepath of the cache, by default a file in the AiiDA configuration folder.
+    :param max_age: the age in seconds after which the cached model is fitted again.
+    :param refresh: fit the model again, regardless of the cache.
+    :return: the model as returned by ``fit_cost_model`` or ``None`` if there are not enough samples.
+    """
+    filepath = pathlib.Path(filepath) if filepath is not None else get_default_cache_filepath()
+
+    if not refresh and filepath.exists():
+        try:
+            model = json.loads(filepath.read_text())
+        except (OSError, ValueError):
+            model = None
+
+        if model is not None and time.time() - model.get('created', 0) < max_age:
+            return model if model.get('coefficients') else None
+
+    model = fit_cost_model(query_ph_history())
+
+    # Also cache the absence of a model, such that the database is not queried every time
+    filepath.parent.mkdir(parents=True, exist_ok=True)
+    filepath.write_text(json.dumps(model or {'created': time.time()}))
+
+    return model
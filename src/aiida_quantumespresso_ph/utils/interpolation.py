@@ -0,0 +1,311 @@
+# -*- coding: utf-8 -*-
+"""Utilities to interpolate the phonons of a grid of dynamical matrices in process, as ``q2r.x`` and ``matdyn.x`` do.
+
+The dynamical matrices of all q-points of the grid are Fourier transformed to the real-space force constants, which are
+assigned to the periodic images of the supercell of the grid with the Wigner-Seitz weights used by ``matdyn.x``. The
+dynamical matrices at any q-point are then obtained by the inverse Fourier transform and diagonalized in batches. If the
+dielectric tensor and the Born effective charges are present, the long-range dipole-dipole part of the dynamical
+matrices is subtracted before the transform and added back after the interpolation, as the ``rgd_blk`` routine of
+Quantum ESPRESSO does, and the non-analytic term is added at the Gamma point of a path.
+
+All quantities are in the Rydberg atomic units and the alat units of the dynamical matrix files, except for the
+frequencies, which are in cm^-1.
+"""
+import itertools
+from typing import Optional, Tuple
+
+import numpy
+
+E2 = 2.0
+RY_TO_CMM1 = 109737.31568160
+ASR_TYPES = ('no', 'simple')
+DIPOLE_ALPHA = 1.0
+DIPOLE_GMAX = 14.0
+WIGNER_SEITZ_TOLERANCE = 1.0e-6
+MESH_TOLERANCE = 1.0e-4
+
+
+def get_force_constants(dynamical_matrices, asr: str = 'simple') -> dict:
+    """Return the real-space force constants of the dynamical matrices of a grid of q-points.
+
+    :param dynamical_matrices: the ``DynamicalMatrixData`` with the dynamical matrices of all q-points of the grid.
+    :param asr: the acoustic sum rule to impose, either ``no`` or ``simple``, as the ``asr`` input of ``matdyn.x``.
+    :return: dictionary with the arrays that define the force constants: the ``lattice_vectors`` of the periodic images
+        in crystal coordinates, the ``force_constants`` with shape ``(number of images, 3 * nat, 3 * nat)`` weighted
+        with the Wigner-Seitz weights, the ``cell``, its ``volume`` in bohr^3, the ``positions`` and ``masses`` of the
+        atoms and, if present, the ``dielectric_tensor`` and the ``born_charges`` with the acoustic sum rule imposed.
+    :raises ValueError: if the acoustic sum rule is not supported or the dynamical matrices do not cover the grid.
+    """
+    if asr not in ASR_TYPES:
+        raise ValueError(f'the acoustic sum rule `{asr}` is not one of {ASR_TYPES}.')
+
+    mesh = numpy.array(dynamical_matrices.mesh)
+    number_of_atoms = dynamical_matrices.number_of_atoms
+    size = 3 * number_of_atoms
+    context = {
+        'cell': dynamical_matrices.get_cell(),
+        'positions': dynamical_matrices.get_array('positions'),
+        'masses': dynamical_matrices.get_masses(),
+    }
+    context['volume'] = abs(numpy.linalg.det(context['cell'])) * dynamical_matrices.base.attributes.get('celldm')[0]**3
+    dielectric_tensor = dynamical_matrices.get_dielectric_tensor()
+    born_charges = dynamical_matrices.get_born_charges()
+
+    if dielectric_tensor is not None and born_charges is not None:
+        context['dielectric_tensor'] = dielectric_tensor
+        context['born_charges'] = born_charges - born_charges.mean(axis=0) if asr != 'no' else born_charges
+
+    grid = numpy.zeros((*mesh, size, size), dtype=complex)
+    filled = numpy.zeros(mesh, dtype=bool)
+    stars = [dynamical_matrices.get_star(number) for number in range(1, dynamical_matrices.number_of_qpoints + 1)]
+    qpoints = numpy.concatenate([qpoints for qpoints, _ in stars])
+    matrices = numpy.concatenate([matrices for _, matrices in stars])
+
+    # The dynamical matrix at -q is the complex conjugate of the one at q, if -q is not in the star of q
+    scaled = qpoints @ context['cell'].T * mesh
+
+    if numpy.any(numpy.abs(scaled - numpy.rint(scaled)) > MESH_TOLERANCE):
+        raise ValueError('the q-points of the dynamical matrices are not on the q-point mesh.')
+
+    for indices, values in ((numpy.rint(scaled), matrices), (-numpy.rint(scaled), matrices.conj())):
+        indices = tuple((indices.astype(int) % mesh).T)
+        missing = ~filled[indices]
+        grid[tuple(index[missing] for index in indices)] = values[missing]
+        filled[indices] = True
+
+    if not filled.all():
+        raise ValueError('the dynamical matrices do not cover all the q-points of the mesh.')
+
+    if 'born_charges' in context:
+        fractional = numpy.indices(mesh).reshape(3, -1).T / mesh
+        grid -= get_dipole_matrices(context, fractional).reshape(grid.shape)
+
+    forces = numpy.fft.ifftn(grid, axes=(0, 1, 2)).real.reshape(-1, number_of_atoms, 3, number_of_atoms, 3)
+
+    if asr == 'simple':
+        atoms = numpy.arange(number_of_atoms)
+        forces[0, atoms, :, atoms, :] -= forces.sum(axis=(0, 3))
+
+    context.update(_get_wigner_seitz_force_constants(forces, mesh, context['cell'], context['positions']))
+
+    return context
+
+
+def _get_wigner_seitz_force_constants(forces, mesh, cell, positions) -> dict:
+    """Assign the force constants of each lattice vector of the grid to its periodic images in the Wigner-Seitz cell.
+
+    For each pair of atoms, the force constants of a lattice vector ``R`` are assigned to the images ``R + T`` of the
+    supercell of the grid that minimize the distance ``|R + T + tau_a - tau_b|``, with equal weights for equidistant
+    images, as the ``wsweight`` routine of ``matdyn.x``.
+    """
+    number_of_atoms = len(positions)
+    vectors = numpy.indices(mesh).reshape(3, -1).T
+    images = numpy.array(list(itertools.product(range(-2, 3), repeat=3))) * mesh
+    lattice = vectors[:, None, :] + images[None, :, :]
+    cartesian = lattice @ cell
+    entries = []
+
+    for atom in range(number_of_atoms):
+        offsets = positions[atom] - positions
+        distances = numpy.linalg.norm(cartesian[None] + offsets[:, None, None, :], axis=-1)
+        nearest = distances <= distances.min(axis=-1, keepdims=True) + WIGNER_SEITZ_TOLERANCE
+        weights = nearest / nearest.sum(axis=-1, keepdims=True)
+        other, vector, image = numpy.nonzero(nearest)
+        entries.append((numpy.full(len(other), atom), other, vector, image, weights[other, vector, image]))
+
+    atom_a, atom_b, vector, image, weights = (numpy.concatenate(values) for values in zip(*entries))
+    lattice_vectors, inverse = numpy.unique(lattice[vector, image], axis=0, return_inverse=True)
+    force_constants = numpy.zeros((len(lattice_vectors), number_of_atoms, 3, number_of_atoms, 3))
+    blocks = weights[:, None, None] * forces[vector, atom_a, :, atom_b, :]
+    numpy.add.at(force_constants, (inverse.ravel(), atom_a, slice(None), atom_b, slice(None)), blocks)
+
+    return {
+        'lattice_vectors': lattice_vectors,
+        'force_constants': force_constants.reshape(len(lattice_vectors), 3 * number_of_atoms, 3 * number_of_atoms),
+    }
+
+
+def get_dipole_matrices(force_constants: dict, qpoints: numpy.ndarray, chunk_size: int = 32) -> numpy.ndarray:
+    """Return the long-range dipole-dipole part of the dynamical matrices, as the ``rgd_blk`` routine of ``matdyn.x``.
+
+    :param force_constants: the dictionary returned by ``get_force_constants`` or one with the same ``cell``,
+        ``volume``, ``positions``, ``dielectric_tensor`` and ``born_charges``.
+    :param qpoints: the q-points in crystal coordinates with shape ``(nq, 3)``.
+    :param chunk_size: the number of q-points of which the terms of all reciprocal lattice vectors are computed at once.
+    :return: the complex matrices with shape ``(nq, 3 * nat, 3 * nat)``.
+    """
+    cell = force_constants['cell']
+    positions = force_constants['positions']
+    epsilon = force_constants['dielectric_tensor']
+    charges = force_constants['born_charges']
+    number_of_atoms = len(positions)
+    size = 3 * number_of_atoms
+    reciprocal = numpy.linalg.inv(cell).T
+    factor = E2 * 4 * numpy.pi / force_constants['volume']
+
+    # Reciprocal lattice vectors for which the Gaussian damping factor is above ``exp(-DIPOLE_GMAX)``
+    cutoff = numpy.sqrt(4 * DIPOLE_ALPHA * DIPOLE_GMAX)
+    limits = (cutoff / numpy.linalg.norm(reciprocal, axis=1)).astype(int) + 1
+    gvectors = numpy.array(list(itertools.product(*(range(-limit, limit + 1) for limit in limits)))) @ reciprocal
+
+    def get_terms(vectors):
+        """Return the damped prefactor and the phased charges of each wave vector ``q + G``."""
+        products = numpy.einsum('...i,ij,...j->...', vectors, epsilon, vectors)
+        valid = (products > 0) & (products / DIPOLE_ALPHA / 4 < DIPOLE_GMAX)
+        safe = numpy.where(valid, products, 1.)
+        prefactors = numpy.where(valid, factor * numpy.exp(-safe / DIPOLE_ALPHA / 4) / safe, 0.)
+        phases = numpy.exp(2j * numpy.pi * numpy.einsum('...j,aj->...a', vectors, positions))
+        return prefactors, numpy.einsum('...j,aji->...ai', vectors, charges) * phases[..., None]
+
+    # The q-independent term on the diagonal blocks that makes the dipole part satisfy the acoustic sum rule
+    prefactors, phased = get_terms(gvectors)
+    on_site = numpy.einsum('g,gai,gj->aij', prefactors, phased, phased.conj().sum(axis=1)).real
+    diagonal = numpy.zeros((number_of_atoms, 3, number_of_atoms, 3))
+    diagonal[numpy.arange(number_of_atoms), :, numpy.arange(number_of_atoms), :] = on_site
+    diagonal = diagonal.reshape(size, size)
+
+    cartesian = numpy.asarray(qpoints, dtype=float).reshape(-1, 3) @ reciprocal
+    matrices = numpy.empty((len(cartesian), size, size), dtype=complex)
+
+    for start in range(0, len(cartesian), chunk_size):
+        prefactors, phased = get_terms(cartesian[start:start + chunk_size, None, :] + gvectors[None, :, :])
+        chunk = numpy.einsum('qg,qgai,qgbj->qaibj', prefactors, phased, phased.conj())
+        matrices[start:start + chunk_size] = chunk.reshape(-1, size, size) - diagonal
+
+    return matrices
+
+
+def get_nonanalytic_matrix(force_constants: dict, direction: numpy.ndarray) -> numpy.ndarray:
+    """Return the non-analytic term of the dynamical matrix at the Gamma point for a direction of approach.
+
+    :param force_constants: the dictionary returned by ``get_force_constants``.
+    :param direction: the direction in crystal coordinates of reciprocal space.
+    """
+    cartesian = numpy.asarray(direction, dtype=float) @ numpy.linalg.inv(force_constants['cell']).T
+    cartesian = cartesian / numpy.linalg.norm(cartesian)
+    charges = numpy.einsum('j,aji->ai', cartesian, force_constants['born_charges']).ravel()
+    factor = E2 * 4 * numpy.pi / force_constants['volume']
+    return factor * numpy.outer(charges, charges) / (cartesian @ force_constants['dielectric_tensor'] @ cartesian)
+
+
+def get_dynamical_matrices(
+    force_constants: dict,
+    qpoints: numpy.ndarray,
+    directions: Optional[numpy.ndarray] = None,
+    chunk_size: int = 256
+) -> numpy.ndarray:
+    """Return the dynamical matrices interpolated at a list of q-points.
+
+    :param force_constants: the dictionary returned by ``get_force_constants``.
+    :param qpoints: the q-points in crystal coordinates with shape ``(nq, 3)``.
+    :param directions: optional directions in crystal coordinates with the same shape as the q-points. The non-analytic
+        term is added to the dynamical matrices at the Gamma point for the directions that are not zero.
+    :param chunk_size: the number of q-points of which the Fourier transform is computed at once, which bounds the size
+        of the array of phase factors.
+    :return: the complex matrices with shape ``(nq, 3 * nat, 3 * nat)``.
+    """
+    qpoints = numpy.asarray(qpoints, dtype=float).reshape(-1, 3)
+    lattice_vectors = force_constants['lattice_vectors']
+    matrices = numpy.empty((len(qpoints), *force_constants['force_constants'].shape[1:]), dtype=complex)
+
+    for start in range(0, len(qpoints), chunk_size):
+        phases = numpy.exp(-2j * numpy.pi * qpoints[start:start + chunk_size] @ lattice_vectors.T)
+        matrices[start:start + chunk_size] = numpy.einsum('ql,lij->qij', phases, force_constants['force_constants'])
+
+    if 'born_charges' in force_constants:
+        matrices += get_dipole_matrices(force_constants, qpoints)
+
+        for index in numpy.flatnonzero(numpy.all(numpy.abs(qpoints) < 1e-8, axis=1)):
+            if directions is not None and numpy.any(directions[index]):
+                matrices[index] += get_nonanalytic_matrix(force_constants, directions[index])
+
+    return matrices
+
+
+def get_frequencies(
+    force_constants: dict,
+    qpoints: numpy.ndarray,
+    directions: Optional[numpy.ndarray] = None,
+    chunk_size: int = 256
+) -> numpy.ndarray:
+    """Return the phonon frequencies in cm^-1 at a list of q-points, where imaginary frequencies are negative.
+
+    :param force_constants: the dictionary returned by ``get_force_constants``.
+    :param qpoints: the q-points in crystal coordinates with shape ``(nq, 3)``.
+    :param directions: optional directions of the non-analytic term at the Gamma point, see ``get_dynamical_matrices``.
+    :param chunk_size: the number of q-points of which the dynamical matrices are built and diagonalized at once.
+    :return: the frequencies sorted in ascending order with shape ``(nq, 3 * nat)``.
+    """
+    qpoints = numpy.asarray(qpoints, dtype=float).reshape(-1, 3)
+    sqrt_masses = numpy.sqrt(numpy.repeat(force_constants['masses'], 3))
+    scaling = numpy.outer(sqrt_masses, sqrt_masses)
+    frequencies = numpy.empty((len(qpoints), len(sqrt_masses)))
+
+    for start in range(0, len(qpoints), chunk_size):
+        chunk = slice(start, start + chunk_size)
+        chunk_directions = directions[chunk] if directions is not None else None
+        matrices = get_dynamical_matrices(force_constants, qpoints[chunk], chunk_directions, chunk_size) / scaling
+        eigenvalues = numpy.linalg.eigvalsh((matrices + matrices.conj().transpose(0, 2, 1)) / 2)
+        frequencies[chunk] = numpy.sign(eigenvalues) * numpy.sqrt(numpy.abs(eigenvalues)) * RY_TO_CMM1
+
+    return frequencies
+
+
+def get_path_directions(qpoints: numpy.ndarray) -> numpy.ndarray:
+    """Return the directions along which a path of q-points approaches each of its q-points, as ``matdyn.x`` does.
+
+    The direction of the first q-point is the one towards the second q-point, the direction of the others is the one
+    from the previous q-point.
+
+    :param qpoints: the q-points of the path in crystal coordinates with shape ``(nq, 3)``.
+    """
+    qpoints = numpy.asarray(qpoints, dtype=float).reshape(-1, 3)
+    directions = numpy.zeros_like(qpoints)
+    directions[1:] = qpoints[1:] - qpoints[:-1]
+
+    if len(qpoints) > 1:
+        directions[0] = qpoints[1] - qpoints[0]
+
+    return directions
+
+
+def get_smearing(parameters: dict) -> Tuple[float, float]:
+    """Return the spacing of the frequency grid and the width of the Gaussian smearing of the DOS in cm^-1.
+
+    The spacing is the ``deltaE`` and the width the ``degauss`` of the ``INPUT`` namelist of ``matdyn.x``.
+
+    :param parameters: the parameters of ``matdyn.x`` with the ``INPUT`` namelist.
+    :raises ValueError: if ``degauss`` is not larger than zero, in which case ``matdyn.x`` uses the tetrahedron method,
+        which is not implemented.
+    """
+    namelist = parameters.get('INPUT', {})
+    degauss = namelist.get('degauss', 0.0)
+
+    if not degauss > 0:
+        raise ValueError(f'the tetrahedron method is not implemented, `degauss` should be larger than zero: {degauss}')
+
+    return namelist.get('deltaE', 1.0), degauss
+
+
+def get_density_of_states(
+    frequencies: numpy.ndarray, step: float = 1.0, smearing: float = 2.0, chunk_size: int = 4096
+) -> tuple:
+    """Return the phonon density of states of the frequencies on a uniform grid with a Gaussian smearing.
+
+    :param frequencies: the frequencies in cm^-1 of all q-points of a uniform grid with shape ``(nq, 3 * nat)``.
+    :param step: the spacing of the frequency grid in cm^-1, as the ``deltaE`` input of ``matdyn.x``.
+    :param smearing: the width of the Gaussian smearing in cm^-1.
+    :param chunk_size: the number of frequencies of which the Gaussians are evaluated at once.
+    :return: tuple with the frequency grid and the density of states, normalized to the number of modes.
+    """
+    frequencies = numpy.asarray(frequencies, dtype=float)
+    values = frequencies.ravel()
+    minimum, maximum = values.min(), values.max()
+    grid = minimum + step * numpy.arange(int(round((maximum - minimum) / step + 1.51)))
+    density = numpy.zeros_like(grid)
+
+    for start in range(0, len(values), chunk_size):
+        arguments = (grid[:, None] - values[None, start:start + chunk_size]) / smearing
+        density += numpy.exp(-arguments**2).sum(axis=1)
+
+    return grid, density / (numpy.sqrt(numpy.pi) * smearing * len(frequencies))
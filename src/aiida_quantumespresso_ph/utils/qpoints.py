@@ -0,0 +1,236 @@
+# -*- coding: utf-8 -*-
+"""Utilities to generate the irreducible q-points of a ``ph.x`` calculation without running ``ph.x``.
+
+The functions in this module reproduce the algorithm of ``ph.x`` to generate the irreducible q-points of a uniform grid,
+such that the q-points are returned in the same order and with the same coordinates. First, the grid is reduced with
+the symmetries of the Bravais lattice by the ``kpoint_grid`` routine. Then, the q-points that are no longer equivalent
+for the symmetries of the crystal are added by the ``irreducible_BZ`` routine.
+"""
+from typing import List, Sequence, Tuple
+
+import numpy
+
+EPSILON = 1.0e-5
+
+
+def _nint(values):
+    """Round to the nearest integer with halves rounded away from zero, like the Fortran ``nint`` intrinsic."""
+    values = numpy.asarray(values, dtype=float)
+    return numpy.sign(values) * numpy.floor(numpy.abs(values) + 0.5)
+
+
+def _is_integer(values) -> bool:
+    """Return whether all the values are integer within the tolerance used by ``ph.x``."""
+    return bool(numpy.all(numpy.abs(values - _nint(values)) < EPSILON))
+
+
+def get_symmetry_rotations(parameters: dict, cell: Sequence[Sequence[float]]) -> Tuple[numpy.ndarray, int]:
+    """Return the rotations of the symmetries of the Bravais lattice as used by ``pw.x`` and ``ph.x``.
+
+    The symmetries are taken from the ``output_parameters`` of a ``PwCalculation``, where the crystal symmetries are
+    listed first, followed by the remaining symmetries of the lattice, in the same order as in Quantum ESPRESSO.
+
+    :param parameters: the ``output_parameters`` of the ``PwCalculation`` as a dictionary.
+    :param cell: the cell of the structure of the ``PwCalculation``.
+    :return: tuple with the rotations that act on the crystal coordinates of reciprocal space vectors as an integer
+        array of shape ``(nrot, 3, 3)`` and the number of crystal symmetries.
+    :raises ValueError: if the symmetries are not present or contain time-reversal operations.
+    """
+    from aiida_quantumespresso.parsers.parse_raw.pw import get_symmetry_mapping
+
+    symmetries = parameters.get('symmetries', [])
+    lattice_symmetries = parameters.get('lattice_symmetries', [])
+
+    if not symmetries:
+        raise ValueError('the output parameters do not contain the symmetries of the crystal.')
+
+    if parameters.get('non_colinear_calculation', False) and parameters.get('do_magnetization', False):
+        raise ValueError('noncollinear magnetic calculations are not supported.')
+
+    cell = numpy.array(cell)
+    cell_inverse = numpy.linalg.inv(cell)
+    mapping = get_symmetry_mapping()
+    rotations = []
+
+    for symmetry in symmetries + lattice_symmetries:
+        if 'symmetry_number' in symmetry:
+            mapped = mapping[symmetry['symmetry_number']]
+            cartesian = numpy.array(mapped['matrix']) * (-1 if mapped['inversion'] else 1)
+        else:
+            # The full symmetry is stored if it could not be mapped, with the rotation in crystal coordinates
+            symmetry = symmetry.get('all_symmetries', symmetry)
+            cartesian = cell.T @ numpy.array(symmetry['rotation']) @ cell_inverse.T
+
+        if str(symmetry.get('t_rev', '0')) == '1':
+            raise ValueError('symmetries with time reversal are not supported.')
+
+        # A cartesian rotation ``R`` of real space acts as its inverse, i.e. transpose, on crystal coordinates of k
+        rotations.append(_nint(cell @ cartesian.T @ cell_inverse).astype(int))
+
+    return numpy.array(rotations), len(symmetries)
+
+
+def kpoint_grid(rotations: numpy.ndarray, mesh: Sequence[int], time_reversal: bool = True) -> numpy.ndarray:
+    """Return the points of an unshifted uniform grid that are irreducible for the given rotations.
+
+    This reproduces the ``kpoint_grid`` routine of Quantum ESPRESSO: the first point of each set of equivalent points is
+    kept and brought back into the first Brillouin zone.
+
+    :param rotations: the rotations that act on crystal coordinates of reciprocal space, as returned by
+        ``get_symmetry_rotations``.
+    :param mesh: the number of points of the grid along each reciprocal lattice vector.
+    :param time_reversal: whether ``k`` and ``-k`` are equivalent.
+    :return: the irreducible points in crystal coordinates.
+    """
+    mesh = numpy.array(mesh)
+    grid = numpy.array([[i, j, k] for i in range(mesh[0]) for j in range(mesh[1]) for k in range(mesh[2])]) / mesh
+    equivalent = numpy.arange(len(grid))
+    signs = (1, -1) if time_reversal else (1,)
+
+    for index, point in enumerate(grid):
+
+        if equivalent[index] != index:
+            continue
+
+        for rotation in rotations:
+            rotated = rotation @ point
+            rotated -= _nint(rotated)
+
+            for sign in signs:
+                coordinates = sign * rotated * mesh
+
+                if not _is_integer(coordinates):
+                    continue
+
+                i, j, k = numpy.mod(_nint(coordinates).astype(int) + 2 * mesh, mesh)
+                image = (i * mesh[1] + j) * mesh[2] + k
+
+                if image > index and equivalent[image] == image:
+                    equivalent[image] = index
+
+    irreducible = grid[equivalent == numpy.arange(len(grid))]
+
+    return irreducible - _nint(irreducible)
+
+
+def get_cosets(rotations: numpy.ndarray, nsym: int) -> List[int]:
+    """Return the indices of the rotations sorted in the cosets of the subgroup formed by the first ``nsym`` rotations.
+
+    This reproduces the ``coset`` routine of Quantum ESPRESSO, where the first element of each coset is the rotation
+    with the lowest index that is not part of one of the previous cosets.
+
+    :param rotations: the rotations of the group.
+    :param nsym: the number of rotations of the subgroup, which should be the first ones.
+    :return: list with the indices of the rotations, where each consecutive block of ``nsym`` indices forms a coset.
+    :raises ValueError: if the rotations do not form a group of which the first ``nsym`` form a subgroup.
+    """
+    nrot = len(rotations)
+    table = numpy.full((nrot, nrot), -1)
+
+    for i, rotation_i in enumerate(rotations):
+        for j, rotation_j in enumerate(rotations):
+            product = rotation_j @ rotation_i
+            matches = [k for k, rotation_k in enumerate(rotations) if numpy.array_equal(rotation_k, product)]
+
+            if not matches:
+                raise ValueError('the rotations do not form a group.')
+
+            table[i, j] = matches[0]
+
+    cosets = list(range(nsym))
+    done = [index < nsym for index in range(nrot)]
+
+    for index in range(nrot):
+        if not done[index]:
+            for element in table[index, cosets[:nsym]]:
+                cosets.append(element)
+                done[element] = True
+
+    if len(cosets) != nrot or nrot % nsym:
+        raise ValueError(f'the first {nsym} rotations do not form a subgroup.')
+
+    return cosets
+
+
+def irreducible_bz(
+    rotations: numpy.ndarray, nsym: int, kpoints: numpy.ndarray, time_reversal: bool = True
+) -> numpy.ndarray:
+    """Extend the points that are irreducible for the full group to those irreducible for the subgroup.
+
+    This reproduces the ``irrek`` routine of Quantum ESPRESSO: for each point, its images for the first rotation of each
+    coset are added at the end of the list, unless they are equivalent by a rotation of the subgroup to an image of a
+    previous coset.
+
+    :param rotations: the rotations of the full group, where the first ``nsym`` form the subgroup.
+    :param nsym: the number of rotations of the subgroup.
+    :param kpoints: the points that are irreducible for the full group, in crystal coordinates.
+    :param time_reversal: whether ``k`` and ``-k`` are equivalent.
+    :return: the points that are irreducible for the subgroup, in crystal coordinates.
+    """
+    cosets = get_cosets(rotations, nsym)
+    number_of_cosets = len(rotations) // nsym
+    irreducible = list(kpoints)
+
+    for kpoint in kpoints:
+        images = [rotations[index] @ kpoint for index in cosets]
+        weights = []
+
+        for coset in range(number_of_cosets):
+            image = images[coset * nsym]
+            equivalent = False
+
+            for previous in range(coset):
+                for other in images[previous * nsym:(previous + 1) * nsym]:
+                    symmetric = _is_integer(image - other) or (time_reversal and _is_integer(image + other))
+                    equivalent = equivalent or symmetric
+
+                    if symmetric and weights[previous] != 0:
+                        weights[previous] += 1
+                        break
+                else:
+                    continue
+                break
+
+            weights.append(0 if equivalent else 1)
+
+        irreducible.extend(images[coset * nsym] for coset in range(1, number_of_cosets) if weights[coset])
+
+    return numpy.array(irreducible)
+
+
+def get_irreducible_qpoints(parameters: dict, cell: Sequence[Sequence[float]], mesh: Sequence[int]) -> numpy.ndarray:
+    """Return the irreducible q-points of a uniform grid in the order and with the coordinates used by ``ph.x``.
+
+    :param parameters: the ``output_parameters`` of the parent ``PwCalculation`` as a dictionary.
+    :param cell: the cell of the structure of the ``PwCalculation`` in angstrom.
+    :param mesh: the number of q-points of the grid along each reciprocal lattice vector.
+    :return: the irreducible q-points in cartesian coordinates in inverse angstrom, with the Gamma point first.
+    :raises ValueError: if the symmetries are not present or not supported.
+    """
+    rotations, nsym = get_symmetry_rotations(parameters, cell)
+    time_reversal = parameters.get('time_reversal_flag', True) and not parameters.get('do_not_use_time_reversal')
+
+    qpoints = kpoint_grid(rotations, mesh, time_reversal)
+    qpoints = irreducible_bz(rotations, nsym, qpoints, time_reversal)
+
+    return 2 * numpy.pi * qpoints @ numpy.linalg.inv(numpy.array(cell)).T
+
+
+def get_number_of_qpoints(parameters: dict, cell: Sequence[Sequence[float]], qpoints) -> int:
+    """Return the number of q-points that ``ph.x`` computes for the given q-points.
+
+    :param parameters: the ``output_parameters`` of the parent ``PwCalculation`` as a dictionary.
+    :param cell: the cell of the structure of the ``PwCalculation`` in angstrom.
+    :param qpoints: a ``KpointsData`` with either a mesh or an explicit list of q-points.
+    :return: the number of irreducible q-points of a mesh, or the total number of points of the mesh if the symmetries
+        are not available, or the number of q-points of a list.
+    """
+    try:
+        mesh, _ = qpoints.get_kpoints_mesh()
+    except AttributeError:
+        return len(qpoints.get_kpoints())
+
+    try:
+        return len(get_irreducible_qpoints(parameters, cell, mesh))
+    except ValueError:
+        return int(numpy.prod(mesh))
@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+"""Utilities to query the state and the outputs of many process nodes at once.
+
+Loading a process node and accessing its state or one of its outputs costs a round-trip to the database each. For the
+thousands of child work chains of a large q-point grid, these are instead retrieved in bulk, with a single query for
+every ``QUERY_CHUNK_SIZE`` nodes, such that the number of values in the filter of a query remains bounded.
+"""
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from plumpy import ProcessState
+
+QUERY_CHUNK_SIZE = 1000
+TERMINATED_PROCESS_STATES = (ProcessState.FINISHED, ProcessState.EXCEPTED, ProcessState.KILLED)
+
+
+def _get_chunks(pks: Iterable[int]) -> List[List[int]]:
+    """Return the unique PKs split in chunks of at most ``QUERY_CHUNK_SIZE``."""
+    pks = sorted(set(pks))
+    return [pks[start:start + QUERY_CHUNK_SIZE] for start in range(0, len(pks), QUERY_CHUNK_SIZE)]
+
+
+def get_process_states(pks: Iterable[int]) -> Dict[int, Tuple[Optional[ProcessState], Optional[int]]]:
+    """Return the process state and the exit status of process nodes.
+
+    :param pks: the PKs of the process nodes.
+    :return: dictionary that maps each PK on a tuple of its ``ProcessState`` and its exit status, which are ``None`` if
+        they are not set yet.
+    """
+    from aiida import orm
+
+    project = ['id', f'attributes.{orm.ProcessNode.PROCESS_STATE_KEY}', f'attributes.{orm.ProcessNode.EXIT_STATUS_KEY}']
+    states = {}
+
+    for chunk in _get_chunks(pks):
+        filters = {'id': {'in': chunk}}
+        builder = orm.QueryBuilder()
+        builder.append(orm.ProcessNode, filters=filters, project=project)
+
+        for pk, process_state, exit_status in builder.iterall():
+            states[pk] = (ProcessState(process_state) if process_state else None, exit_status)
+
+    return states
+
+
+def is_finished_ok(state: Tuple[Optional[ProcessState], Optional[int]]) -> bool:
+    """Return whether a process state and exit status returned by ``get_process_states`` are those of a success.
+
+    :param state: tuple of the ``ProcessState`` and the exit status of a process node.
+    """
+    return state == (ProcessState.FINISHED, 0)
+
+
+def get_outputs(pks: Iterable[int], link_labels: Iterable[str]) -> Dict[int, dict]:
+    """Return the outputs with the given link labels of process nodes.
+
+    :param pks: the PKs of the process nodes.
+    :param link_labels: the link labels of the outputs.
+    :return: dictionary that maps each PK on a dictionary with its outputs by link label, which only contains the
+        outputs that exist.
+    """
+    from aiida import orm
+
+    pks = list(pks)
+    edge_filters = {'label': {'in': list(link_labels)}}
+    outputs = {pk: {} for pk in pks}
+
+    for chunk in _get_chunks(pks):
+        filters = {'id': {'in': chunk}}
+        builder = orm.QueryBuilder()
+        builder.append(orm.ProcessNode, filters=filters, project=['id'], tag='process')
+        builder.append(
+            orm.Data,
+            with_incoming='process',
+            edge_filters=edge_filters,
+            edge_project=['label'],
+            edge_tag='link',
+            project=['*'],
+            tag='output',
+        )
+
+        for result in builder.iterdict():
+            outputs[result['process']['id']][result['link']['label']] = result['output']['*']
+
+    return outputs
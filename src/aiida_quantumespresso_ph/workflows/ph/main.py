@@ -2,11 +2,25 @@
 """Workchain to perform a ph.x calculation with optional parallelization over q-points."""
 from aiida import orm
 from aiida.engine import WorkChain, if_
+from aiida.plugins import CalculationFactory
 from aiida_quantumespresso.workflows.ph.base import PhBaseWorkChain
 from aiida_quantumespresso.workflows.protocols.utils import ProtocolMixin
 
+from aiida_quantumespresso_ph.utils.history import (
+    estimate_number_of_irreps,
+    get_cost_model,
+    get_number_of_cores,
+    predict_qpoint_wall_time,
+)
+from aiida_quantumespresso_ph.utils.qpoints import get_number_of_qpoints
 from aiida_quantumespresso_ph.workflows.ph.parallelize_qpoints import PhParallelizeQpointsWorkChain
 
+create_kpoints_from_distance = CalculationFactory('quantumespresso.create_kpoints_from_distance')
+select_parallelization = CalculationFactory('quantumespresso_ph.select_parallelization')
+
+COST_MODEL_SAFETY_FACTOR = 2
+COST_MODEL_MIN_WALLCLOCK_SECONDS = 1800
+
 
 class PhWorkChain(WorkChain, ProtocolMixin):
     """Workchain that will run a Quantum Espresso ph.x calculation based on a previously completed pw.x calculation.
@@ -14,6 +28,18 @@ class PhWorkChain(WorkChain, ProtocolMixin):
     If specified through the 'parallelize_qpoints' boolean input parameter, the calculation will be parallelized over
     the provided q-points by running the `PhParallelizeQpointsWorkChain`. Otherwise a single `PhBaseWorkChain` will be
     launched that will compute every q-point serially.
+
+    If ``parallelize_qpoints`` is set to ``'auto'``, the time to solution of both modes is estimated, either with the
+    ``cost_model`` input or from the wall time of the parent ``PwCalculation``, and the fastest one is selected. The
+    decision and the estimates are returned in the ``parallelization`` output. Only the mode is selected: the scheduler
+    options of the ``ph`` namespace, including the ``max_wallclock_seconds``, are used for the ``PhBaseWorkChain`` in
+    serial as well as for each child work chain in parallel.
+
+    The outputs depend on the mode. In serial, the ``output_parameters`` are those of the ``PhBaseWorkChain``, with
+    the q-point and frequencies of each q-point in its ``dynamical_matrix_N`` entry. In parallel, they are merged over
+    the q-points, without the ``dynamical_matrix_N`` entries, and the q-points and frequencies are instead returned in
+    the ``frequencies`` output. With ``auto``, check the ``mode`` of the ``parallelization`` output, or the presence of
+    the ``frequencies`` output, before reading them.
     """
 
     @classmethod
@@ -21,9 +47,25 @@ class PhWorkChain(WorkChain, ProtocolMixin):
         """Define the process specification."""
         super().define(spec)
         spec.expose_inputs(PhBaseWorkChain, exclude=('only_initialization',))
-        spec.input('parallelize_qpoints', valid_type=orm.Bool, default=lambda: orm.Bool(False))
+        spec.input(
+            'parallelize_qpoints',
+            valid_type=(orm.Bool, orm.Str),
+            default=lambda: orm.Bool(False),
+            validator=cls.validate_parallelize_qpoints,
+            help='Whether to parallelize the calculation over the q-points, or `auto` to select the fastest mode based '
+            'on estimates of the time to solution of both.',
+        )
+        spec.input(
+            'cost_model',
+            valid_type=orm.Dict,
+            required=False,
+            help='The model of the wall time per q-point fitted on the history of `ph.x` calculations, as returned by '
+            '`aiida_quantumespresso_ph.utils.history.get_cost_model`, to estimate the time to solution with `auto`. '
+            'By default, it is estimated from the wall time of the parent `PwCalculation`.',
+        )
 
         spec.outline(
+            if_(cls.should_select_parallelization)(cls.select_parallelization,),
             if_(cls.should_run_parallel)(cls.run_parallel,).else_(
                 cls.run_serial,
             ),
@@ -33,9 +75,28 @@ class PhWorkChain(WorkChain, ProtocolMixin):
 
         spec.output('retrieved', valid_type=orm.FolderData)
         spec.output('output_parameters', valid_type=orm.Dict)
+        spec.output(
+            'frequencies',
+            valid_type=orm.ArrayData,
+            required=False,
+            help='The q-points and frequencies of the merged dynamical matrices, only when parallelized over q-points. '
+            'In serial, they are instead in the `dynamical_matrix_N` entries of the `output_parameters`.',
+        )
+        spec.output(
+            'parallelization',
+            valid_type=orm.Dict,
+            required=False,
+            help='The mode selected when `parallelize_qpoints` is `auto`, with the estimates on which it is based.',
+        )
 
         spec.exit_code(300, 'ERROR_CHILD_WORKCHAIN_FAILED', message='A child work chain failed.')
 
+    @staticmethod
+    def validate_parallelize_qpoints(value, _):
+        """Validate the ``parallelize_qpoints`` input."""
+        if isinstance(value, orm.Str) and value.value != 'auto':
+            return f'`parallelize_qpoints` should be a `Bool` or `auto`, but got: {value.value}'
+
     @classmethod
     def get_protocol_filepath(cls):
         """Return ``pathlib.Path`` to the ``.yaml`` file that defines the protocols."""
@@ -46,15 +107,24 @@ class PhWorkChain(WorkChain, ProtocolMixin):
 
     @classmethod
     def get_builder_from_protocol(
-        cls, code, parent_folder=None, protocol='moderate', overrides=None, options=None, **_
+        cls, code, parent_folder=None, protocol='moderate', overrides=None, options=None, use_cost_model=False, **_
     ):
         """Return a builder prepopulated with inputs selected according to the chosen protocol.
 
+        If ``use_cost_model`` is ``True`` and a ``parent_folder`` is given, the wall time of the calculation is
+        predicted with the cost model fitted on the history of ``PhCalculation``s in the database, see
+        ``aiida_quantumespresso_ph.utils.history``. The prediction is used to choose between the serial and the
+        parallel mode and to set the ``max_wallclock_seconds``, unless these are explicitly defined in the ``overrides``
+        or ``options``. If ``parallelize_qpoints`` is ``auto``, the model is instead passed as the ``cost_model`` input,
+        such that the work chain selects the mode with it. Note that this queries the database and writes the fitted
+        model to the AiiDA configuration folder if the cached model is missing or outdated.
+
         :param code: the ``Code`` instance configured for the ``quantumespresso.ph`` plugin.
         :param structure: the ``StructureData`` instance to use.
         :param protocol: protocol to use, if not specified, the default will be used.
         :param overrides: optional dictionary of inputs to override the defaults of the protocol.
         :param options: options for computational resources
+        :param use_cost_model: whether to use the cost model fitted on the history of the database.
         :return: a process builder instance with all inputs defined ready for launch.
         """
         inputs = cls.get_protocol_inputs(protocol, overrides)
@@ -66,16 +136,154 @@ class PhWorkChain(WorkChain, ProtocolMixin):
         data.pop('only_initialization', None)
 
         if 'parallelize_qpoints' in inputs:
-            data['parallelize_qpoints'] = orm.Bool(inputs['parallelize_qpoints'])
+            parallelize_qpoints = inputs['parallelize_qpoints']
+
+            if isinstance(parallelize_qpoints, str):
+                data['parallelize_qpoints'] = orm.Str(parallelize_qpoints)
+            else:
+                data['parallelize_qpoints'] = orm.Bool(parallelize_qpoints)
 
         builder = cls.get_builder()
         builder._data = data  # pylint: disable=protected-access
 
+        if parent_folder is not None and use_cost_model:
+            model = get_cost_model()
+
+            if model is None:
+                return builder
+
+            if 'parallelize_qpoints' in builder and builder.parallelize_qpoints.value == 'auto':
+                # The mode is then selected when the work chain runs, with the same wall time for the jobs of both modes
+                builder.cost_model = orm.Dict(model)
+                return builder
+
+            cls._set_inputs_from_cost_model(builder, model, parent_folder, overrides or {}, options or {})
+
         return builder
 
+    @staticmethod
+    def _set_inputs_from_cost_model(builder, model, parent_folder, overrides, options):
+        """Set the parallelization over q-points and the wall time of the builder from the predicted wall time.
+
+        The wall time of a q-point is predicted by the cost model, with the number of irreducible representations
+        estimated from the calculations it was fitted on, see ``estimate_number_of_irreps``. The calculation is
+        parallelized over the q-points if the predicted serial wall time exceeds the ``max_wallclock_seconds``, which is
+        only decided if the latter is defined. Nothing is changed if the parent calculation is missing information.
+
+        :param builder: the process builder of the ``PhWorkChain``.
+        :param model: the cost model as returned by ``get_cost_model``.
+        :param parent_folder: the ``RemoteData`` of the parent ``PwCalculation``.
+        :param overrides: the dictionary of inputs that override the defaults of the protocol.
+        :param options: the options for computational resources.
+        """
+        try:
+            pw_calculation = parent_folder.creator
+            parameters = pw_calculation.outputs.output_parameters.get_dict()
+            number_of_k_points = parameters['number_of_k_points']
+        except (AttributeError, KeyError):
+            return
+
+        try:
+            structure = pw_calculation.outputs.output_structure
+        except AttributeError:
+            structure = pw_calculation.inputs.structure
+
+        if 'qpoints' in builder:
+            qpoints = builder.qpoints
+        else:
+            qpoints = orm.KpointsData()
+            qpoints.set_cell_from_structure(structure)
+            force_parity = builder.qpoints_force_parity.value if 'qpoints_force_parity' in builder else False
+            qpoints.set_kpoints_mesh_from_density(builder.qpoints_distance.value, force_parity=force_parity)
+
+        number_of_qpoints = get_number_of_qpoints(parameters, structure.cell, qpoints)
+        ph_options = builder.ph.metadata.options  # pylint: disable=no-member
+        qpoint_wall_time = predict_qpoint_wall_time(
+            model, len(structure.sites), estimate_number_of_irreps(model, len(structure.sites)), number_of_k_points,
+            get_number_of_cores(ph_options.resources)
+        )
+        max_wallclock_seconds = ph_options.get('max_wallclock_seconds', None)
+        parallelize_qpoints = builder.parallelize_qpoints.value if 'parallelize_qpoints' in builder else False
+
+        if 'parallelize_qpoints' not in overrides and max_wallclock_seconds is not None:
+            serial_wall_time = COST_MODEL_SAFETY_FACTOR * number_of_qpoints * qpoint_wall_time
+            parallelize_qpoints = serial_wall_time > max_wallclock_seconds
+            builder.parallelize_qpoints = orm.Bool(parallelize_qpoints)
+
+        if 'max_wallclock_seconds' not in options:
+            wall_time = qpoint_wall_time if parallelize_qpoints else number_of_qpoints * qpoint_wall_time
+            wall_time = max(round(COST_MODEL_SAFETY_FACTOR * wall_time), COST_MODEL_MIN_WALLCLOCK_SECONDS)
+
+            if max_wallclock_seconds is not None:
+                wall_time = min(wall_time, max_wallclock_seconds)
+
+            ph_options.max_wallclock_seconds = wall_time
+
+    def should_select_parallelization(self):
+        """Return whether the mode should be selected based on the estimated time to solution."""
+        return isinstance(self.inputs.parallelize_qpoints, orm.Str)
+
+    def select_parallelization(self):
+        """Estimate the time to solution of the serial and the parallel mode and select the fastest one."""
+        parent_folder = self.inputs.ph.parent_folder
+
+        try:
+            pw_calculation = parent_folder.creator
+            parameters = pw_calculation.outputs.output_parameters
+        except AttributeError:
+            self.report('the parent calculation has no `output_parameters` to estimate the costs, running serially')
+            self.ctx.parallelization = 'serial'
+            return
+
+        try:
+            structure = pw_calculation.outputs.output_structure
+        except AttributeError:
+            structure = pw_calculation.inputs.structure
+
+        cost_model = self.inputs.get('cost_model', None)
+        required_key = 'number_of_k_points' if cost_model is not None else 'wall_time_seconds'
+
+        if required_key not in parameters.keys():
+            self.report(f'the parent calculation is missing `{required_key}` to estimate the costs, running serially')
+            self.ctx.parallelization = 'serial'
+            return
+
+        if 'qpoints' in self.inputs:
+            qpoints = self.inputs.qpoints
+        else:
+            inputs = {
+                'structure': structure,
+                'distance': self.inputs.qpoints_distance,
+                'force_parity': self.inputs.get('qpoints_force_parity', orm.Bool(False)),
+                'metadata': {
+                    'call_link_label': 'create_qpoints_from_distance'
+                }
+            }
+            qpoints = create_kpoints_from_distance(**inputs)
+
+        settings = {
+            'number_of_cores': get_number_of_cores(self.inputs.ph.metadata.options.resources),
+            'parent_number_of_cores': get_number_of_cores(pw_calculation.get_option('resources') or {}),
+        }
+        inputs = {'parameters': parameters, 'structure': structure, 'qpoints': qpoints, 'settings': orm.Dict(settings)}
+
+        if cost_model is not None:
+            inputs['cost_model'] = cost_model
+
+        parallelization = select_parallelization(**inputs)
+        self.ctx.parallelization = parallelization['mode']
+        self.out('parallelization', parallelization)
+        self.report(
+            f'estimated {parallelization["estimated_serial_seconds"]:.0f} s serially and '
+            f'{parallelization["estimated_parallel_seconds"]:.0f} s in parallel, running {parallelization["mode"]}'
+        )
+
     def should_run_parallel(self):
         """Return whether the calculation should be parallelized over the qpoints."""
-        return self.inputs.parallelize_qpoints
+        if self.should_select_parallelization():
+            return self.ctx.parallelization == 'parallel'
+
+        return self.inputs.parallelize_qpoints.value
 
     def run_parallel(self):
         """Run the ``PhParallelizeQpointsWorkChain``."""
@@ -100,4 +308,8 @@ class PhWorkChain(WorkChain, ProtocolMixin):
         retrieved = self.ctx.workchain.outputs.retrieved
         self.out('retrieved', retrieved)
         self.out('output_parameters', self.ctx.workchain.outputs.output_parameters)
+
+        if 'frequencies' in self.ctx.workchain.outputs:
+            self.out('frequencies', self.ctx.workchain.outputs.frequencies)
+
         self.report(f'workchain completed, output in {retrieved.__class__.__name__}<{retrieved.pk}>')
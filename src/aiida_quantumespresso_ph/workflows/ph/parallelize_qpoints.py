@@ -1,17 +1,49 @@
 # -*- coding: utf-8 -*-
 """Workchain to perform a ``PhBaseWorkChain`` with automatic parallelization over q-points."""
+import functools
+import os
+
 from aiida import orm
-from aiida.common import AttributeDict
-from aiida.engine import WorkChain, append_
+from aiida.common import AttributeDict, LinkType
+from aiida.engine import Awaitable, AwaitableAction, AwaitableTarget, WorkChain, if_, while_
 from aiida.plugins import CalculationFactory, WorkflowFactory
 import numpy
 
 from aiida_quantumespresso_ph.calculations.functions.merge_para_ph_outputs import merge_para_ph_outputs
+from aiida_quantumespresso_ph.data.dynamical_matrix import DynamicalMatrixData
+from aiida_quantumespresso_ph.utils.cost import (
+    calibrate_seconds_per_cost,
+    estimate_job_resources,
+    estimate_qpoint_costs,
+    get_irreps_from_retrieved,
+    split_irreps,
+)
+from aiida_quantumespresso_ph.utils.qpoints import get_symmetry_rotations
+from aiida_quantumespresso_ph.utils.query import (
+    TERMINATED_PROCESS_STATES,
+    get_outputs,
+    get_process_states,
+    is_finished_ok,
+)
 
 PhBaseWorkChain = WorkflowFactory('quantumespresso.ph.base')
+PhCalculation = CalculationFactory('quantumespresso.ph')
+batch_qpoints = CalculationFactory('quantumespresso_ph.batch_qpoints')
 distribute_qpoints = CalculationFactory('quantumespresso_ph.distribute_qpoints')
+generate_qpoints = CalculationFactory('quantumespresso_ph.generate_qpoints')
+parse_dynamical_matrices = CalculationFactory('quantumespresso_ph.parse_dynamical_matrices')
 recollect_qpoints = CalculationFactory('quantumespresso_ph.recollect_qpoints')
 
+SCHEDULER_TIER_OPTIONS = ('queue_name', 'priority', 'qos', 'account')
+# Only a calculation that shut down neatly leaves a scratch folder that can be recovered from. As in the
+# ``PhBaseWorkChain``, a calculation killed by the scheduler is not recovered from.
+WALLTIME_EXIT_STATUSES = (PhCalculation.exit_codes.ERROR_OUT_OF_WALLTIME.status,)  # pylint: disable=no-member
+CODE_POOL_SETTINGS_KEYS = ('capacity', 'speed', 'options')
+RESOURCES_MODEL_KEYS = (
+    'target_wallclock_seconds', 'max_num_machines', 'safety_factor', 'min_wallclock_seconds', 'max_wallclock_seconds',
+    'init_time_factor'
+)
+
 
 class PhParallelizeQpointsWorkChain(WorkChain):
     """Workchain to perform a ``PhBaseWorkChain`` with automatic parallelization over q-points.
@@ -19,6 +51,85 @@ class PhParallelizeQpointsWorkChain(WorkChain):
     This workchain differs from the ``PhBaseWorkChain`` in that the computation is parallelized over the q-points. For
     each individual q-point a separate ``PhBaseWorkChain`` is run. At the end, the computed dynamical matrices of each
     individual workchain are collected into a single ``FolderData`` as output.
+
+    Optionally, the q-points can be grouped in a fixed number of batches through the ``num_batches`` input. The cost of
+    each q-point is then estimated from the irreducible representations computed by the initialization run and the
+    q-points are distributed over the batches such that each batch has a similar total cost. A single
+    ``PhBaseWorkChain`` is run for each batch, which computes all its q-points. By default, the q-points of a batch are
+    computed one after the other. With the ``num_images`` input, they are instead computed concurrently by independent
+    groups of MPI processes, the images of ``ph.x``, within the single scheduler job of the batch. Once it finishes, a
+    second ``PhBaseWorkChain`` is restarted from its remote folder with the ``recover`` flag and without images, which
+    collects the dynamical matrices computed by all images.
+
+    For expensive q-points, the computation can be split further over the irreducible representations through the
+    ``max_irreps_per_job`` input. Each q-point with more irreducible representations is computed by several
+    ``PhBaseWorkChain``s, each for a range of at most this number of irreducible representations defined by the
+    ``start_irr`` and ``last_irr`` inputs of ``ph.x``. Afterwards, a final ``PhBaseWorkChain`` with the ``recover`` flag
+    collects the partial results of these work chains into the dynamical matrix of the q-point. These q-points are
+    excluded from the batches.
+
+    The initialization run can be skipped with the ``skip_initialization`` input, in which case the irreducible q-points
+    are generated from the symmetries of the parent ``PwCalculation``, following the same algorithm as ``ph.x``. The
+    computation of the q-points then starts immediately. Since the cost estimates and the number of irreducible
+    representations are only available from the initialization run, all q-points then have the same estimated cost and
+    cannot be split over their irreducible representations. With the ``verify_qpoints`` input, the initialization run is
+    still performed concurrently with the computation of the q-points, and its q-points are compared with the generated
+    ones before the dynamical matrices are collected.
+
+    To limit the number of jobs in the queue of the scheduler, the ``max_concurrent_qpoints`` input sets the maximum
+    number of child ``PhBaseWorkChain``s that run at the same time. The remaining ones are launched as soon as running
+    ones finish. The jobs are launched in order of decreasing estimated cost, such that the most expensive q-points do
+    not end up as stragglers. The ``scheduler_tiers`` input can be used to set a different queue or priority for the
+    jobs depending on their estimated cost. With the ``resources_model`` input, the wall time and number of machines of
+    each job are set from its estimated cost, calibrated on the wall time of the initialization run.
+
+    With the ``seed_from_initialization`` input, the child work chains of individual q-points are started from a copy of
+    the scratch folder of the initialization run with the ``recover`` flag. The q-point is then selected on the full
+    grid through the ``start_q`` and ``last_q`` inputs of ``ph.x``, such that the symmetry analysis, irreducible
+    representations and unperturbed setup are read instead of computed again.
+
+    When a child ``PhBaseWorkChain`` fails, its job is relaunched up to ``max_qpoint_retries`` times, optionally with
+    the different scheduler options of the ``retry_options`` input. The results of the other child work chains are kept.
+    If the last calculation of a failed child ran out of wall time and shut down neatly, its job is instead launched
+    again from its remote folder with the ``recover`` flag, up to ``max_walltime_recoveries`` times, such that the
+    irreducible representations that were already converged are kept. The wall time of the interrupted runs is added to
+    the merged output parameters. The ``PhBaseWorkChain`` already restarts such a calculation itself, so this only
+    happens once a child has exceeded its ``max_iterations``. The work chains of these recoveries run with a
+    ``max_iterations`` of one, such that each recovery is a single calculation and the total number of calculations of a
+    job is at most its ``max_iterations`` plus ``max_walltime_recoveries``.
+
+    The jobs can be spread over several ``ph.x`` codes, e.g. on different computers, with the ``code_pool`` input. The
+    ``code_pool_settings`` input defines the ``capacity``, i.e. the maximum number of concurrent jobs, the relative
+    ``speed`` and the scheduler ``options`` of each code, which take precedence over those set for the computer of the
+    ``ph.code`` with the ``scheduler_tiers`` and ``resources_model`` inputs. Each q-point or batch is assigned to the
+    code with free capacity on which it is expected to finish first, given the estimated cost of the jobs already
+    assigned to it. All jobs of a q-point, including the recovery and collection jobs, run on the same code. The parent
+    ``pw.x`` data has to be available on the computer of each code: for codes on another computer than the
+    ``ph.parent_folder``, a copy of it on that computer has to be passed in the ``code_pool_parent_folders`` namespace.
+
+    For high-throughput screening, the ``instability_threshold`` input aborts the work chain as soon as a finished child
+    work chain has a frequency below minus this threshold, i.e. an imaginary frequency that indicates that the structure
+    is dynamically unstable. The pending jobs are then dropped and the running child work chains are killed, after which
+    the dynamical matrices of the finished q-points are returned as partial results.
+
+    By default, the output parameters of all child work chains are merged once at the end. With the ``merge_chunk_size``
+    input, they are instead merged incrementally as the child work chains finish, each time this number of them has
+    finished, such that only a chunk of them is loaded at once. Each chunk is merged separately by a
+    ``merge_partial_outputs_N`` calculation function, whose outputs only grow with the chunk size and can be queried
+    while the work chain is running. These partial outputs are combined once at the end.
+
+    The ``recollect_qpoints`` and ``merge_para_ph_outputs`` calculation functions have an input link for each q-point or
+    batch. For thousands of them, the ``reduction_chunk_size`` input bounds this number: they are then called for chunks
+    with at most this number of input links, and again for chunks of their outputs, until a single call returns the
+    final output. The outputs of a ``merge_para_ph_outputs`` call are passed with two input links.
+
+    With the ``parse_dynamical_matrices`` input, the collected dynamical matrix files are also parsed into a
+    ``DynamicalMatrixData``, such that the complex dynamical matrices can be used without parsing the files again.
+
+    A work chain that did not complete can be continued by passing it as the ``restart_from`` input of a new one with
+    the same inputs. The initialization work chain and every child work chain that finished successfully are then
+    reused, such that only the missing q-points are computed. Since a process node cannot be an input, the work chain
+    that is restarted from is recorded in the ``restart_from`` extra, and the full chain of restarts is reported first.
     """
 
     @classmethod
@@ -26,43 +137,482 @@ class PhParallelizeQpointsWorkChain(WorkChain):
         """Define the process specification."""
         super().define(spec)
         spec.expose_inputs(PhBaseWorkChain, exclude=('only_initialization',))
+        spec.input(
+            'num_batches',
+            valid_type=orm.Int,
+            required=False,
+            validator=cls.validate_num_batches,
+            help='Group the q-points in this number of batches with a balanced computational cost, running a single '
+            '`PhBaseWorkChain` for each batch. By default, a separate `PhBaseWorkChain` is run for each q-point.',
+        )
+        spec.input(
+            'num_images',
+            valid_type=orm.Int,
+            required=False,
+            validator=cls.validate_num_images,
+            help='Compute the q-points of each batch concurrently in this number of images of `ph.x`, i.e. the '
+            '`-nimage` command line option, within the single scheduler job of the batch. The dynamical matrices of '
+            'the images are then collected by a second `PhBaseWorkChain` for each batch. Requires `num_batches`.',
+        )
+        spec.input(
+            'max_irreps_per_job',
+            valid_type=orm.Int,
+            required=False,
+            validator=cls.validate_max_irreps_per_job,
+            help='Split the computation of q-points with more irreducible representations than this number over '
+            'several `PhBaseWorkChain`s, each computing at most this number of irreducible representations.',
+        )
+        spec.input(
+            'max_concurrent_qpoints',
+            valid_type=orm.Int,
+            required=False,
+            validator=cls.validate_max_concurrent_qpoints,
+            help='The maximum number of child `PhBaseWorkChain`s that run at the same time. A new one is launched as '
+            'soon as a running one finishes. By default, all child work chains are launched at once.',
+        )
+        spec.input(
+            'max_qpoint_retries',
+            valid_type=orm.Int,
+            default=lambda: orm.Int(0),
+            help='The maximum number of times the job of a failed child `PhBaseWorkChain` is launched again. The work '
+            'chain only fails once a job has failed more than this number of times.',
+        )
+        spec.input(
+            'max_walltime_recoveries',
+            valid_type=orm.Int,
+            default=lambda: orm.Int(3),
+            help='The maximum number of times the job of a child `PhBaseWorkChain` whose calculations ran out of wall '
+            'time after its own restarts is launched again from its remote folder with the `recover` flag, each time '
+            'as a single calculation. These relaunches do not count as retries.',
+        )
+        spec.input(
+            'retry_options',
+            valid_type=orm.Dict,
+            required=False,
+            help='Scheduler options, e.g. `max_wallclock_seconds` or `resources`, that override those of the `ph` '
+            'namespace when the job of a failed child `PhBaseWorkChain` is launched again.',
+        )
+        spec.input(
+            'scheduler_tiers',
+            valid_type=orm.List,
+            required=False,
+            validator=cls.validate_scheduler_tiers,
+            help='List of dictionaries with scheduler options, i.e. `queue_name`, `priority`, `qos` or `account`, '
+            'ordered from the most to the least expensive jobs. The jobs, sorted by their estimated cost, are divided '
+            'in consecutive groups of equal size, one for each dictionary, whose options are set for its calculations.',
+        )
+        spec.input(
+            'resources_model',
+            valid_type=orm.Dict,
+            required=False,
+            validator=cls.validate_resources_model,
+            help='Set the `max_wallclock_seconds` and `num_machines` of each job from its estimated cost, calibrated '
+            'on the wall time of the initialization run. Requires the `target_wallclock_seconds` key, above which more '
+            'machines are requested, and optionally the keys `max_num_machines`, `safety_factor`, '
+            '`min_wallclock_seconds`, `max_wallclock_seconds` and `init_time_factor`.',
+        )
+        spec.input_namespace(
+            'code_pool',
+            valid_type=orm.AbstractCode,
+            dynamic=True,
+            required=False,
+            help='A pool of `ph.x` codes, e.g. on different computers, over which the jobs of the q-points are spread. '
+            'By default, all jobs run with the `ph.code`, which is always used for the initialization run.',
+        )
+        spec.input_namespace(
+            'code_pool_parent_folders',
+            valid_type=orm.RemoteData,
+            dynamic=True,
+            required=False,
+            help='The parent folder of the `pw.x` calculation on the computer of each code of the `code_pool` with the '
+            'same label. Required for the codes on another computer than the `ph.parent_folder`.',
+        )
+        spec.input(
+            'code_pool_settings',
+            valid_type=orm.Dict,
+            required=False,
+            validator=cls.validate_code_pool_settings,
+            help='Dictionary with the settings of the codes of the `code_pool` with the same label: the `capacity`, '
+            'i.e. the maximum number of jobs that run at the same time, the relative `speed`, by default 1, and the '
+            'scheduler `options` of its jobs, which override those of the `scheduler_tiers` and `resources_model`. By '
+            'default, the capacity of a code is not limited.',
+        )
+        spec.input(
+            'instability_threshold',
+            valid_type=orm.Float,
+            required=False,
+            validator=cls.validate_instability_threshold,
+            help='Abort the work chain as soon as a computed q-point has a frequency below minus this value, in cm^-1, '
+            'and return the results of the finished q-points. By default, all q-points are always computed.',
+        )
+        spec.input(
+            'merge_chunk_size',
+            valid_type=orm.Int,
+            required=False,
+            validator=cls.validate_merge_chunk_size,
+            help='Merge the output parameters of the finished child work chains incrementally, each time this number '
+            'of them has finished. By default, the output parameters of all child work chains are merged at the end.',
+        )
+        spec.input(
+            'reduction_chunk_size',
+            valid_type=orm.Int,
+            required=False,
+            validator=cls.validate_reduction_chunk_size,
+            help='Collect the dynamical matrices and merge the output parameters in a tree of calculation functions, '
+            'each with at most this number of input links for the q-points, batches or outputs of other calls, where '
+            'the `output_parameters` and `frequencies` of a call count as two. The shared inputs, such as the '
+            '`batches`, come on top. Should be at least four. By default, a single calculation function is called with '
+            'the outputs of all child work chains.',
+        )
+        spec.input(
+            'parse_dynamical_matrices',
+            valid_type=orm.Bool,
+            default=lambda: orm.Bool(False),
+            help='Parse the collected dynamical matrix files into the `dynamical_matrices` output.',
+        )
+        spec.input(
+            'skip_initialization',
+            valid_type=orm.Bool,
+            default=lambda: orm.Bool(False),
+            help='Generate the irreducible q-points from the symmetries of the parent `PwCalculation` instead of '
+            'running the initialization `PhBaseWorkChain`. Requires an unshifted q-point mesh.',
+        )
+        spec.input(
+            'verify_qpoints',
+            valid_type=orm.Bool,
+            default=lambda: orm.Bool(False),
+            help='When `skip_initialization` is `True`, still run the initialization `PhBaseWorkChain` concurrently '
+            'and verify that its q-points are identical to the generated ones.',
+        )
+        spec.input(
+            'seed_from_initialization',
+            valid_type=orm.Bool,
+            default=lambda: orm.Bool(False),
+            help='Start the child work chains of individual q-points from a copy of the scratch folder of the '
+            'initialization run with the `recover` flag, such that they do not repeat its setup. Batches of q-points '
+            'are not seeded.',
+        )
+        spec.input(
+            'restart_from',
+            valid_type=orm.WorkChainNode,
+            required=False,
+            non_db=True,
+            validator=cls.validate_restart_from,
+            help='A previous `PhParallelizeQpointsWorkChain` whose initialization work chain and successfully finished '
+            'child work chains are reused for the jobs with the same q-points and parameters.',
+        )
+        spec.inputs.validator = cls.validate_inputs
 
         spec.outline(
-            cls.run_ph_init,
-            cls.inspect_init,
-            cls.run_distribute_qpoints,
-            cls.run_ph_qgrid,
-            cls.inspect_qpoints,
+            cls.setup,
+            if_(cls.should_run_initialization)(
+                cls.run_ph_init,
+                cls.inspect_init,
+                cls.run_distribute_qpoints,
+            ).else_(
+                cls.run_generate_qpoints,
+            ),
+            cls.setup_ph_qgrid,
+            while_(cls.should_run_ph_qgrid)(
+                cls.run_ph_qgrid,
+                cls.inspect_qpoints,
+            ),
+            if_(cls.should_collect_irreps)(
+                cls.setup_collect_irreps,
+                while_(cls.should_run_ph_qgrid)(
+                    cls.run_ph_qgrid,
+                    cls.inspect_qpoints,
+                ),
+            ),
+            if_(cls.should_verify_qpoints)(
+                cls.inspect_init,
+                cls.verify_qpoints,
+            ),
             cls.run_recollect_qpoints,
             cls.results,
         )
 
         spec.output('retrieved', valid_type=orm.FolderData)
         spec.output('output_parameters', valid_type=orm.Dict)
+        spec.output(
+            'frequencies',
+            valid_type=orm.ArrayData,
+            help='The `indices`, `q_points` and `frequencies` arrays of the merged dynamical matrices, see the '
+            '`merge_para_ph_outputs` calculation function.',
+        )
+        spec.output(
+            'dynamical_matrices',
+            valid_type=DynamicalMatrixData,
+            required=False,
+            help='The parsed dynamical matrices of all q-points, if `parse_dynamical_matrices` is `True`.',
+        )
 
         spec.exit_code(300, 'ERROR_QPOINT_WORKCHAIN_FAILED', message='A child work chain failed.')
         spec.exit_code(301, 'ERROR_INITIALIZATION_WORKCHAIN_FAILED', message='The child work chain failed.')
+        spec.exit_code(
+            302,
+            'ERROR_QPOINT_GENERATION_FAILED',
+            message='The q-points could not be generated from the parent calculation: {message}'
+        )
+        spec.exit_code(
+            303,
+            'ERROR_QPOINTS_MISMATCH',
+            message='The generated q-points differ from those of the initialization work chain.'
+        )
+        spec.exit_code(
+            304,
+            'ERROR_DYNAMICALLY_UNSTABLE',
+            message='The structure is dynamically unstable at {qpoints}, only the finished q-points were returned.'
+        )
+
+    @staticmethod
+    def validate_inputs(value, _):
+        """Validate the top level namespace."""
+        if 'skip_initialization' in value and value['skip_initialization'].value:
+            try:
+                _, offset = value['qpoints'].get_kpoints_mesh()
+            except AttributeError:
+                return '`skip_initialization` requires the `qpoints` to be defined as a mesh.'
+
+            if any(offset):
+                return f'`skip_initialization` requires a q-point mesh without offset, but got: {offset}'
+
+            if 'seed_from_initialization' in value and value['seed_from_initialization'].value:
+                return '`seed_from_initialization` cannot be used with `skip_initialization`.'
+
+        if 'num_images' in value and 'num_batches' not in value:
+            return '`num_images` requires the q-points to be grouped in batches with `num_batches`.'
+
+        code_pool = value.get('code_pool', {})
+        parent_folders = value.get('code_pool_parent_folders', {})
+
+        if 'code_pool_settings' in value and not set(value['code_pool_settings'].keys()).issubset(code_pool):
+            return 'the labels of `code_pool_settings` should be those of codes in the `code_pool`.'
+
+        parent_folder = value.get('ph', {}).get('parent_folder', None)
+
+        for label, code in code_pool.items():
+            if label in parent_folders or parent_folder is None:
+                continue
+
+            if code.computer.uuid != parent_folder.computer.uuid:
+                return f'the code `{label}` of the `code_pool` is on another computer than the `ph.parent_folder`, so '\
+                    'its parent folder should be defined in `code_pool_parent_folders`.'
+
+    @staticmethod
+    def validate_num_batches(value, _):
+        """Validate the ``num_batches`` input."""
+        if value is not None and value.value < 1:
+            return f'`num_batches` should be a positive integer, but got: {value.value}'
+
+    @staticmethod
+    def validate_num_images(value, _):
+        """Validate the ``num_images`` input."""
+        if value is not None and value.value < 1:
+            return f'`num_images` should be a positive integer, but got: {value.value}'
+
+    @staticmethod
+    def validate_instability_threshold(value, _):
+        """Validate the ``instability_threshold`` input."""
+        if value is not None and value.value < 0:
+            return f'`instability_threshold` should be a non-negative number, but got: {value.value}'
+
+    @staticmethod
+    def validate_merge_chunk_size(value, _):
+        """Validate the ``merge_chunk_size`` input."""
+        if value is not None and value.value < 1:
+            return f'`merge_chunk_size` should be a positive integer, but got: {value.value}'
+
+    @staticmethod
+    def validate_reduction_chunk_size(value, _):
+        """Validate the ``reduction_chunk_size`` input."""
+        # The outputs of ``merge_para_ph_outputs`` take two input links, and every call should merge at least two
+        if value is not None and value.value < 4:
+            return f'`reduction_chunk_size` should be an integer of at least four, but got: {value.value}'
+
+    @staticmethod
+    def validate_max_irreps_per_job(value, _):
+        """Validate the ``max_irreps_per_job`` input."""
+        if value is not None and value.value < 1:
+            return f'`max_irreps_per_job` should be a positive integer, but got: {value.value}'
+
+    @staticmethod
+    def validate_scheduler_tiers(value, _):
+        """Validate the ``scheduler_tiers`` input."""
+        if value is None:
+            return
+
+        tiers = value.get_list()
+
+        if not tiers:
+            return '`scheduler_tiers` should contain at least one dictionary of scheduler options.'
+
+        for tier in tiers:
+            if not isinstance(tier, dict) or not set(tier).issubset(SCHEDULER_TIER_OPTIONS):
+                return f'every tier should be a dictionary with options in {SCHEDULER_TIER_OPTIONS}, but got: {tier}'
+
+    @staticmethod
+    def validate_resources_model(value, _):
+        """Validate the ``resources_model`` input."""
+        if value is None:
+            return
+
+        model = value.get_dict()
+
+        if 'target_wallclock_seconds' not in model:
+            return '`resources_model` should define the `target_wallclock_seconds`.'
+
+        if not set(model).issubset(RESOURCES_MODEL_KEYS):
+            return f'`resources_model` contains unknown keys: {sorted(set(model).difference(RESOURCES_MODEL_KEYS))}'
+
+        if any(not isinstance(value, (int, float)) or value <= 0 for value in model.values()):
+            return f'all values of `resources_model` should be positive numbers, but got: {model}'
+
+    @staticmethod
+    def validate_code_pool_settings(value, _):
+        """Validate the ``code_pool_settings`` input."""
+        if value is None:
+            return
+
+        for label, settings in value.get_dict().items():
+            if not isinstance(settings, dict) or not set(settings).issubset(CODE_POOL_SETTINGS_KEYS):
+                return f'the settings of `{label}` should be a dictionary with keys in {CODE_POOL_SETTINGS_KEYS}.'
+
+            capacity = settings.get('capacity', 1)
+
+            if not isinstance(capacity, int) or capacity < 1:
+                return f'the `capacity` of `{label}` should be a positive integer, but got: {capacity}'
+
+            speed = settings.get('speed', 1)
+
+            if not isinstance(speed, (int, float)) or speed <= 0:
+                return f'the `speed` of `{label}` should be a positive number, but got: {speed}'
+
+    @staticmethod
+    def validate_max_concurrent_qpoints(value, _):
+        """Validate the ``max_concurrent_qpoints`` input."""
+        if value is not None and value.value < 1:
+            return f'`max_concurrent_qpoints` should be a positive integer, but got: {value.value}'
+
+    @staticmethod
+    def validate_restart_from(value, _):
+        """Validate the ``restart_from`` input."""
+        if value is not None and value.process_type != PhParallelizeQpointsWorkChain.build_process_type():
+            return f'`restart_from` should be a `PhParallelizeQpointsWorkChain`, but got: {value.process_type}'
+
+    def setup(self):
+        """Record the chain of work chains that this one is restarted from, if any, whose child work chains are reused.
+
+        Process nodes cannot be linked as inputs, so the ``restart_from`` work chain is recorded in an extra, through
+        which the work chains it was itself restarted from are found. The chain is resolved once, kept in the context
+        and reported, such that it remains in the log even if the extras are changed afterwards.
+        """
+        self.ctx.restart_lineage = []
+        node = self.inputs.get('restart_from', None)
+
+        while node is not None and node.uuid not in self.ctx.restart_lineage:
+            self.ctx.restart_lineage.append(node.uuid)
+            uuid = node.base.extras.get('restart_from', None)
+            node = orm.load_node(uuid) if uuid is not None else None
+
+        if self.ctx.restart_lineage:
+            self.node.base.extras.set('restart_from', self.ctx.restart_lineage[0])
+            lineage = ', '.join(f'<{orm.load_node(uuid).pk}>' for uuid in self.ctx.restart_lineage)
+            self.report(f'restarting from the work chains {lineage}, most recent first')
+
+    def should_run_initialization(self):
+        """Return whether the q-points are computed by an initialization run instead of generated."""
+        return not self.inputs.skip_initialization.value
+
+    def run_generate_qpoints(self):
+        """Generate the irreducible q-points from the symmetries of the parent ``PwCalculation``."""
+        try:
+            pw_calculation = self.inputs.ph.parent_folder.creator
+            parameters = pw_calculation.outputs.output_parameters
+        except AttributeError:
+            message = 'the `parent_folder` was not created by a calculation with `output_parameters`.'
+            return self.exit_codes.ERROR_QPOINT_GENERATION_FAILED.format(message=message)  # pylint: disable=no-member
+
+        try:
+            # If the ``PwCalculation`` has an output structure, use it
+            structure = pw_calculation.outputs.output_structure
+        except AttributeError:
+            # Otherwise, take the input structure
+            structure = pw_calculation.inputs.structure
+
+        try:
+            get_symmetry_rotations(parameters.get_dict(), structure.cell)
+        except ValueError as exception:
+            message = str(exception)
+            return self.exit_codes.ERROR_QPOINT_GENERATION_FAILED.format(message=message)  # pylint: disable=no-member
+
+        self.report('launching `generate_qpoints`')
+        qpoints = dict(generate_qpoints(parameters, structure, self.inputs.qpoints))
+        self.ctx.initialization_folder = qpoints.pop('folder')
+        self._distribute_qpoints(qpoints, self.ctx.initialization_folder)
 
     def run_ph_init(self):
-        """Run a first dummy ``PhBaseWorkChain`` that will exit straight after initialization.
+        """Run the initialization ``PhBaseWorkChain``, unless it can be reused from the ``restart_from`` work chain."""
+        parameters = self._get_init_parameters()
+
+        for node in reversed(self._get_restart_children().get('phonon_initialization', [])):
+            try:
+                same_qpoints = node.inputs.qpoints.get_kpoints_mesh() == self.inputs.qpoints.get_kpoints_mesh()
+            except AttributeError:
+                same_qpoints = False
+
+            if node.is_finished_ok and same_qpoints and node.inputs.ph.parameters.get_dict() == parameters:
+                self.report(f'reusing initialization PhBaseWorkChain<{node.pk}>')
+                self.ctx.ph_init = node
+                return
+
+        self.to_context(ph_init=self._submit_ph_init())
+
+    def _submit_ph_init(self):
+        """Submit a first dummy ``PhBaseWorkChain`` that will exit straight after initialization.
 
         At that point it will have generated the q-point list, which we use to determine how to distribute these over
-        the available computational resources.
+        the available computational resources. The displacement patterns, which contain the number of irreducible
+        representations of each q-point, are retrieved as well to estimate the computational cost of each q-point.
+
+        :return: the submitted ``PhBaseWorkChain`` node.
         """
         inputs = AttributeDict(self.exposed_inputs(PhBaseWorkChain))
 
         # Toggle the only initialization flag and define minimal resources
         inputs.only_initialization = orm.Bool(True)
-        parameters = inputs.ph.parameters.get_dict()
-        parameters['INPUTPH']['last_irr'] = 0
-        parameters['INPUTPH']['start_irr'] = 0
-        inputs.ph.parameters = orm.Dict(parameters)
+        inputs.ph.parameters = orm.Dict(self._get_init_parameters())
         inputs.ph.metadata.options.max_wallclock_seconds = 1800
+        inputs.ph.metadata.options.additional_retrieve_list = list(
+            inputs.ph.metadata.options.get('additional_retrieve_list', [])
+        ) + [self._get_patterns_filepath()]
         inputs.metadata.call_link_label = 'phonon_initialization'
 
         node = self.submit(PhBaseWorkChain, **inputs)
         self.report(f'launching initialization PhBaseWorkChain<{node.pk}>')
-        self.to_context(ph_init=node)
+
+        return node
+
+    def _get_init_parameters(self):
+        """Return the ``ph.x`` parameters of the initialization run, which stops before the irreducible representations.
+
+        :return: the parameters as a dictionary.
+        """
+        parameters = self.inputs.ph.parameters.get_dict()
+        parameters['INPUTPH']['last_irr'] = 0
+        parameters['INPUTPH']['start_irr'] = 0
+        return parameters
+
+    @staticmethod
+    def _get_phsave_folder():
+        """Return the relative path of the ``phsave`` folder written by ``ph.x``."""
+        prefix = PhCalculation._PREFIX  # pylint: disable=protected-access
+        output_subfolder = PhCalculation._OUTPUT_SUBFOLDER  # pylint: disable=protected-access
+        return f'{output_subfolder}_ph0/{prefix}.phsave'
+
+    def _get_patterns_filepath(self):
+        """Return the relative filepath glob of the displacement pattern files written by ``ph.x``."""
+        return f'{self._get_phsave_folder()}/patterns.*.xml'
 
     def inspect_init(self):
         """Inspect the initialization `PhBaseWorkChain`."""
@@ -76,53 +626,931 @@ class PhParallelizeQpointsWorkChain(WorkChain):
         """Distribute the q-points."""
         self.report('launching `distribute_qpoints`')
         retrieved = self.ctx.ph_init.outputs.retrieved
-        self.ctx.qpoints = distribute_qpoints(retrieved=retrieved)
+        self.ctx.initialization_folder = retrieved
+        self._distribute_qpoints(dict(distribute_qpoints(retrieved=retrieved)), retrieved)
+
+    def _distribute_qpoints(self, qpoints, retrieved):
+        """Distribute the q-points over the child work chains.
+
+        :param qpoints: dictionary with the ``KpointsData`` of each q-point with keys of the form ``qpoint_N``.
+        :param retrieved: the folder with the patterns files of the initialization run, if available.
+        """
+        self.ctx.irreps_ranges = {}
+
+        if 'max_irreps_per_job' in self.inputs:
+            irreps = get_irreps_from_retrieved(retrieved)
+
+            for key in qpoints:
+                # The q-point labels of ``distribute_qpoints`` start at zero, the patterns files start at one
+                number_of_irreps = irreps.get(int(key.split('_')[-1]) + 1, {}).get('number_of_irreps', 0)
+
+                if number_of_irreps > self.inputs.max_irreps_per_job.value:
+                    self.ctx.irreps_ranges[key] = split_irreps(number_of_irreps, self.inputs.max_irreps_per_job.value)
+                    self.report(f'splitting {key.replace("_", " ")} in {len(self.ctx.irreps_ranges[key])} jobs')
+
+        self.ctx.qpoints = {key: qpoints.pop(key) for key in self.ctx.irreps_ranges}
+
+        if 'num_batches' in self.inputs and self.inputs.num_batches.value < len(qpoints):
+            self.report(f'launching `batch_qpoints` for {self.inputs.num_batches.value} batches')
+            qpoints = dict(batch_qpoints(retrieved, self.inputs.num_batches, **qpoints))
+            self.ctx.batches = qpoints.pop('batches')
+
+        self.ctx.qpoints.update(qpoints)
+
+    def _get_qpoint_parameters(self, qpoint):
+        """Return the ``ph.x`` parameters for the given q-points.
+
+        For `epsil` == True, only the gamma point should be calculated with this setting, see
+        https://www.quantum-espresso.org/Doc/INPUT_PH.html#idm69
+
+        :param qpoint: the ``KpointsData`` with the q-points.
+        :return: the parameters as a dictionary.
+        """
+        parameters = self.inputs.ph.parameters.get_dict()
+
+        if not parameters.get('INPUTPH', {}).get('epsil', False):
+            return parameters
+
+        if not numpy.all(qpoint.get_kpoints() == [0, 0, 0], axis=1).any():
+            parameters['INPUTPH']['epsil'] = False
+
+        return parameters
+
+    def setup_ph_qgrid(self):
+        """Define the jobs of the individual ``PhBaseWorkChain``s for each distributed q-point or batch of q-points.
+
+        Each job is defined by the label of its q-point or batch and, for q-points that are split over their irreducible
+        representations, by the range of irreducible representations.
+        """
+        self.ctx.workchains = AttributeDict()
+        self.ctx.irreps_workchains = AttributeDict()
+        self.ctx.in_flight = []
+        self.ctx.submitted = {}
+        self.ctx.interrupted_wall_times = {}
+        self.ctx.pool_codes = {}
+        self.ctx.stable_qpoints = []
+        self.ctx.merged_qpoints = []
+        self.ctx.partial_outputs = []
+        self.ctx.pool_loads = {label: 0. for label in self.inputs.get('code_pool', {})}
+        self.ctx.jobs = []
+
+        costs = self._get_qpoint_costs()
+        batches = self.ctx.batches.get_dict() if 'batches' in self.ctx else {}
+        num_images = self.inputs.num_images.value if 'num_images' in self.inputs else 1
+
+        for q_point_key, cost in costs.items():
+            if q_point_key in self.ctx.irreps_ranges:
+                number_of_irreps = self.ctx.irreps_ranges[q_point_key][-1][-1]
+
+                for start_irr, last_irr in self.ctx.irreps_ranges[q_point_key]:
+                    fraction = (last_irr - start_irr + 1) / number_of_irreps
+                    self.ctx.jobs.append({'key': q_point_key, 'irreps': [start_irr, last_irr], 'cost': cost * fraction})
+            elif q_point_key in batches and num_images > 1:
+                self.ctx.jobs.append({'key': q_point_key, 'images': num_images, 'cost': cost})
+            else:
+                self.ctx.jobs.append({'key': q_point_key, 'cost': cost})
+
+        if 'restart_from' in self.inputs:
+            self._reuse_restart_workchains()
+
+        # Launch the most expensive jobs first, such that they do not end up as stragglers
+        self.ctx.jobs.sort(key=lambda job: (-job['cost'], int(job['key'].split('_')[-1]), job.get('irreps', [])))
+
+        if 'scheduler_tiers' in self.inputs:
+            tiers = self.inputs.scheduler_tiers.get_list()
+
+            for rank, job in enumerate(self.ctx.jobs):
+                job['options'] = tiers[rank * len(tiers) // len(self.ctx.jobs)]
+
+        if 'resources_model' in self.inputs:
+            self._set_job_resources()
+
+        # The initialization run is only used to verify the generated q-points, so it runs concurrently
+        if self.should_verify_qpoints():
+            self.ctx.ph_init = self._submit_ph_init()
+
+    def _set_job_resources(self):
+        """Set the wall time and number of machines of each job from its estimated cost.
+
+        The wall time of a unit of cost is calibrated on the wall time of the initialization run, which is only
+        available if it was run before the q-points. Otherwise, the scheduler options of the ``ph`` namespace are kept.
+        A ``tot_num_mpiprocs`` in the resources is scaled with the number of machines, such that it remains consistent
+        with the number of processes per machine.
+        """
+        try:
+            wall_time_seconds = self.ctx.ph_init.outputs.output_parameters['wall_time_seconds']
+        except (AttributeError, KeyError):
+            self.report('wall time of the initialization run not available, keeping the resources of all jobs')
+            return
+
+        model = self.inputs.resources_model.get_dict()
+        init_time_factor = model.pop('init_time_factor', 10.)
+        resources = self.inputs.ph.metadata.options.resources
+        irreps = get_irreps_from_retrieved(self.ctx.initialization_folder)
+        seconds_per_cost = calibrate_seconds_per_cost(
+            wall_time_seconds,
+            self.ctx.ph_init.outputs.output_parameters.get('number_of_qpoints', len(irreps)),
+            irreps,
+            num_machines=resources.get('num_machines', 1),
+            init_time_factor=init_time_factor,
+        )
+
+        for job in self.ctx.jobs:
+            num_machines, wallclock_seconds = estimate_job_resources(job['cost'], seconds_per_cost, **model)
+            job['options'] = dict(job.get('options', {}), max_wallclock_seconds=wallclock_seconds)
+            job['options']['resources'] = dict(resources, num_machines=num_machines)
+
+            if resources.get('tot_num_mpiprocs'):
+                mpiprocs_per_machine = resources['tot_num_mpiprocs'] // resources.get('num_machines', 1)
+                job['options']['resources']['tot_num_mpiprocs'] = mpiprocs_per_machine * num_machines
+
+    def _get_restart_children(self):
+        """Return the child work chains of the ``restart_from`` work chain and of the work chains it was restarted from.
+
+        :return: dictionary with a list of child work chain nodes for each call link label, sorted by creation time.
+        """
+        children = {}
+
+        for uuid in self.ctx.get('restart_lineage', []):
+            for link in orm.load_node(uuid).base.links.get_outgoing(link_type=LinkType.CALL_WORK).all():
+                children.setdefault(link.link_label, []).append(link.node)
+
+        return {label: sorted(nodes, key=lambda node: node.ctime) for label, nodes in children.items()}
+
+    @staticmethod
+    def _get_reusable_workchain(candidates, qpoint, parameters):
+        """Return the most recent successfully finished work chain that ran for the given q-points and parameters.
+
+        :param candidates: list of ``PhBaseWorkChain`` nodes, sorted by creation time.
+        :param qpoint: the ``KpointsData`` of the job.
+        :param parameters: the ``ph.x`` parameters of the job as a dictionary.
+        :return: the work chain node or ``None`` if none of the candidates can be reused.
+        """
+
+        def without_recover(value):
+            """Drop the ``recover`` flag, which is set on the jobs recovered after running out of wall time."""
+            return {**value, 'INPUTPH': {k: v for k, v in value.get('INPUTPH', {}).items() if k != 'recover'}}
+
+        parameters = without_recover(parameters)
+
+        for node in reversed(candidates):
+            if not node.is_finished_ok or without_recover(node.inputs.ph.parameters.get_dict()) != parameters:
+                continue
+            try:
+                if node.inputs.qpoints.get_kpoints_mesh() == qpoint.get_kpoints_mesh():
+                    return node
+            except AttributeError:
+                pass
+            try:
+                if numpy.allclose(node.inputs.qpoints.get_kpoints(cartesian=True), qpoint.get_kpoints(cartesian=True)):
+                    return node
+            except (AttributeError, ValueError):
+                continue
+
+        return None
+
+    def _reuse_restart_workchains(self):
+        """Reuse the successfully finished child work chains of the ``restart_from`` work chain for the pending jobs.
+
+        A child work chain is reused for a job if it has the same call link label and ran for the same q-points with the
+        same parameters. The jobs of a q-point that was split over its irreducible representations are all dropped if
+        the work chain that collected its partial results can be reused.
+        """
+        children = self._get_restart_children()
+
+        for q_point_key in self.ctx.irreps_ranges:
+            qpoint = self.ctx.qpoints[q_point_key]
+            node = self._get_reusable_workchain(
+                children.get(q_point_key, []), qpoint, self._get_qpoint_parameters(qpoint)
+            )
+            if node is not None:
+                self.ctx.workchains[q_point_key] = node.pk
+
+        jobs = []
+
+        for job in self.ctx.jobs:
+            q_point_key = job['key']
+
+            if q_point_key in self.ctx.workchains:
+                continue
+
+            label, parameters = self._get_job_parameters(job)
+            node = self._get_reusable_workchain(children.get(label, []), self._get_job_qpoints(job), parameters)
+
+            if node is None:
+                jobs.append(job)
+            elif 'irreps' in job:
+                self.ctx.irreps_workchains.setdefault(q_point_key, AttributeDict())[label] = node.pk
+            else:
+                self.ctx.workchains[q_point_key] = node.pk
+
+        reused = len(self.ctx.workchains) + sum(len(value) for value in self.ctx.irreps_workchains.values())
+        self.report(f'reusing {reused} child work chains of {self.inputs.restart_from}, {len(jobs)} jobs remaining')
+        self.ctx.jobs = jobs
+
+    def _get_qpoint_costs(self):
+        """Return the estimated cost of each distributed q-point or batch of q-points.
+
+        :return: dictionary with the estimated relative cost for each label of a q-point or batch.
+        """
+        batches = self.ctx.batches.get_dict() if 'batches' in self.ctx else {}
+
+        # The q-point labels of ``distribute_qpoints`` start at zero, the dynamical matrix files start at one
+        indices = {key: batches.get(key, [int(key.split('_')[-1]) + 1]) for key in self.ctx.qpoints}
+        irreps = get_irreps_from_retrieved(self.ctx.initialization_folder)
+        costs = estimate_qpoint_costs(max(max(value) for value in indices.values()), irreps)
+
+        return {key: sum(costs[index - 1] for index in value) for key, value in indices.items()}
+
+    def should_run_ph_qgrid(self):
+        """Return whether there are jobs left to be launched or child work chains that are still running."""
+        states = self._get_context_states(self.ctx.in_flight)
+        return bool(self.ctx.jobs) or any(state not in TERMINATED_PROCESS_STATES for state, _ in states.values())
 
     def run_ph_qgrid(self):
-        """Launch individual ``PhBaseWorkChain``s for each distributed q-point."""
+        """Launch the ``PhBaseWorkChain``s of the pending jobs, with at most ``max_concurrent_qpoints`` running.
+
+        All running work chains are waited for, but the work chain resumes as soon as any of them has terminated, see
+        ``_on_awaitable_finished``. All terminated work chains are then inspected and this step is called again to
+        launch new jobs in the slots that have become available.
+        """
+        states = self._get_context_states(self.ctx.in_flight)
+        self.ctx.in_flight = [path for path in self.ctx.in_flight if states[path][0] not in TERMINATED_PROCESS_STATES]
+
+        # By default, every pending job is launched, including the relaunches of failed jobs while others are running
+        if 'max_concurrent_qpoints' in self.inputs:
+            max_concurrent = self.inputs.max_concurrent_qpoints.value
+        else:
+            max_concurrent = len(self.ctx.jobs) + len(self.ctx.in_flight)
+
+        while self.ctx.jobs and len(self.ctx.in_flight) < max_concurrent:
+            index = self._get_next_job_index()
+
+            if index is None:
+                break
+
+            job = self.ctx.jobs.pop(index)
+            path = self._submit_job(job)
+            self.ctx.in_flight.append(path)
+            self.ctx.submitted[path] = job
+
+        self.ctx.waiting_for_any = list(self.ctx.in_flight)
+        waiting = list(self.ctx.in_flight)
+
+        # The initialization run is needed once the last running work chain has finished
+        if not self.ctx.jobs and len(self.ctx.in_flight) <= 1 and self.should_verify_qpoints():
+            waiting.append('ph_init')
+
+        self.to_context(**{path: self._get_awaitable(path) for path in waiting})
+
+    def _get_next_job_index(self):
+        """Return the index of the next pending job to launch and assign it to a code of the ``code_pool``, if defined.
+
+        A job is assigned to the code of its q-point or batch if a previous job of it was already launched. Otherwise,
+        it is assigned to the code with free capacity on which it is expected to finish first, i.e. with the smallest
+        estimated cost of the jobs assigned to it, including this one, divided by its speed and capacity.
+
+        :return: the index of the job in the list of pending jobs, or ``None`` if all codes are at capacity.
+        """
+        if 'code_pool' not in self.inputs:
+            return 0
+
+        settings = self.inputs.code_pool_settings.get_dict() if 'code_pool_settings' in self.inputs else {}
+        running = [self.ctx.submitted[path].get('code') for path in self.ctx.in_flight]
+        number_of_jobs = len(self.ctx.jobs) + len(running)
+        available = {}
+
+        for label in self.inputs.code_pool:
+            capacity = settings.get(label, {}).get('capacity', number_of_jobs)
+
+            if running.count(label) < capacity:
+                available[label] = settings.get(label, {}).get('speed', 1) * min(capacity, number_of_jobs)
+
+        for index, job in enumerate(self.ctx.jobs):
+            label = self.ctx.pool_codes.get(job['key'], None)
+
+            if label is None and available:
+                finish_times = {
+                    label: (self.ctx.pool_loads[label] + job['cost']) / parallelism
+                    for label, parallelism in available.items()
+                }
+                label = min(finish_times, key=finish_times.get)
+                self.ctx.pool_codes[job['key']] = label
+
+            if label in available:
+                self.ctx.pool_loads[label] += job['cost']
+                job['code'] = label
+                return index
+
+        return None
+
+    def _on_awaitable_finished(self, awaitable):
+        """Resolve the awaitable of a terminated child process and stop waiting for the others of ``run_ph_qgrid``.
+
+        The outline can only wait for all the awaitables that are added to the context. Hence, once any of the running
+        work chains that ``run_ph_qgrid`` waits for has terminated, the awaitables of the others are dropped and their
+        PK is put back in the context, such that the work chain resumes without waiting for them. The callbacks of the
+        dropped awaitables are still called once their work chain terminates, and are ignored, like the callbacks of
+        awaitables that were already resolved.
+
+        :param awaitable: the ``Awaitable`` of the terminated child process.
+        """
+        if awaitable not in self._awaitables:
+            return
+
+        if awaitable.key in self.ctx.get('waiting_for_any', []):
+            for other in [entry for entry in self._awaitables if entry.key in self.ctx.waiting_for_any]:
+                if other.key != awaitable.key:
+                    self._awaitables.remove(other)
+                    self._set_context_pk(other.key)
+
+            self.ctx.waiting_for_any = []
+
+        super()._on_awaitable_finished(awaitable)
+
+    def _get_context_pk(self, path):
+        """Return the PK of the node in the context at the given path, where the keys of nested dictionaries are dotted.
+
+        The child work chains are kept in the context by their PK, such that they are not all loaded when the work chain
+        is reloaded from its checkpoint. Once a child work chain that was waited for has terminated, the context
+        contains the node itself, until the next call of ``inspect_qpoints``.
+
+        :param path: the path of the node in the context, e.g. ``workchains.qpoint_1``.
+        """
+        value = functools.reduce(lambda namespace, key: namespace[key], path.split('.'), self.ctx)
+        return value.pk if isinstance(value, (orm.Node, Awaitable)) else value
+
+    def _get_context_node(self, path):
+        """Return the loaded node in the context at the given path, see ``_get_context_pk``.
+
+        :param path: the path of the node in the context, e.g. ``workchains.qpoint_1``.
+        """
+        return orm.load_node(self._get_context_pk(path))
+
+    def _get_context_states(self, paths):
+        """Return the process state and the exit status of the nodes in the context at the given paths.
+
+        :param paths: the paths of the nodes in the context, see ``_get_context_pk``.
+        :return: dictionary that maps each path on a tuple of the ``ProcessState`` and the exit status of its node.
+        """
+        pks = {path: self._get_context_pk(path) for path in paths}
+        states = get_process_states(pks.values())
+        return {path: states[pk] for path, pk in pks.items()}
+
+    def _get_awaitable(self, path):
+        """Return the awaitable of the node in the context at the given path, without loading the node.
+
+        :param path: the path of the node in the context, see ``_get_context_pk``.
+        """
+        pk = self._get_context_pk(path)
+        return Awaitable(pk=pk, action=AwaitableAction.ASSIGN, target=AwaitableTarget.PROCESS, outputs=False)
+
+    def _submit_job(self, job):
+        """Launch the ``PhBaseWorkChain`` of a job and store it in the context.
+
+        :param job: dictionary with the label of the q-point or batch under the ``key`` key, and optionally the range of
+            irreducible representations under the ``irreps`` key, or ``collect`` set to ``True`` to collect the results
+            of all ranges of irreducible representations of the q-point, the number of ``images`` of a batch, the UUID
+            of the ``recover_folder`` to restart from with the ``recover`` flag, or the label of the ``code`` of the
+            ``code_pool`` to run with.
+        :return: the path of the work chain in the context.
+        """
+        q_point_key = job['key']
+        qpoint = self.ctx.qpoints[q_point_key]
+        label, parameters = self._get_job_parameters(job)
+
         inputs = AttributeDict(self.exposed_inputs(PhBaseWorkChain))
-        parameters = inputs.ph.parameters.get_dict()
+        inputs.qpoints = self._get_job_qpoints(job)
+
+        options = dict(job.get('options', {}))
+
+        if 'code' in job:
+            settings = self.inputs.code_pool_settings.get_dict() if 'code_pool_settings' in self.inputs else {}
+            inputs.ph.code = self.inputs.code_pool[job['code']]
+            parent_folders = self.inputs.get('code_pool_parent_folders', {})
+            inputs.ph.parent_folder = parent_folders.get(job['code'], inputs.ph.parent_folder)
+            # The options of the scheduler tiers and the resources model are those of the computer of the ``ph.code``
+            options.update(settings.get(job['code'], {}).get('options', {}))
+
+        inputs.ph.metadata.options.update(options)
+
+        if self._should_seed_job(job):
+            inputs.ph.parent_folder = self.ctx.ph_init.outputs.remote_folder
+
+        if job.get('collect', False):
+            self._set_collect_irreps_inputs(inputs, q_point_key)
+
+        if 'recover_folder' in job:
+            inputs.ph.parent_folder = orm.load_node(job['recover_folder'])
+            parameters.setdefault('INPUTPH', {})['recover'] = True
+
+        # The ``PhBaseWorkChain`` already restarted the interrupted calculations up to its ``max_iterations``
+        if job.get('recoveries', 0) > 0:
+            inputs.max_iterations = orm.Int(1)
 
-        for q_point_key, qpoint in sorted(self.ctx.qpoints.items()):
-            inputs.qpoints = qpoint
+        if 'images' in job:
+            settings = inputs.ph.settings.get_dict() if 'settings' in inputs.ph else {}
+            settings['CMDLINE'] = list(settings.get('CMDLINE', [])) + ['-nimage', str(job['images'])]
+            inputs.ph.settings = orm.Dict(settings)
 
-            # For `epsil` == True, only the gamma point should be calculated with this setting, see
-            # https://www.quantum-espresso.org/Doc/INPUT_PH.html#idm69
-            if parameters.get('INPUTPH', {}).get('epsil', False) and not numpy.all(qpoint.get_kpoints() == [0, 0, 0]):
-                parameters['INPUTPH']['epsil'] = False
-                inputs.ph.parameters = orm.Dict(parameters)
+        if job.get('attempt', 0) > 0 and 'retry_options' in self.inputs:
+            inputs.ph.metadata.options.update(self.inputs.retry_options.get_dict())
+        inputs.metadata.call_link_label = label
 
-            inputs.metadata.call_link_label = q_point_key
+        if parameters != self.inputs.ph.parameters.get_dict():
+            inputs.ph.parameters = orm.Dict(parameters)
 
-            node = self.submit(PhBaseWorkChain, **inputs)
-            self.report(f'launching PhBaseWorkChain<{node.pk}> for q-point {q_point_key.split("_")[-1]} <{qpoint.pk}>')
-            self.to_context(workchains=append_(node))
+        node = self.submit(PhBaseWorkChain, **inputs)
+
+        if 'irreps' in job:
+            start_irr, last_irr = job['irreps']
+            self.report(
+                f'launching PhBaseWorkChain<{node.pk}> for {q_point_key.replace("_", " ")} irreps {start_irr} to '
+                f'{last_irr}'
+            )
+            self.ctx.irreps_workchains.setdefault(q_point_key, AttributeDict())[label] = node.pk
+            return f'irreps_workchains.{q_point_key}.{label}'
+
+        if job.get('collect', False):
+            self.report(
+                f'launching PhBaseWorkChain<{node.pk}> to collect the irreps of {q_point_key.replace("_", " ")}'
+            )
+        else:
+            self.report(f'launching PhBaseWorkChain<{node.pk}> for {q_point_key.replace("_", " ")} <{qpoint.pk}>')
+
+        self.ctx.workchains[q_point_key] = node.pk
+        return f'workchains.{q_point_key}'
+
+    def _get_job_parameters(self, job):
+        """Return the call link label and the ``ph.x`` parameters of the ``PhBaseWorkChain`` of a job.
+
+        :param job: dictionary that defines the job, see ``_submit_job``.
+        :return: tuple with the call link label and the parameters as a dictionary.
+        """
+        q_point_key = job['key']
+        parameters = self._get_qpoint_parameters(self.ctx.qpoints[q_point_key])
+
+        if self._should_seed_job(job):
+            # The q-point labels of ``distribute_qpoints`` start at zero, the q-points of ``ph.x`` start at one
+            index = int(q_point_key.split('_')[-1]) + 1
+            parameters.setdefault('INPUTPH', {}).update({'start_q': index, 'last_q': index, 'recover': True})
+
+        if 'irreps' not in job:
+            return q_point_key, parameters
+
+        start_irr, last_irr = job['irreps']
+        parameters.setdefault('INPUTPH', {})['start_irr'] = start_irr
+        parameters['INPUTPH']['last_irr'] = last_irr
+
+        return f'{q_point_key}_irreps_{start_irr}_{last_irr}', parameters
+
+    def _get_job_qpoints(self, job):
+        """Return the q-points of the ``PhBaseWorkChain`` of a job.
+
+        A seeded job computes its q-point on the grid of the initialization run, otherwise only its q-points are passed.
+
+        :param job: dictionary that defines the job, see ``_submit_job``.
+        :return: the ``KpointsData`` with the q-points.
+        """
+        if self._should_seed_job(job):
+            return self.inputs.qpoints
+
+        return self.ctx.qpoints[job['key']]
+
+    def _should_seed_job(self, job):
+        """Return whether the job is started from the scratch folder of the initialization run.
+
+        Only jobs of individual q-points are seeded, since a batch of q-points does not have to be a contiguous range of
+        the grid. The initialization run has to be finished before the q-points are computed, and the job has to run on
+        the same computer.
+
+        :param job: dictionary that defines the job, see ``_submit_job``.
+        """
+        if 'code' in job and self.inputs.code_pool[job['code']].computer.uuid != self.inputs.ph.code.computer.uuid:
+            return False
+
+        return (
+            self.inputs.seed_from_initialization.value and self.should_run_initialization() and
+            job['key'].startswith('qpoint_')
+        )
+
+    def should_collect_irreps(self):
+        """Return whether any q-point was split over its irreducible representations."""
+        return bool(self.ctx.irreps_ranges)
+
+    def setup_collect_irreps(self):
+        """Define the jobs to collect the partial results of the q-points split over their irreducible representations.
+
+        For each such q-point, a ``PhBaseWorkChain`` is restarted from the first partial work chain, which sets the
+        ``recover`` flag. The partial dynamical matrices of the other work chains are copied into its ``phsave`` folder
+        before running ``ph.x``, such that it only needs to collect the contributions of all irreducible representations
+        into the final dynamical matrix.
+        """
+        for q_point_key in sorted(self.ctx.irreps_workchains):
+            if q_point_key not in self.ctx.workchains:
+                self.ctx.jobs.append({'key': q_point_key, 'collect': True})
+
+    def _set_collect_irreps_inputs(self, inputs, q_point_key):
+        """Set the inputs to collect the partial results of a q-point split over its irreducible representations.
+
+        :param inputs: the inputs of the ``PhBaseWorkChain``, which are updated in place.
+        :param q_point_key: the label of the q-point.
+        """
+        phsave = self._get_phsave_folder()
+        prepend_text = inputs.ph.metadata.options.get('prepend_text', '')
+        paths = [f'irreps_workchains.{q_point_key}.{label}' for label in self.ctx.irreps_workchains[q_point_key]]
+        workchains = sorted([self._get_context_node(path) for path in paths],
+                            key=lambda workchain: workchain.inputs.ph.parameters['INPUTPH']['start_irr'])
+        copy_commands = [
+            f'cp {os.path.join(workchain.outputs.remote_folder.get_remote_path(), phsave)}/dynmat.*.xml {phsave}/'
+            for workchain in workchains[1:]
+        ]
+        inputs.ph.parent_folder = workchains[0].outputs.remote_folder
+        inputs.ph.metadata.options.prepend_text = '\n'.join([prepend_text] + copy_commands).strip()
 
     def inspect_qpoints(self):
-        """Inspect each parallel qpoint `PhBaseWorkChain`."""
-        for workchain in self.ctx.workchains:
-            if not workchain.is_finished_ok:
+        """Inspect each parallel qpoint `PhBaseWorkChain`.
+
+        The jobs of failed work chains are launched again, as long as they have not exceeded the ``max_qpoint_retries``.
+        Work chains that ran out of wall time are instead recovered from their remote folder, as long as they have not
+        exceeded the ``max_walltime_recoveries``. The failed work chains are removed from the context, such that the
+        results of all other ones are kept. For the batches that were computed with images, the successfully finished
+        work chains are replaced by a job that collects the dynamical matrices of all images from their remote folder.
+        If the ``instability_threshold`` is crossed by a finished work chain, the remaining ones are stopped instead.
+        Finally, the output parameters of the finished work chains are merged if there are ``merge_chunk_size`` of them.
+
+        The states of all child work chains are queried at once and only the nodes of the failed ones are loaded. The
+        nodes that were added to the context when they terminated are replaced by their PK.
+        """
+        if 'instability_threshold' in self.inputs:
+            unstable = self._get_unstable_qpoints()
+
+            if unstable:
+                return self._abort_unstable(unstable)
+
+        max_retries = self.inputs.max_qpoint_retries.value
+        max_recoveries = self.inputs.max_walltime_recoveries.value
+        paths = [f'workchains.{key}' for key in self.ctx.get('workchains', {})]
+
+        for q_point_key, partial_workchains in self.ctx.get('irreps_workchains', {}).items():
+            paths.extend(f'irreps_workchains.{q_point_key}.{key}' for key in partial_workchains)
+
+        for path in paths:
+            self._set_context_pk(path)
+
+        states = self._get_context_states(paths)
+
+        for path in paths:
+            if states[path][0] not in TERMINATED_PROCESS_STATES:
+                continue
+
+            job = self.ctx.get('submitted', {}).get(path)
+            finished_ok = is_finished_ok(states[path])
+
+            if finished_ok and (job is None or 'images' not in job):
+                continue
+
+            workchain = self._get_context_node(path)
+            calculation = self._get_interrupted_calculation(workchain)
+
+            if finished_ok:
+                self.report(f'child work chain {workchain} finished, collecting the dynamical matrices of its images')
+                self._add_interrupted_wall_time(job['key'], workchain)
+                job = {key: value for key, value in job.items() if key not in ('images', 'attempt', 'recoveries')}
+                job['recover_folder'] = workchain.outputs.remote_folder.uuid
+            elif job is not None and calculation is not None and job.get('recoveries', 0) < max_recoveries:
+                recoveries = job.get('recoveries', 0) + 1
+                self.report(
+                    f'child work chain {workchain} ran out of wall time, relaunching it from {calculation}: recovery '
+                    f'{recoveries} of {max_recoveries}'
+                )
+                self._add_interrupted_wall_time(job['key'], workchain)
+                job = {**job, 'recoveries': recoveries, 'recover_folder': calculation.outputs.remote_folder.uuid}
+            elif job is None or job.get('attempt', 0) >= max_retries:
                 self.report(f'child work chain {workchain} failed with status {workchain.exit_status}, aborting.')
                 return self.exit_codes.ERROR_QPOINT_WORKCHAIN_FAILED  # pylint: disable=no-member
+            else:
+                attempt = job.get('attempt', 0) + 1
+                self.report(
+                    f'child work chain {workchain} failed with status {workchain.exit_status}, relaunching it: attempt '
+                    f'{attempt} of {max_retries}'
+                )
+                job = {**job, 'attempt': attempt}
+                job.pop('recover_folder', None)
+
+            self.ctx.jobs.insert(0, job)
+            self._pop_context_node(path)
+
+            if path in self.ctx.in_flight:
+                self.ctx.in_flight.remove(path)
+
+        if 'merge_chunk_size' in self.inputs:
+            merged_qpoints = self.ctx.get('merged_qpoints', [])
+            keys = [key for key in self._get_finished_qpoints() if key not in merged_qpoints]
+
+            if len(keys) >= self.inputs.merge_chunk_size.value:
+                self.report(f'merging the output parameters of {len(keys)} finished child work chains')
+                partial_outputs = self.ctx.setdefault('partial_outputs', [])
+                merged = self._merge_outputs(keys, call_link_label=f'merge_partial_outputs_{len(partial_outputs) + 1}')
+                partial_outputs.append([merged['output_parameters'].pk, merged['frequencies'].pk])
+
+    def _get_unstable_qpoints(self):
+        """Return the labels of the finished q-points or batches with a frequency below the ``instability_threshold``.
+
+        The q-points that were found to be stable are stored in the context, such that they are only checked once. A
+        frequency that ``ph.x`` printed as asterisks is parsed as ``None``, which only happens for the largest imaginary
+        frequencies, so it makes the q-point unstable.
+
+        :return: list of labels of the unstable q-points or batches.
+        """
+        threshold = self.inputs.instability_threshold.value
+        keys = [key for key in self._get_finished_qpoints() if key not in self.ctx.stable_qpoints]
+        outputs = self._get_context_outputs(keys, 'output_parameters')
+        unstable = []
+
+        for q_point_key in keys:
+            output_parameters = outputs[q_point_key].get_dict()
+            frequencies = [
+                frequency for key, value in output_parameters.items() if key.startswith('dynamical_matrix_')
+                for frequency in value.get('frequencies', [])
+            ]
+
+            if None in frequencies or (frequencies and min(frequencies) < -threshold):
+                unstable.append(q_point_key)
+            else:
+                self.ctx.stable_qpoints.append(q_point_key)
+
+        return unstable
+
+    def _get_finished_qpoints(self):
+        """Return the labels of the q-points or batches whose work chain in the context computed its dynamical matrices.
+
+        This is not the case before it has finished successfully, or if it computed a batch with images, whose dynamical
+        matrices still have to be collected.
+
+        :return: list of labels of the q-points or batches, in the order of the context.
+        """
+        paths = {key: f'workchains.{key}' for key in self.ctx.workchains}
+        states = self._get_context_states(paths.values())
+        submitted = self.ctx.get('submitted', {})
+
+        return [
+            key for key, path in paths.items()
+            if is_finished_ok(states[path]) and 'images' not in submitted.get(path, {})
+        ]
+
+    def _get_context_outputs(self, keys, link_label):
+        """Return an output of the work chains of the given q-points or batches in the context.
+
+        :param keys: the labels of the q-points or batches.
+        :param link_label: the link label of the output.
+        :return: dictionary that maps each label on the output of its work chain.
+        """
+        pks = {key: self._get_context_pk(f'workchains.{key}') for key in keys}
+        outputs = get_outputs(pks.values(), [link_label])
+        return {key: outputs[pk][link_label] for key, pk in pks.items()}
+
+    def _abort_unstable(self, unstable):
+        """Stop the computation of the remaining q-points and attach the results of the finished ones as outputs.
+
+        :param unstable: list of labels of the unstable q-points or batches.
+        :return: the ``ERROR_DYNAMICALLY_UNSTABLE`` exit code.
+        """
+        qpoints = ', '.join(key.replace('_', ' ') for key in unstable)
+        self.report(f'imaginary frequencies below the instability threshold at {qpoints}, stopping the other q-points')
+        self.ctx.jobs = []
+
+        states = self._get_context_states(self.ctx.in_flight)
+
+        for path in self.ctx.in_flight:
+            pk = self._get_context_pk(path)
+
+            if states[path][0] not in TERMINATED_PROCESS_STATES and self.runner.controller is not None:
+                self.report(f'killing child work chain PhBaseWorkChain<{pk}>')
+                self.runner.controller.kill_process(pk, msg_text=f'structure unstable at {qpoints}')
+
+        self.ctx.in_flight = []
+        self.run_recollect_qpoints()
+        self.out('retrieved', self.ctx.merged_retrieved)
+        self.out('output_parameters', self.ctx.merged_output_parameters)
+        self.out('frequencies', self.ctx.merged_frequencies)
+
+        return self.exit_codes.ERROR_DYNAMICALLY_UNSTABLE.format(qpoints=qpoints)  # pylint: disable=no-member
+
+    @staticmethod
+    def _get_interrupted_calculation(workchain):
+        """Return the last calculation of a failed work chain if it ran out of wall time and can be recovered.
+
+        :param workchain: the failed ``PhBaseWorkChain`` node.
+        :return: the ``PhCalculation`` node or ``None`` if the last calculation did not run out of wall time.
+        """
+        calculations = sorted((node for node in workchain.called if isinstance(node, orm.CalcJobNode)),
+                              key=lambda node: node.ctime)
+
+        if calculations and calculations[-1].exit_status in WALLTIME_EXIT_STATUSES:
+            if 'remote_folder' in calculations[-1].outputs:
+                return calculations[-1]
+
+        return None
+
+    def _add_interrupted_wall_time(self, q_point_key, workchain):
+        """Add the wall time of the calculations of an interrupted work chain to the total of its q-point or batch.
+
+        This is also used for the work chains of batches computed with images, whose dynamical matrices are collected by
+        a second work chain.
+
+        :param q_point_key: the label of the q-point or batch.
+        :param workchain: the interrupted ``PhBaseWorkChain`` node.
+        """
+        wall_time_seconds = 0
+
+        for calculation in workchain.called:
+            if isinstance(calculation, orm.CalcJobNode) and 'output_parameters' in calculation.outputs:
+                wall_time_seconds += calculation.outputs.output_parameters.get('wall_time_seconds', 0)
+
+        wall_times = self.ctx.interrupted_wall_times
+        wall_times[q_point_key] = wall_times.get(q_point_key, 0) + wall_time_seconds
+
+    def _set_context_pk(self, path):
+        """Replace the node in the context at the given path by its PK, see ``_get_context_pk``.
+
+        :param path: the path of the node in the context, e.g. ``workchains.qpoint_1``.
+        """
+        *namespaces, key = path.split('.')
+        functools.reduce(lambda namespace, key: namespace[key], namespaces, self.ctx)[key] = self._get_context_pk(path)
+
+    def _pop_context_node(self, path):
+        """Remove the node in the context at the given path, with the keys of nested dictionaries separated by dots.
+
+        :param path: the path of the node in the context, e.g. ``workchains.qpoint_1``.
+        :return: the removed node.
+        """
+        *namespaces, key = path.split('.')
+        return functools.reduce(lambda namespace, key: namespace[key], namespaces, self.ctx).pop(key)
+
+    def should_verify_qpoints(self):
+        """Return whether the generated q-points should be verified with those of an initialization run."""
+        return self.inputs.skip_initialization.value and self.inputs.verify_qpoints.value
+
+    def verify_qpoints(self):
+        """Verify that the generated q-points are identical to those computed by the initialization run."""
+        dynmat_file = f'{PhCalculation._OUTPUT_DYNAMICAL_MATRIX_PREFIX}0'  # pylint: disable=protected-access
+        qpoints = []
+
+        for folder in [self.ctx.initialization_folder, self.ctx.ph_init.outputs.retrieved]:
+            lines = folder.base.repository.get_object_content(dynmat_file).splitlines()
+            qpoints.append(
+                numpy.array([[float(value) for value in line.split()] for line in lines[2:] if line.strip()])
+            )
+
+        if qpoints[0].shape != qpoints[1].shape or not numpy.allclose(*qpoints, atol=1.0e-6):
+            self.report(f'generated q-points:\n{qpoints[0]}\ndiffer from those of the initialization:\n{qpoints[1]}')
+            return self.exit_codes.ERROR_QPOINTS_MISMATCH  # pylint: disable=no-member
+
+        self.report('generated q-points are identical to those of the initialization work chain')
 
     def run_recollect_qpoints(self):
-        """Recollect the dynamical matrices from individual q-points calculations."""
+        """Recollect the dynamical matrices from individual q-points calculations that finished successfully."""
         self.report('launching `recollect_qpoints`')
-        retrieved_folders = {'qpoint_0': self.ctx.ph_init.outputs.retrieved}
-        output_dict = {}
+        retrieved_folders = {'qpoint_0': self.ctx.initialization_folder}
+        batches = self.ctx.batches.get_dict() if 'batches' in self.ctx else {}
+        keys = []
+
+        # The work chains without dynamical matrices are skipped, which only happens when the work chain is stopped
+        # early, e.g. because the structure is unstable
+        finished = self._get_finished_qpoints()
+        retrieved = self._get_context_outputs(finished, 'retrieved')
+
+        for key in finished:
+            if key in batches:
+                retrieved_folders[key] = retrieved[key]
+            else:
+                # The q-point labels of ``distribute_qpoints`` start at zero, the dynamical matrix files start at one
+                ind = int(key.split('_')[-1]) + 1
+                retrieved_folders[f'qpoint_{ind}'] = retrieved[key]
+
+            if key not in self.ctx.get('merged_qpoints', []):
+                keys.append(key)
+
+        common_inputs = {'batches': self.ctx.batches} if 'batches' in self.ctx else {}
+        items = [{key: folder} for key, folder in retrieved_folders.items()]
+
+        self.ctx.merged_retrieved = self._reduce(
+            recollect_qpoints, items, lambda folder, label: {label: folder}, common_inputs, {}, 'recollect_qpoints'
+        )
+
+        merged = self._merge_outputs(keys, self.ctx.get('partial_outputs', []))
+        self.ctx.merged_output_parameters = merged['output_parameters']
+        self.ctx.merged_frequencies = merged['frequencies']
+
+    def _merge_outputs(self, keys, partial_outputs=(), call_link_label=None):
+        """Merge the output parameters of the given q-points or batches and the outputs of previous partial merges.
+
+        :param keys: the labels of the q-points or batches whose work chains finished successfully.
+        :param partial_outputs: list with the PKs of the ``output_parameters`` and ``frequencies`` of each previous call
+            of ``merge_para_ph_outputs`` for other q-points or batches.
+        :param call_link_label: optional call link label of the ``merge_para_ph_outputs`` calculation function.
+        :return: the results of the final ``merge_para_ph_outputs`` call.
+        """
+        batches = self.ctx.batches.get_dict() if 'batches' in self.ctx else {}
+        interrupted_wall_times = self.ctx.get('interrupted_wall_times', {})
+        outputs = self._get_context_outputs(keys, 'output_parameters')
+        items = []
+        wall_times = {}
+        final_inputs = {}
+
+        for key in keys:
+            # The q-point labels of ``distribute_qpoints`` start at zero, the dynamical matrix files start at one
+            label = key if key in batches else f'output_{int(key.split("_")[-1]) + 1}'
+            items.append({label: outputs[key]})
+
+            if key in interrupted_wall_times:
+                wall_times[label] = interrupted_wall_times[key]
 
-        for index, workchain in enumerate(self.ctx.workchains):
-            ind = index + 1
-            retrieved_folders[f'qpoint_{ind}'] = workchain.outputs.retrieved
-            output_dict[f'output_{ind}'] = workchain.outputs.output_parameters
+        common_inputs = {'batches': self.ctx.batches} if 'batches' in self.ctx else {}
 
-        retrieved_folders['metadata'] = {'call_link_label': 'recollect_qpoints'}
+        if wall_times:
+            final_inputs['interrupted_wall_times'] = orm.Dict(wall_times)
 
-        self.ctx.merged_retrieved = recollect_qpoints(**retrieved_folders)
-        self.ctx.merged_output_parameters = merge_para_ph_outputs(**output_dict)
+        def get_item(results, label):
+            number = label.split('_')[-1]
+            return {label: results['output_parameters'], f'merged_frequencies_{number}': results['frequencies']}
+
+        for number, pks in enumerate(partial_outputs, start=1):
+            output_parameters, frequencies = (orm.load_node(pk) for pk in pks)
+            items.append({f'merged_{number}': output_parameters, f'merged_frequencies_{number}': frequencies})
+
+        self.ctx.setdefault('merged_qpoints', []).extend(keys)
+
+        return self._reduce(merge_para_ph_outputs, items, get_item, common_inputs, final_inputs, call_link_label)
+
+    def _reduce(self, function, items, get_item, common_inputs, final_inputs, call_link_label=None):
+        """Call a calculation function on all items, in a tree of calls with a bounded number of input links.
+
+        The items are split in chunks with at most ``reduction_chunk_size`` input links in total, for each of which the
+        function is called. The results of these calls are the items of the next level, until they fit in a single
+        call, which returns the final result. The ``common_inputs`` and ``final_inputs`` are not counted. Without the
+        ``reduction_chunk_size`` input, the function is called once with all items.
+
+        :param function: the calculation function, which should accept its own results as inputs with keys of the form
+            ``merged_N``.
+        :param items: list with the inputs of each item, e.g. the ``retrieved`` folder of a q-point.
+        :param get_item: callable that returns the inputs of an item of the next level from the results of a call and
+            its ``merged_N`` link label.
+        :param common_inputs: the inputs that are passed to every call, e.g. the ``batches``.
+        :param final_inputs: the inputs that are only passed to the final call.
+        :param call_link_label: optional call link label of the final call. Those of the other calls are suffixed with
+            their level and number.
+        :return: the results of the final call.
+        """
+        prefix = call_link_label or function.__name__
+        level = 0
+
+        def get_number_of_links(items):
+            return sum(len(item) for item in items)
+
+        if 'reduction_chunk_size' in self.inputs:
+            chunk_size = self.inputs.reduction_chunk_size.value
+        else:
+            chunk_size = get_number_of_links(items)
+
+        while get_number_of_links(items) > chunk_size:
+            chunks = [[]]
+
+            for item in items:
+                if get_number_of_links(chunks[-1]) + len(item) > chunk_size:
+                    chunks.append([])
+                chunks[-1].append(item)
+
+            level += 1
+            items = []
+
+            for number, chunk in enumerate(chunks, start=1):
+                inputs = dict(common_inputs)
+
+                for item in chunk:
+                    inputs.update(item)
+
+                inputs['metadata'] = {'call_link_label': f'{prefix}_{level}_{number}'}
+                items.append(get_item(function(**inputs), f'merged_{number}'))
+
+        inputs = dict(common_inputs, **final_inputs)
+
+        for item in items:
+            inputs.update(item)
+
+        if call_link_label is not None:
+            inputs['metadata'] = {'call_link_label': call_link_label}
+
+        return function(**inputs)
 
     def results(self):
         """Attach the ``FolderData`` with all collected dynamical matrices as output."""
         self.out('retrieved', self.ctx.merged_retrieved)
         self.out('output_parameters', self.ctx.merged_output_parameters)
+        self.out('frequencies', self.ctx.merged_frequencies)
+
+        if self.inputs.parse_dynamical_matrices.value:
+            self.out('dynamical_matrices', parse_dynamical_matrices(self.ctx.merged_retrieved))
+
         self.report('workchain completed successfully')
@@ -3,9 +3,17 @@
 # -*- coding: utf-8 -*-
 """Workchain to compute the phonon dispersion from the raw initial unrelaxed structure."""
 from aiida import orm
+from aiida.common.escaping import escape_for_bash
 from aiida.common.extendeddicts import AttributeDict
 from aiida.engine import ToContext, WorkChain, if_
-from aiida.plugins import CalculationFactory, WorkflowFactory
+from aiida.plugins import CalculationFactory, DataFactory, WorkflowFactory
+from aiida_quantumespresso.calculations.namelists import NamelistsCalculation
+
+from aiida_quantumespresso_ph.utils.cache import (
+    FORCE_CONSTANTS_CACHE_EXTRA,
+    get_cached_force_constants,
+    get_force_constants_cache_key,
+)
 
 PhBaseWorkChain = WorkflowFactory('quantumespresso.ph.base')
 PwBaseWorkChain = WorkflowFactory('quantumespresso.pw.base')
@@ -13,10 +21,41 @@ Q2rBaseWorkChain = WorkflowFactory('quantumespresso.q2r.base')
 MatdynBaseWorkChain = WorkflowFactory('quantumespresso.matdyn.base')
 
 PhCalculation = CalculationFactory('quantumespresso.ph')
+MatdynCalculation = CalculationFactory('quantumespresso.matdyn')
+interpolate_phonons = CalculationFactory('quantumespresso_ph.interpolate_phonons')
+parse_matdyn_dos = CalculationFactory('quantumespresso_ph.parse_matdyn_dos')
+parse_dynamical_matrices = CalculationFactory('quantumespresso_ph.parse_dynamical_matrices')
+split_kpoints = CalculationFactory('quantumespresso_ph.split_kpoints')
+merge_matdyn_chunks = CalculationFactory('quantumespresso_ph.merge_matdyn_chunks')
+
+DynamicalMatrixData = DataFactory('quantumespresso_ph.dynamical_matrix')
+
+FUSED_DOS_PREFIX = 'dos_'
+DISPERSION_CHUNK_OVERLAP = 1
 
 
 class PhInterpolateWorkChain(WorkChain):
-    """Workchain to compute the interpolation steps for a phonon dispersion from the already computed Dyn mat."""
+    """Workchain to compute the interpolation steps for a phonon dispersion from the already computed Dyn mat.
+
+    If the ``mode`` is ``python``, the force constants, the dispersion and the density of states are computed in process
+    by the ``interpolate_phonons`` calcfunction, instead of by ``q2r.x`` and ``matdyn.x`` jobs that each wait in the
+    queue. The outputs are the same, and the ``parameters`` of the ``matdyn`` namespace are used if they are specified.
+    The DOS is then computed with a Gaussian smearing, which requires a ``degauss`` larger than zero in the parameters,
+    since the tetrahedron method that ``matdyn.x`` uses by default is not implemented.
+
+    If ``num_chunks`` is specified, the k-points of the dispersion and of the DOS mesh are split into that many chunks,
+    which are computed by separate ``matdyn.x`` jobs in parallel. The bands of the chunks are merged and the DOS is
+    computed from the frequencies of the chunks of the mesh, with the Gaussian smearing of the ``python`` mode. Since
+    the tetrahedron method that ``matdyn.x`` uses by default cannot be split over chunks, the DOS then requires a
+    ``degauss`` larger than zero in the ``matdyn`` parameters. Each chunk of the dispersion starts with the last k-point
+    of the previous one, which is dropped when merging, such that ``matdyn.x`` takes the direction of the non-analytic
+    term at a Gamma point from the same preceding k-point as without chunks.
+
+    If ``use_force_constants_cache`` is set, which is not the default, the ``q2r.x`` step is skipped if force constants
+    were already computed from dynamical matrix files with the same content and with the same ``q2r.x`` parameters, in
+    which case these force constants are used. The force constants computed by ``q2r.x`` are marked with their cache key
+    for later runs.
+    """
 
     @classmethod
     def define(cls, spec):
@@ -25,9 +64,22 @@ class PhInterpolateWorkChain(WorkChain):
         spec.input(
             'dynmat_folder',
             valid_type=(orm.RemoteData, orm.FolderData),
-            required=True,
+            required=False,
             help='Retrieved folder containing the dynamical matrix'
         )
+        spec.input(
+            'dynamical_matrices',
+            valid_type=DynamicalMatrixData,
+            required=False,
+            help='The parsed dynamical matrices, which can replace the `dynmat_folder` if the `mode` is `python`.',
+        )
+        spec.input(
+            'mode',
+            valid_type=orm.Str,
+            default=lambda: orm.Str('qe'),
+            validator=cls.validate_mode,
+            help='Whether to interpolate with the `q2r.x` and `matdyn.x` codes, `qe`, or in process, `python`.',
+        )
         spec.input(
             'dos',
             valid_type=orm.Bool,
@@ -35,6 +87,30 @@ class PhInterpolateWorkChain(WorkChain):
             default=lambda: orm.Bool(True),
             help='Whether to compute the phonon density of states (DOS).',
         )
+        spec.input(
+            'fuse_matdyn',
+            valid_type=orm.Bool,
+            default=lambda: orm.Bool(False),
+            help='Whether to compute the DOS in the job of the dispersion, with a second run of `matdyn.x` in its job '
+            'script, instead of in a separate job. Requires an `InstalledCode` for `matdyn.x`.',
+        )
+        spec.input(
+            'use_force_constants_cache',
+            valid_type=orm.Bool,
+            default=lambda: orm.Bool(False),
+            help='Whether to reuse force constants computed from the same dynamical matrices and `q2r.x` parameters, '
+            'by any earlier work chain in the profile, instead of running `q2r.x`. Off by default, since the reused '
+            'force constants then do not derive from the inputs of this work chain in the provenance graph.',
+        )
+        spec.input(
+            'num_chunks',
+            valid_type=orm.Int,
+            required=False,
+            validator=cls.validate_num_chunks,
+            help='The number of chunks into which the k-points of the dispersion and of the DOS are split, each '
+            'computed by a separate `matdyn.x` job. With `dos`, requires a `degauss` larger than zero in the `matdyn` '
+            'parameters.',
+        )
         spec.input(
             'kpoints_dispersion',
             valid_type=orm.KpointsData,
@@ -47,21 +123,30 @@ class PhInterpolateWorkChain(WorkChain):
             required=False,
             help='Kpoints mesh for the phonon density of states (DOS).',
         )
-        spec.expose_inputs(Q2rBaseWorkChain, namespace='q2r', exclude=('q2r.parent_folder',))
+        # The namespaces of the codes are only required if the ``mode`` is ``qe``, which is checked by the validator
+        namespace_options = {'required': False, 'populate_defaults': False}
+        spec.expose_inputs(
+            Q2rBaseWorkChain, namespace='q2r', exclude=('q2r.parent_folder',), namespace_options=namespace_options
+        )
         spec.expose_inputs(
             MatdynBaseWorkChain,
             namespace='matdyn',
             exclude=('matdyn.force_constants', 'matdyn.kpoints'),
-            namespace_options={'populate_defaults': False}
+            namespace_options=namespace_options
         )
+        spec.inputs.validator = cls.validate_inputs
 
         spec.outline(
             cls.setup,
-            cls.run_q2r,
-            cls.inspect_q2r,
-            cls.run_matdyn,
-            if_(cls.should_run_dos)(cls.run_matdyn_dos,),
-            cls.results,
+            if_(cls.should_run_python)(cls.run_python,).else_(
+                cls.get_cached_force_constants,
+                if_(cls.should_run_q2r)(
+                    cls.run_q2r,
+                    cls.inspect_q2r,
+                ),
+                cls.run_matdyn,
+                cls.results,
+            ),
         )
         spec.output('output_parameters', valid_type=orm.Dict)
         spec.output('output_phonon_bands', valid_type=orm.BandsData)
@@ -73,10 +158,115 @@ class PhInterpolateWorkChain(WorkChain):
         )
         spec.exit_code(403, 'ERROR_MATDYN_DOS_FAILED', message='The MatdynBaseWorkChain sub-workchain for DOS failed.')
 
+    @staticmethod
+    def validate_mode(value, _):
+        """Validate the ``mode`` input."""
+        if value.value not in ('qe', 'python'):
+            return f'`mode` should be `qe` or `python`, but got: {value.value}'
+
+    @staticmethod
+    def validate_num_chunks(value, _):
+        """Validate the ``num_chunks`` input."""
+        if value is not None and value.value < 1:
+            return f'`num_chunks` should be a positive integer, but got: {value.value}'
+
+    @staticmethod
+    def validate_inputs(inputs, _):
+        """Validate the top level namespace."""
+        if inputs.get('mode', orm.Str('qe')).value == 'qe':
+            missing = [name for name in ('dynmat_folder', 'q2r', 'matdyn') if name not in inputs]
+            if missing:
+                return f'the inputs {missing} are required if the `mode` is `qe`.'
+
+            code = inputs['matdyn']['matdyn']['code']
+            if inputs.get('fuse_matdyn', orm.Bool(False)).value and not isinstance(code, orm.InstalledCode):
+                return '`fuse_matdyn` requires an `InstalledCode` for `matdyn.x`.'
+
+            if inputs.get('fuse_matdyn', orm.Bool(False)).value and 'num_chunks' in inputs:
+                return '`fuse_matdyn` and `num_chunks` cannot be specified at the same time.'
+
+            parameters = inputs['matdyn']['matdyn'].get('parameters', orm.Dict()).get_dict()
+            degauss = parameters.get('INPUT', {}).get('degauss', 0)
+
+            if inputs.get('dos', orm.Bool(True)).value and 'num_chunks' in inputs and not degauss > 0:
+                return '`num_chunks` with `dos` requires a `degauss` larger than zero in the `matdyn` parameters, ' \
+                    'since the tetrahedron method cannot be split over chunks.'
+
+            return None
+
+        if 'dynamical_matrices' not in inputs and not isinstance(inputs.get('dynmat_folder'), orm.FolderData):
+            return 'either `dynamical_matrices` or a `FolderData` as `dynmat_folder` is required if the `mode` is ' \
+                '`python`.'
+
+        parameters = inputs.get('matdyn', {}).get('matdyn', {}).get('parameters', orm.Dict())
+        asr = parameters.get_dict().get('INPUT', {}).get('asr', 'no')
+        degauss = parameters.get_dict().get('INPUT', {}).get('degauss', 0)
+
+        if asr not in ('no', 'simple'):
+            return f'the acoustic sum rule `{asr}` is not supported if the `mode` is `python`, only `no` and `simple`.'
+
+        if inputs.get('dos', orm.Bool(True)).value and not degauss > 0:
+            return '`dos` requires a `degauss` larger than zero in the `matdyn` parameters if the `mode` is ' \
+                '`python`, since the tetrahedron method is not implemented.'
+
     def setup(self):
         """Initialize context variables."""
         #self.ctx.structure = self.inputs.pw.pw.structure
 
+    def should_run_python(self):
+        """Return whether the interpolation is computed in process."""
+        return self.inputs.mode.value == 'python'
+
+    def run_python(self):
+        """Compute the force constants, the dispersion and the density of states in process."""
+        if 'dynamical_matrices' in self.inputs:
+            dynamical_matrices = self.inputs.dynamical_matrices
+        else:
+            dynamical_matrices = parse_dynamical_matrices(self.inputs.dynmat_folder)
+
+        inputs = {
+            'dynamical_matrices': dynamical_matrices,
+            'kpoints_dispersion': self.inputs.kpoints_dispersion,
+            'metadata': {
+                'call_link_label': 'interpolate_phonons'
+            },
+        }
+
+        if self.should_run_dos():
+            inputs['kpoints_dos'] = self.inputs.kpoints_dos
+
+        if 'parameters' in self.inputs.get('matdyn', {}).get('matdyn', {}):
+            inputs['parameters'] = self.inputs.matdyn.matdyn.parameters
+
+        results = interpolate_phonons(**inputs)
+
+        self.out('output_parameters', results['output_parameters'])
+        self.out('output_phonon_bands', results['output_phonon_bands'])
+        if 'output_phonon_dos' in results:
+            self.out('output_phonon_dos', results['output_phonon_dos'])
+
+    def get_cached_force_constants(self):
+        """Look for force constants computed from the same dynamical matrices and ``q2r.x`` parameters."""
+        if not self.inputs.use_force_constants_cache.value:
+            return
+
+        parameters = self.inputs.q2r.q2r.get('parameters', orm.Dict()).get_dict()
+        self.ctx.force_constants_cache_key = get_force_constants_cache_key(self.inputs.dynmat_folder, parameters)
+
+        if self.ctx.force_constants_cache_key is None:
+            self.report('the dynamical matrix files cannot be read, the force constants cannot be taken from the cache')
+            return
+
+        force_constants = get_cached_force_constants(self.ctx.force_constants_cache_key)
+
+        if force_constants is not None:
+            self.report(f'reusing the force constants ForceConstantsData<{force_constants.pk}> from the cache')
+            self.ctx.force_constants = force_constants
+
+    def should_run_q2r(self):
+        """Return whether the force constants still have to be computed by ``q2r.x``."""
+        return 'force_constants' not in self.ctx
+
     def run_q2r(self):
         """Run the Q2rCalculation."""
         inputs = AttributeDict(self.inputs.q2r)
@@ -98,46 +288,149 @@ class PhInterpolateWorkChain(WorkChain):
 
         self.ctx.force_constants = self.ctx.workflow_q2r.outputs.force_constants
 
-    def run_matdyn(self):
-        """Run the MatdynCalculation."""
-        inputs = AttributeDict(self.inputs.matdyn)
-
-        inputs['matdyn']['force_constants'] = self.ctx.force_constants
-        inputs['matdyn']['kpoints'] = self.inputs.kpoints_dispersion
-
-        parameters = inputs['matdyn'].get('parameters', orm.Dict({})).get_dict()
-        parameters['INPUT']['dos'] = False
-        inputs['matdyn']['parameters'] = orm.Dict(parameters)
-
-        running = self.submit(MatdynBaseWorkChain, **inputs)
+        if self.ctx.get('force_constants_cache_key', None) is not None:
+            self.ctx.force_constants.base.extras.set(FORCE_CONSTANTS_CACHE_EXTRA, self.ctx.force_constants_cache_key)
 
-        self.report(f'launching MatdynBaseWorkChain<{running.pk}>')
-
-        return ToContext(workflow_matdyn=running)
+    def run_matdyn(self):
+        """Run the MatdynCalculation of the dispersion and, at the same time, the one of the DOS.
+
+        Both work chains are submitted in this step, such that they wait in the queue at the same time. If
+        ``fuse_matdyn`` is set, the DOS is instead computed by a second run of ``matdyn.x`` in the job script of the
+        dispersion.
+        """
+        if 'num_chunks' in self.inputs:
+            return self._run_matdyn_chunks()
+
+        inputs = self._get_matdyn_inputs(self.inputs.kpoints_dispersion, dos=False)
+
+        if self.should_run_dos() and self.inputs.fuse_matdyn.value:
+            options = inputs.matdyn.metadata.options
+            options['append_text'] = '\n'.join([options.get('append_text', ''), self._get_fused_dos_script(options)])
+
+        workchains = {'workflow_matdyn': self.submit(MatdynBaseWorkChain, **inputs)}
+        self.report(f'launching MatdynBaseWorkChain<{workchains["workflow_matdyn"].pk}>')
+
+        if self.should_run_dos() and not self.inputs.fuse_matdyn.value:
+            inputs = self._get_matdyn_inputs(self.inputs.kpoints_dos, dos=True)
+            workchains['workflow_matdyn_dos'] = self.submit(MatdynBaseWorkChain, **inputs)
+            self.report(f'launching MatdynBaseWorkChain<{workchains["workflow_matdyn_dos"].pk}> for the DOS')
+
+        return ToContext(**workchains)
+
+    def _run_matdyn_chunks(self):
+        """Run a MatdynCalculation for each chunk of the k-points of the dispersion and of the DOS mesh.
+
+        The chunks of the DOS mesh are computed as explicit lists of k-points, i.e. with ``dos`` set to false, and the
+        DOS is computed from their frequencies when the chunks are merged. The chunks of the dispersion overlap by
+        ``DISPERSION_CHUNK_OVERLAP`` k-points.
+        """
+        kpoints = {'dispersion': self.inputs.kpoints_dispersion}
+
+        if self.should_run_dos():
+            kpoints['dos'] = self.inputs.kpoints_dos
+
+        for name, points in kpoints.items():
+            inputs = {'metadata': {'call_link_label': f'split_{name}'}}
+
+            if name == 'dispersion':
+                inputs['overlap'] = orm.Int(DISPERSION_CHUNK_OVERLAP)
+
+            chunks = split_kpoints(points, self.inputs.num_chunks, **inputs)
+
+            for label, chunk in sorted(chunks.items(), key=lambda item: int(item[0].split('_')[-1])):
+                key = f'{name}_{label.split("_")[-1]}'
+                inputs = self._get_matdyn_inputs(chunk, dos=False)
+                inputs.metadata = {'call_link_label': key}
+                running = self.submit(MatdynBaseWorkChain, **inputs)
+                self.report(f'launching MatdynBaseWorkChain<{running.pk}> for the chunk {key}')
+                self.to_context(**{f'matdyn_chunks.{key}': running})
+
+    def _get_matdyn_inputs(self, kpoints, dos):
+        """Return the inputs of the ``MatdynBaseWorkChain`` for the given k-points, with ``dos`` set accordingly."""
+        inputs = AttributeDict(self.exposed_inputs(MatdynBaseWorkChain, namespace='matdyn'))
+        inputs.matdyn = AttributeDict(inputs.matdyn)
+        inputs.matdyn.metadata = AttributeDict(inputs.matdyn.get('metadata', {}))
+        inputs.matdyn.metadata.options = AttributeDict(inputs.matdyn.metadata.get('options', {}))
+
+        inputs.matdyn.force_constants = self.ctx.force_constants
+        inputs.matdyn.kpoints = kpoints
+
+        parameters = inputs.matdyn.get('parameters', orm.Dict({})).get_dict()
+        parameters.setdefault('INPUT', {})['dos'] = dos
+        inputs.matdyn.parameters = orm.Dict(parameters)
+
+        return inputs
+
+    def _get_fused_dos_script(self, options):
+        """Return the lines of the job script that run ``matdyn.x`` for the DOS after the run for the dispersion.
+
+        The input file of the DOS is written by a here document. The frequencies and displacements of the second run
+        are written to other files, such that those of the dispersion are not overwritten, and the DOS is written to the
+        file that is retrieved by the ``MatdynCalculation``.
+
+        :param options: the scheduler options of the ``MatdynCalculation`` of the dispersion.
+        """
+        parameters = self.inputs.matdyn.matdyn.get('parameters', orm.Dict({})).get_dict()
+        frequencies_name = MatdynCalculation._PHONON_FREQUENCIES_NAME  # pylint: disable=protected-access
+        modes_name = MatdynCalculation._PHONON_MODES_NAME  # pylint: disable=protected-access
+        namelist = dict(parameters.get('INPUT', {}))
+        namelist.update({
+            'dos': True,
+            'flfrc': self.ctx.force_constants.filename,
+            'flfrq': f'{FUSED_DOS_PREFIX}{frequencies_name}',
+            'flvec': f'{FUSED_DOS_PREFIX}{modes_name}',
+            'fldos': MatdynCalculation._PHONON_DOS_NAME,  # pylint: disable=protected-access
+        })
+        namelist.update(zip(('nk1', 'nk2', 'nk3'), self.inputs.kpoints_dos.get_kpoints_mesh()[0]))
+
+        content = NamelistsCalculation.generate_input_file({'INPUT': namelist})
+        command = ' '.join(escape_for_bash(value) for value in self._get_fused_dos_cmdline(options))
+
+        return '\n'.join([
+            f"cat > '{FUSED_DOS_PREFIX}aiida.in' << 'EOF'",
+            content.rstrip(),
+            'EOF',
+            f"{command} -in '{FUSED_DOS_PREFIX}aiida.in' > '{FUSED_DOS_PREFIX}aiida.out'",
+        ])
+
+    def _get_fused_dos_cmdline(self, options):
+        """Return the command line of the ``matdyn.x`` run of the DOS, which is launched as that of the dispersion.
+
+        As by ``CalcJob.presubmit``, the executable is prefixed by the ``mpirun_command`` of the computer, formatted
+        with the job resources, and the ``mpirun_extra_params`` if the calculation runs with MPI, and it is followed by
+        the ``CMDLINE`` of the ``settings``.
+
+        :param options: the scheduler options of the ``MatdynCalculation`` of the dispersion.
+        :return: list with the parts of the command line.
+        """
+        code = self.inputs.matdyn.matdyn.code
+        computer = code.computer
+        settings = self.inputs.matdyn.matdyn.get('settings', orm.Dict()).get_dict()
+        cmdline_params = {key.upper(): value for key, value in settings.items()}.get('CMDLINE', [])
+        withmpi = options.get('withmpi', code.with_mpi if code.with_mpi is not None else True)
+
+        if not withmpi:
+            return code.get_prepend_cmdline_params() + code.get_executable_cmdline_params(cmdline_params)
+
+        scheduler = computer.get_scheduler()
+        resources = dict(options.get('resources', {}))
+        scheduler.preprocess_resources(resources, computer.get_default_mpiprocs_per_machine())
+        job_resource = scheduler.create_job_resource(**resources)
+        substitutions = dict(job_resource.items(), tot_num_mpiprocs=job_resource.get_tot_num_mpiprocs())
+        mpi_args = [value.format(**substitutions) for value in computer.get_mpirun_command()]
+        prepend_cmdline_params = code.get_prepend_cmdline_params(mpi_args, options.get('mpirun_extra_params', []))
+
+        return prepend_cmdline_params + code.get_executable_cmdline_params(cmdline_params)
 
     def should_run_dos(self):
         """Determine whether to run the MatdynCalculation for DOS."""
         return self.inputs.dos.value
 
-    def run_matdyn_dos(self):
-        """Run the MatdynCalculation."""
-        inputs = AttributeDict(self.inputs.matdyn)
-
-        inputs['matdyn']['force_constants'] = self.ctx.force_constants
-        inputs['matdyn']['kpoints'] = self.inputs.kpoints_dos
-
-        parameters = inputs['matdyn'].get('parameters', orm.Dict({})).get_dict()
-        parameters['INPUT']['dos'] = True
-        inputs['matdyn']['parameters'] = orm.Dict(parameters)
-
-        running = self.submit(MatdynBaseWorkChain, **inputs)
-
-        self.report(f'launching MatdynBaseWorkChain<{running.pk}>')
-
-        return ToContext(workflow_matdyn_dos=running)
-
     def results(self):
         """Run the final step after computing the dispersion steps."""
+        if 'matdyn_chunks' in self.ctx:
+            return self._merge_matdyn_chunks()
+
         matdyn_calc = self.ctx.workflow_matdyn
         matdyn_dos = self.ctx.get('workflow_matdyn_dos', None)
 
@@ -151,3 +444,42 @@ class PhInterpolateWorkChain(WorkChain):
         self.out('output_phonon_bands', matdyn_calc.outputs.output_phonon_bands)
         if matdyn_dos is not None:
             self.out('output_phonon_dos', matdyn_dos.outputs.output_phonon_dos)
+        elif self.should_run_dos():
+            retrieved = matdyn_calc.outputs.retrieved
+            dos_name = MatdynCalculation._PHONON_DOS_NAME  # pylint: disable=protected-access
+
+            if dos_name not in retrieved.base.repository.list_object_names():
+                return self.exit_codes.ERROR_MATDYN_DOS_FAILED
+
+            self.out('output_phonon_dos', parse_matdyn_dos(retrieved))
+
+    def _merge_matdyn_chunks(self):
+        """Merge the outputs of the MatdynCalculation of each chunk of the k-points."""
+        chunks = self.ctx.matdyn_chunks
+
+        for key, workchain in chunks.items():
+            if not workchain.is_finished_ok:
+                self.report(f'MatdynBaseWorkChain<{workchain.pk}> of the chunk {key} failed')
+
+                if key.startswith('dos_'):
+                    return self.exit_codes.ERROR_MATDYN_DOS_FAILED
+
+                return self.exit_codes.ERROR_MATDYN_FAILED
+
+        inputs = {'overlap': orm.Int(DISPERSION_CHUNK_OVERLAP)}
+
+        for key, workchain in chunks.items():
+            inputs[key] = workchain.outputs.output_phonon_bands
+            inputs[f'output_parameters_{key}'] = workchain.outputs.output_parameters
+
+        if 'parameters' in self.inputs.matdyn.matdyn:
+            inputs['parameters'] = self.inputs.matdyn.matdyn.parameters
+
+        merged = merge_matdyn_chunks(
+            self.inputs.kpoints_dispersion, **inputs, metadata={'call_link_label': 'merge_matdyn_chunks'}
+        )
+
+        self.out('output_parameters', merged['output_parameters'])
+        self.out('output_phonon_bands', merged['output_phonon_bands'])
+        if 'output_phonon_dos' in merged:
+            self.out('output_phonon_dos', merged['output_phonon_dos'])
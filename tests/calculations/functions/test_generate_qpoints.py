@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+"""Tests for the ``generate_qpoints`` calculation function."""
+from aiida import orm
+import pytest
+
+from aiida_quantumespresso_ph.calculations.functions.generate_qpoints import generate_qpoints
+
+
+@pytest.mark.usefixtures('aiida_profile')
+def test_generate_qpoints(generate_structure, generate_kpoints_mesh):
+    """Test the ``generate_qpoints`` calculation function."""
+    structure = generate_structure()
+    symmetries = [{'symmetry_number': index} for index in list(range(24)) + list(range(32, 56))]
+    results = generate_qpoints(orm.Dict({'symmetries': symmetries}), structure, generate_kpoints_mesh(2))
+
+    assert sorted(results) == ['folder', 'qpoint_0', 'qpoint_1', 'qpoint_2']
+
+    lines = results['folder'].base.repository.get_object_content('DYN_MAT/dynamical-matrix-0').splitlines()
+    assert lines[:2] == ['   2   2   2', '   3']
+    assert [float(value) for value in lines[2].split()] == [0., 0., 0.]
@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+"""Tests for the ``split_kpoints`` and ``merge_matdyn_chunks`` calculation functions."""
+from aiida import orm
+import numpy
+import pytest
+
+from aiida_quantumespresso_ph.calculations.functions.merge_matdyn_chunks import merge_matdyn_chunks
+from aiida_quantumespresso_ph.calculations.functions.split_kpoints import split_kpoints
+from aiida_quantumespresso_ph.utils.interpolation import get_density_of_states
+
+
+@pytest.mark.usefixtures('aiida_profile')
+def test_split_kpoints():
+    """Test that the k-points are split into chunks of consecutive k-points that keep the cell."""
+    kpoints = orm.KpointsData()
+    kpoints.set_cell([[10., 0., 0.], [0., 10., 0.], [0., 0., 10.]])
+    kpoints.set_kpoints([[0., 0., 0.], [.1, 0., 0.], [.2, 0., 0.], [.3, 0., 0.], [.4, 0., 0.]])
+
+    chunks = split_kpoints(kpoints, orm.Int(2))
+
+    assert sorted(chunks) == ['chunk_1', 'chunk_2']
+    assert chunks['chunk_1'].get_kpoints()[:, 0].tolist() == [0., .1, .2]
+    assert chunks['chunk_2'].get_kpoints()[:, 0].tolist() == [.3, .4]
+    assert chunks['chunk_1'].cell.tolist() == kpoints.cell.tolist()
+
+    chunks = split_kpoints(kpoints, orm.Int(2), orm.Int(1))
+    assert chunks['chunk_1'].get_kpoints()[:, 0].tolist() == [0., .1, .2]
+    assert chunks['chunk_2'].get_kpoints()[:, 0].tolist() == [.2, .3, .4]
+
+    mesh = orm.KpointsData()
+    mesh.set_kpoints_mesh([2, 2, 1])
+
+    assert len(split_kpoints(mesh, orm.Int(8))) == 4
+
+
+@pytest.mark.usefixtures('aiida_profile')
+def test_merge_matdyn_chunks():
+    """Test that the bands of the chunks are concatenated and the DOS is computed from the chunks of the mesh."""
+    kpoints = orm.KpointsData()
+    kpoints.set_kpoints([[0., 0., 0.], [.1, 0., 0.], [.2, 0., 0.]])
+    frequencies = numpy.array([[0., 1., 2.], [1., 2., 3.], [2., 3., 4.]])
+    chunks = {}
+
+    # The second chunk of the dispersion overlaps with the last k-point of the first
+    for label, bands in (('dispersion_2', frequencies[1:]), ('dispersion_1', frequencies[:2]), ('dos_1', frequencies)):
+        chunks[label] = orm.BandsData()
+        chunks[label].set_kpoints(numpy.zeros((len(bands), 3)))
+        chunks[label].set_bands(bands, units='THz')
+        chunks[f'output_parameters_{label}'] = orm.Dict({'wall_time_seconds': 2., 'warnings': [label]})
+
+    parameters = orm.Dict({'INPUT': {'deltaE': 0.5, 'degauss': 3.0}})
+    results = merge_matdyn_chunks(kpoints, parameters, orm.Int(1), **chunks)
+
+    assert results['output_phonon_bands'].get_bands().tolist() == frequencies.tolist()
+    assert results['output_phonon_bands'].get_kpoints().tolist() == kpoints.get_kpoints().tolist()
+    assert results['output_parameters'].get_dict() == {
+        'wall_time_seconds': 6.,
+        'warnings': ['dispersion_1', 'dispersion_2', 'dos_1'],
+        'number_of_kpoints': 3,
+    }
+
+    grid, density = get_density_of_states(frequencies / 0.0299792458, step=0.5, smearing=3.0)
+    numpy.testing.assert_allclose(results['output_phonon_dos'].get_x()[1], grid)
+    numpy.testing.assert_allclose(results['output_phonon_dos'].get_y()[0][1], density)
+
+    assert 'output_phonon_dos' not in merge_matdyn_chunks(kpoints, dispersion_1=chunks['dos_1'])
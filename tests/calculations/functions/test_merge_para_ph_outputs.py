@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+"""Tests for the ``merge_para_ph_outputs`` calculation function."""
+from aiida import orm
+import numpy
+import pytest
+
+from aiida_quantumespresso_ph.calculations.functions.merge_para_ph_outputs import merge_para_ph_outputs
+
+
+def generate_output(number_of_qpoints, offset=0):
+    """Return a ``Dict`` that mimics the ``output_parameters`` of a ``PhCalculation``."""
+    output = {
+        'wall_time_seconds': 10.,
+        'number_of_atoms': 2,
+        'number_of_irr_representations_for_each_q': [offset + index for index in range(number_of_qpoints)],
+    }
+    for index in range(1, number_of_qpoints + 1):
+        output[f'dynamical_matrix_{index}'] = {'q_point': [offset + index, 0, 0], 'frequencies': [offset, None]}
+
+    return orm.Dict(output)
+
+
+@pytest.mark.usefixtures('aiida_profile')
+def test_merge_para_ph_outputs():
+    """Test that the dynamical matrices are numbered by the index of their q-point and not by the sorted labels."""
+    outputs = {f'output_{index}': generate_output(1, offset=index) for index in range(1, 12)}
+    results = merge_para_ph_outputs(**outputs)
+    merged = results['output_parameters'].get_dict()
+    frequencies = results['frequencies']
+
+    assert merged['number_of_qpoints'] == 11
+    assert merged['wall_time_seconds'] == 110.
+    assert merged['number_of_irr_representations_for_each_q'] == list(range(1, 12))
+    assert not any(key.startswith('dynamical_matrix_') for key in merged)
+    assert frequencies.get_array('indices').tolist() == list(range(1, 12))
+    assert frequencies.get_array('q_points')[:, 0].tolist() == [index + 1 for index in range(1, 12)]
+    assert frequencies.get_array('frequencies')[:, 0].tolist() == list(range(1, 12))
+    assert numpy.isnan(frequencies.get_array('frequencies')[:, 1]).all()
+
+
+@pytest.mark.usefixtures('aiida_profile')
+def test_merge_para_ph_outputs_batches():
+    """Test the ``batches`` input of ``merge_para_ph_outputs``."""
+    batches = orm.Dict({'batch_1': [2, 3], 'batch_2': [1]})
+    results = merge_para_ph_outputs(
+        batch_1=generate_output(2, offset=10), batch_2=generate_output(1, offset=20), batches=batches
+    )
+    merged = results['output_parameters'].get_dict()
+
+    assert merged['number_of_qpoints'] == 3
+    assert merged['number_of_irr_representations_for_each_q'] == [20, 10, 11]
+    assert results['frequencies'].get_array('q_points').tolist() == [[21, 0, 0], [11, 0, 0], [12, 0, 0]]
+
+
+@pytest.mark.usefixtures('aiida_profile')
+def test_merge_para_ph_outputs_interrupted_wall_times():
+    """Test that the ``interrupted_wall_times`` are added to the total wall time."""
+    interrupted_wall_times = orm.Dict({'output_1': 100., 'output_2': 50.})
+    merged = merge_para_ph_outputs(
+        output_1=generate_output(1),
+        output_2=generate_output(1, offset=1),
+        interrupted_wall_times=interrupted_wall_times
+    )['output_parameters'].get_dict()
+
+    assert merged['wall_time_seconds'] == 170.
+
+
+@pytest.mark.usefixtures('aiida_profile')
+def test_merge_para_ph_outputs_merged():
+    """Test that merging outputs with the ``merged_N`` outputs of previous calls gives the same result as at once."""
+    outputs = {f'output_{index}': generate_output(1, offset=index) for index in range(1, 6)}
+    batches = orm.Dict({'batch_1': [6, 7]})
+    results = merge_para_ph_outputs(output_2=outputs['output_2'], output_5=outputs['output_5'])
+
+    for inputs in ({
+        'output_1': outputs['output_1'],
+        'batch_1': generate_output(2, offset=6),
+        'batches': batches
+    }, {
+        'output_3': outputs['output_3'],
+        'output_4': outputs['output_4']
+    }):
+        inputs.update(merged_1=results['output_parameters'], merged_frequencies_1=results['frequencies'])
+        results = merge_para_ph_outputs(**inputs)
+
+    reference = merge_para_ph_outputs(batch_1=generate_output(2, offset=6), batches=batches, **outputs)
+
+    assert results['output_parameters'].get_dict() == reference['output_parameters'].get_dict()
+
+    for name in ('indices', 'q_points', 'frequencies'):
+        numpy.testing.assert_array_equal(
+            results['frequencies'].get_array(name), reference['frequencies'].get_array(name)
+        )
@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+"""Tests for the ``recollect_qpoints`` calculation function."""
+from aiida import orm
+import pytest
+
+from aiida_quantumespresso_ph.calculations.functions.recollect_qpoints import recollect_qpoints
+
+
+def generate_retrieved(filenames):
+    """Return a ``FolderData`` with dynamical matrix files whose content is their file name."""
+    folder = orm.FolderData()
+
+    for filename in filenames:
+        folder.base.repository.put_object_from_bytes(filename.encode(), f'DYN_MAT/{filename}')
+
+    return folder
+
+
+@pytest.mark.usefixtures('aiida_profile')
+def test_recollect_qpoints():
+    """Test that the merged folder references the objects of the retrieved folders instead of storing them twice."""
+    retrieved = {
+        'qpoint_0': generate_retrieved(['dynamical-matrix-0']),
+        'qpoint_2': generate_retrieved(['dynamical-matrix-']),
+        'qpoint_3': generate_retrieved(['dynamical-matrix-3']),
+        'batch_1': generate_retrieved(['dynamical-matrix-1', 'dynamical-matrix-2']),
+    }
+    batches = orm.Dict({'batch_1': [1, 4]}).store()
+
+    for folder in retrieved.values():
+        folder.store()
+
+    backend = orm.FolderData().backend.get_repository()
+    objects = set(backend.list_objects())
+
+    merged = recollect_qpoints(batches=batches, **retrieved)
+    repository = merged.base.repository
+
+    assert merged.is_stored
+    assert sorted(repository.list_object_names('DYN_MAT')) == [f'dynamical-matrix-{index}' for index in range(5)]
+
+    # The only new objects in the repository backend are those of the calculation function node, e.g. its source file
+    process_objects = {obj.key for obj in merged.creator.base.repository.list_objects()}
+    assert set(backend.list_objects()) - objects <= process_objects
+
+    # Maps the files of the merged folder on their source folder and file
+    sources = {
+        'dynamical-matrix-0': ('qpoint_0', 'dynamical-matrix-0'),
+        'dynamical-matrix-1': ('batch_1', 'dynamical-matrix-1'),
+        'dynamical-matrix-2': ('qpoint_2', 'dynamical-matrix-'),
+        'dynamical-matrix-3': ('qpoint_3', 'dynamical-matrix-3'),
+        'dynamical-matrix-4': ('batch_1', 'dynamical-matrix-2'),
+    }
+    loaded = orm.load_node(merged.pk).base.repository
+
+    for filename, (key, source_filename) in sources.items():
+        source = retrieved[key].base.repository
+        content = source.get_object_content(f'DYN_MAT/{source_filename}')
+        assert repository.get_object(f'DYN_MAT/{filename}').key == source.get_object(f'DYN_MAT/{source_filename}').key
+        assert repository.get_object_content(f'DYN_MAT/{filename}') == content
+        assert loaded.get_object_content(f'DYN_MAT/{filename}') == content
@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+"""Tests for the ``select_parallelization`` calculation function."""
+from aiida import orm
+import numpy
+import pytest
+
+from aiida_quantumespresso_ph.calculations.functions.select_parallelization import select_parallelization
+
+
+@pytest.mark.usefixtures('aiida_profile')
+def test_select_parallelization(generate_structure, generate_kpoints_mesh):
+    """Test the ``select_parallelization`` calculation function."""
+    symmetries = [{'symmetry_number': index} for index in list(range(24)) + list(range(32, 56))]
+    parameters = orm.Dict({'symmetries': symmetries, 'wall_time_seconds': 10., 'number_of_k_points': 10})
+    structure = generate_structure()
+    qpoints = generate_kpoints_mesh(4)
+    settings = {'number_of_cores': 4, 'parent_number_of_cores': 2, 'queue_seconds': 0, 'collection_seconds': 0}
+
+    # Each of the 8 q-points has 3 irreps that each take as long as the SCF run on half the cores, i.e. 15 seconds
+    result = select_parallelization(parameters, structure, qpoints, orm.Dict(settings)).get_dict()
+    assert result == {
+        'mode': 'parallel',
+        'source': 'parent_calculation',
+        'number_of_qpoints': 8,
+        'estimated_qpoint_seconds': 15.,
+        'estimated_serial_seconds': 120.,
+        'estimated_parallel_seconds': 42.,
+    }
+
+    # With the overhead of the queue, the serial run is faster
+    settings = {'number_of_cores': 4, 'parent_number_of_cores': 2}
+    result = select_parallelization(parameters, structure, qpoints, orm.Dict(settings)).get_dict()
+    assert result['mode'] == 'serial'
+
+    cost_model = orm.Dict({'coefficients': [numpy.log(50.), 0, 0, 0, 0]})
+    result = select_parallelization(parameters, structure, qpoints, orm.Dict(settings), cost_model).get_dict()
+    assert result['source'] == 'cost_model'
+    assert numpy.isclose(result['estimated_qpoint_seconds'], 50.)
@@ -472,3 +472,68 @@ def generate_upf_data():
         return UpfData(stream, filename=f'{element}.upf')
 
     return _generate_upf_data
+
+
+@pytest.fixture
+def generate_dynamical_matrix_data():
+    """Return a factory for a ``DynamicalMatrixData`` of a cubic cell with the dynamical matrices of a function."""
+
+    def _generate_dynamical_matrix_data(mesh, positions, function, dielectric_tensor=None, born_charges=None):
+        """Return a ``DynamicalMatrixData`` with the dynamical matrices of ``function`` at each q-point of the mesh.
+
+        Each q-point of the mesh is its own star, as if the crystal had no symmetry, and all atoms are silicon.
+        """
+        import itertools
+
+        import numpy
+
+        from aiida_quantumespresso_ph.data.dynamical_matrix import DynamicalMatrixData
+
+        qpoints = numpy.array(list(itertools.product(*(range(size) for size in mesh)))) / mesh
+        node = DynamicalMatrixData()
+        node.base.attributes.set('mesh', list(mesh))
+        node.base.attributes.set('number_of_qpoints', len(qpoints))
+        node.base.attributes.set('ibrav', 1)
+        node.base.attributes.set('celldm', [10.0, 0., 0., 0., 0., 0.])
+        node.base.attributes.set('species', ['Si'])
+        node.set_array('irreducible_q_points', qpoints)
+        node.set_array('masses', numpy.array([25598.3697299011]))
+        node.set_array('atomic_species', numpy.ones(len(positions), dtype=int))
+        node.set_array('positions', numpy.array(positions, dtype=float))
+
+        if dielectric_tensor is not None:
+            node.set_array('dielectric_tensor', numpy.array(dielectric_tensor, dtype=float))
+            node.set_array('born_charges', numpy.array(born_charges, dtype=float))
+
+        for number, qpoint in enumerate(qpoints, start=1):
+            node.set_array(f'q_points_{number}', qpoint[None, :])
+            node.set_array(f'dynamical_matrices_{number}', function(qpoint)[None, :, :])
+            node.set_array(f'frequencies_{number}', numpy.zeros(3 * len(positions)))
+
+        return node
+
+    return _generate_dynamical_matrix_data
+
+
+@pytest.fixture
+def generate_force_constants():
+    """Return a factory for a ``ForceConstantsData`` of a simple cubic cell with one atom, as written by ``q2r.x``."""
+
+    def _generate_force_constants():
+        from aiida_quantumespresso.data.force_constants import ForceConstantsData
+
+        content = '\n'.join([
+            '    1    1    0  10.0000000   0.0000000   0.0000000   0.0000000   0.0000000   0.0000000',
+            '   1.0000000000   0.0000000000   0.0000000000',
+            '   0.0000000000   1.0000000000   0.0000000000',
+            '   0.0000000000   0.0000000000   1.0000000000',
+            "           1  'Si  '    25598.3697299011",
+            '    1    1      0.0000000000      0.0000000000      0.0000000000',
+            ' F',
+            '   1   1   1',
+            '',
+        ])
+
+        return ForceConstantsData(io.BytesIO(content.encode('utf-8')), filename='real_space_force_constants.dat')
+
+    return _generate_force_constants
@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+"""Tests for the :mod:`aiida_quantumespresso_ph.data.dynamical_matrix` module."""
+import numpy
+import pytest
+
+from aiida_quantumespresso_ph.data.dynamical_matrix import (
+    DynamicalMatrixData,
+    parse_dynamical_matrix_file,
+    parse_qpoints_file,
+)
+
+QPOINTS_FILE = """   2   2   2
+   2
+   0.000000000000000E+00   0.000000000000000E+00   0.000000000000000E+00
+  -5.000000000000000E-01   5.000000000000000E-01  -5.000000000000000E-01
+"""
+
+HEADER = """Dynamical matrix file
+
+  1    2  2 10.2000000  0.0000000  0.0000000  0.0000000  0.0000000  0.0000000
+    1  'Si    '    25598.3697299011
+    1    1      0.0000000000      0.0000000000      0.0000000000
+    2    1      0.2500000000      0.2500000000      0.2500000000
+"""
+
+MATRIX = """
+     Dynamical  Matrix in cartesian axes
+
+     q = (    {:14.9f}{:14.9f}{:14.9f} )
+
+    1    1
+  0.11000000  0.00000000    0.12000000  0.00000000    0.13000000  0.00000000
+  0.21000000  0.00000000    0.22000000  0.00000000    0.23000000  0.00000000
+  0.31000000  0.00000000    0.32000000  0.00000000    0.33000000  0.00000000
+    1    2
+ -0.14000000  0.01000000   -0.15000000  0.02000000   -0.16000000  0.03000000
+ -0.24000000  0.04000000   -0.25000000  0.05000000   -0.26000000  0.06000000
+ -0.34000000  0.07000000   -0.35000000  0.08000000   -0.36000000  0.09000000
+    2    1
+ -0.41000000 -0.01000000   -0.42000000 -0.02000000   -0.43000000 -0.03000000
+ -0.51000000 -0.04000000   -0.52000000 -0.05000000   -0.53000000 -0.06000000
+ -0.61000000 -0.07000000   -0.62000000 -0.08000000   -0.63000000 -0.09000000
+    2    2
+  0.44000000  0.00000000    0.45000000  0.00000000    0.46000000  0.00000000
+  0.54000000  0.00000000    0.55000000  0.00000000    0.56000000  0.00000000
+  0.64000000  0.00000000    0.65000000  0.00000000    0.66000000  0.00000000
+"""
+
+DIELECTRIC = """
+     Dielectric Tensor:
+
+         13.744216406656          0.000000000000          0.000000000000
+          0.000000000000         13.744216406656          0.000000000000
+          0.000000000000          0.000000000000         13.744216406656
+
+     Effective Charges E-U: Z_{alpha}{s,beta}
+
+     atom #    1
+         -0.073060000000          0.000000000000          0.000000000000
+          0.000000000000         -0.073060000000          0.000000000000
+          0.000000000000          0.000000000000         -0.073060000000
+     atom #    2
+         -0.073060000000          0.000000000000          0.000000000000
+          0.000000000000         -0.073060000000          0.000000000000
+          0.000000000000          0.000000000000         -0.073060000000
+"""
+
+DIAGONALIZATION = """
+     Diagonalizing the dynamical matrix
+
+     q = (    0.000000000   0.000000000   0.000000000 )
+
+ **************************************************************************
+     freq (    1) =      -0.130292 [THz] =      -4.346094 [cm-1]
+ ( -0.002090  0.000000  0.706829  0.000000 -0.010283  0.000000 )
+     freq (    2) =       15.203424 [THz] =     507.130498 [cm-1]
+ (  0.696707  0.000000  0.000000  0.000000 -0.120538  0.000000 )
+     freq (    3) = ************ [THz] = ************ [cm-1]
+ (  0.696707  0.000000  0.000000  0.000000 -0.120538  0.000000 )
+ **************************************************************************
+"""
+
+
+def generate_contents():
+    """Return the contents of the dynamical matrix files of a 2x2x2 grid with two irreducible q-points."""
+    gamma = HEADER + MATRIX.format(0., 0., 0.) + DIELECTRIC + DIAGONALIZATION
+    star = HEADER + MATRIX.format(-0.5, 0.5, -0.5) + MATRIX.format(0.5, 0.5, 0.5) + DIAGONALIZATION
+    return {0: QPOINTS_FILE, 1: gamma, 2: star}
+
+
+def test_parse_qpoints_file():
+    """Test ``parse_qpoints_file``."""
+    mesh, qpoints = parse_qpoints_file(QPOINTS_FILE)
+
+    assert mesh == [2, 2, 2]
+    assert qpoints.tolist() == [[0., 0., 0.], [-0.5, 0.5, -0.5]]
+
+    with pytest.raises(ValueError):
+        parse_qpoints_file('Dynamical matrix file')
+
+
+def test_parse_dynamical_matrix_file():
+    """Test ``parse_dynamical_matrix_file``."""
+    parsed = parse_dynamical_matrix_file(generate_contents()[1])
+
+    assert parsed['species'] == ['Si']
+    assert parsed['atomic_species'].tolist() == [1, 1]
+    assert parsed['positions'][1].tolist() == [0.25, 0.25, 0.25]
+    assert parsed['dynamical_matrices'].shape == (1, 6, 6)
+
+    # The element of the row of the first atom in the y direction and the column of the second atom in the z direction
+    assert parsed['dynamical_matrices'][0, 1, 5] == pytest.approx(-0.26 + 0.06j)
+    assert parsed['dynamical_matrices'][0, 3, 0] == pytest.approx(-0.41 - 0.01j)
+    assert parsed['dielectric_tensor'][0, 0] == pytest.approx(13.744216406656)
+    assert parsed['born_charges'].shape == (2, 3, 3)
+    assert parsed['frequencies'][:2].tolist() == [-4.346094, 507.130498]
+    assert numpy.isnan(parsed['frequencies'][2])
+
+    with pytest.raises(ValueError):
+        parse_dynamical_matrix_file(QPOINTS_FILE)
+
+
+@pytest.mark.usefixtures('aiida_profile')
+def test_dynamical_matrix_data(tmp_path):
+    """Test that ``DynamicalMatrixData`` can be stored and writes files that are parsed into the same arrays."""
+    node = DynamicalMatrixData.from_files(generate_contents()).store()
+
+    assert node.mesh == [2, 2, 2]
+    assert node.number_of_qpoints == 2
+    assert node.number_of_atoms == 2
+    assert node.get_masses().tolist() == [25598.3697299011] * 2
+
+    qpoints, numbers = node.get_q_points()
+    assert qpoints.tolist() == [[0., 0., 0.], [-0.5, 0.5, -0.5], [0.5, 0.5, 0.5]]
+    assert numbers.tolist() == [1, 2, 2]
+    assert node.get_star(2)[1].shape == (2, 6, 6)
+    assert node.get_dielectric_tensor() is not None
+
+    filepaths = node.write_files(tmp_path)
+    contents = {number: open(filepath, encoding='utf-8').read() for number, filepath in enumerate(filepaths)}
+    written = DynamicalMatrixData.from_files(contents)
+
+    assert written.base.attributes.all == node.base.attributes.all
+
+    for name in node.get_arraynames():
+        numpy.testing.assert_allclose(written.get_array(name), node.get_array(name), atol=1e-6)
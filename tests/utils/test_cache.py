@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+"""Tests for the :mod:`aiida_quantumespresso_ph.utils.cache` module."""
+from aiida import orm
+from aiida.common import LinkType
+import pytest
+
+from aiida_quantumespresso_ph.utils.cache import (
+    FORCE_CONSTANTS_CACHE_EXTRA,
+    get_cached_force_constants,
+    get_force_constants_cache_key,
+)
+
+
+def generate_dynmat_folder(content=b'dynamical matrix'):
+    """Return a ``FolderData`` with the dynamical matrix files of a ``PhCalculation``."""
+    folder = orm.FolderData()
+    folder.base.repository.put_object_from_bytes(b'   1   1   1\n   1\n', 'DYN_MAT/dynamical-matrix-0')
+    folder.base.repository.put_object_from_bytes(content, 'DYN_MAT/dynamical-matrix-1')
+    return folder
+
+
+@pytest.mark.usefixtures('aiida_profile')
+def test_get_force_constants_cache_key(fixture_localhost):
+    """Test that the cache key only depends on the content of the files and on the parameters."""
+    parameters = {'INPUT': {'zasr': 'simple'}}
+    key = get_force_constants_cache_key(generate_dynmat_folder().store(), parameters)
+
+    assert key is not None
+    assert get_force_constants_cache_key(generate_dynmat_folder().store(), parameters) == key
+    assert get_force_constants_cache_key(generate_dynmat_folder().store(), {'INPUT': {'zasr': 'crystal'}}) != key
+    assert get_force_constants_cache_key(generate_dynmat_folder(b'other').store(), parameters) != key
+    assert get_force_constants_cache_key(generate_dynmat_folder(), parameters) is None
+    assert get_force_constants_cache_key(orm.FolderData().store()) is None
+
+    remote_folder = orm.RemoteData(computer=fixture_localhost, remote_path='/tmp').store()
+    assert get_force_constants_cache_key(remote_folder) is None
+
+    node = orm.CalcJobNode(computer=fixture_localhost).store()
+    retrieved = generate_dynmat_folder()
+    retrieved.base.links.add_incoming(node, link_type=LinkType.CREATE, link_label='retrieved')
+    retrieved.store()
+    remote_folder = orm.RemoteData(computer=fixture_localhost, remote_path='/tmp')
+    remote_folder.base.links.add_incoming(node, link_type=LinkType.CREATE, link_label='remote_folder')
+    remote_folder.store()
+
+    assert get_force_constants_cache_key(remote_folder, parameters) == key
+
+
+@pytest.mark.usefixtures('aiida_profile')
+def test_get_cached_force_constants(generate_force_constants):
+    """Test that the most recent force constants with the cache key are returned."""
+    assert get_cached_force_constants('missing') is None
+
+    nodes = []
+
+    for _ in range(2):
+        nodes.append(generate_force_constants().store())
+        nodes[-1].base.extras.set(FORCE_CONSTANTS_CACHE_EXTRA, 'key')
+
+    assert get_cached_force_constants('key').pk == nodes[-1].pk
@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+"""Tests for the :mod:`aiida_quantumespresso_ph.utils.cost` module."""
+import pytest
+
+from aiida_quantumespresso_ph.utils.cost import (
+    calibrate_seconds_per_cost,
+    estimate_job_resources,
+    estimate_qpoint_costs,
+    estimate_wall_times,
+    parse_patterns,
+    partition_qpoints,
+    split_irreps,
+)
+
+PATTERNS = """<?xml version="1.0"?>
+<Root>
+  <IRREPS_INFO>
+    <QPOINT_NUMBER>2</QPOINT_NUMBER>
+    <QPOINT_GROUP_RANK>12</QPOINT_GROUP_RANK>
+    <MINUS_Q_SYM>true</MINUS_Q_SYM>
+    <NUMBER_IRR_REP>3</NUMBER_IRR_REP>
+    <REPRESENTION.1><NUMBER_OF_PERTURBATIONS>1</NUMBER_OF_PERTURBATIONS></REPRESENTION.1>
+    <REPRESENTION.2><NUMBER_OF_PERTURBATIONS>2</NUMBER_OF_PERTURBATIONS></REPRESENTION.2>
+    <REPRESENTION.3><NUMBER_OF_PERTURBATIONS>3</NUMBER_OF_PERTURBATIONS></REPRESENTION.3>
+  </IRREPS_INFO>
+</Root>
+"""
+
+
+def test_parse_patterns():
+    """Test the ``parse_patterns`` function."""
+    assert parse_patterns(PATTERNS) == {
+        'number_of_irreps': 3,
+        'qpoint_group_rank': 12,
+        'number_of_perturbations': [1, 2, 3],
+    }
+
+    with pytest.raises(ValueError):
+        parse_patterns('<Root></Root>')
+
+
+def test_estimate_qpoint_costs():
+    """Test the ``estimate_qpoint_costs`` function."""
+    irreps = {
+        1: {
+            'number_of_irreps': 2,
+            'qpoint_group_rank': 48
+        },
+        2: {
+            'number_of_irreps': 4,
+            'qpoint_group_rank': 12
+        },
+    }
+    assert estimate_qpoint_costs(3, irreps) == [2, 32, 6]
+    assert estimate_qpoint_costs(2) == [1, 2]
+
+
+def test_partition_qpoints():
+    """Test the ``partition_qpoints`` function."""
+    assert partition_qpoints([1, 8, 4, 4, 2], 2) == [[2, 5], [1, 3, 4]]
+    assert partition_qpoints([1, 2], 3) == [[2], [1]]
+
+    with pytest.raises(ValueError):
+        partition_qpoints([1, 2], 0)
+
+
+def test_split_irreps():
+    """Test the ``split_irreps`` function."""
+    assert split_irreps(7, 3) == [[1, 3], [4, 6], [7, 7]]
+    assert split_irreps(2, 3) == [[1, 2]]
+
+    with pytest.raises(ValueError):
+        split_irreps(2, 0)
+
+
+def test_calibrate_seconds_per_cost():
+    """Test the ``calibrate_seconds_per_cost`` function."""
+    irreps = {1: {'qpoint_group_rank': 48}, 2: {'qpoint_group_rank': 8}}
+
+    # The stars have sizes 1, 6 and 1 for the q-point without irreducible representation info
+    assert calibrate_seconds_per_cost(80., 3, irreps, num_machines=2, init_time_factor=5.) == 80. * 2 * 5. / 8
+    assert calibrate_seconds_per_cost(80., 0) == 800.
+
+
+def test_estimate_job_resources():
+    """Test the ``estimate_job_resources`` function."""
+    assert estimate_job_resources(10, 100., 3600) == (1, 2000)
+    assert estimate_job_resources(10, 1., 3600) == (1, 600)
+    assert estimate_job_resources(100, 100., 3600, max_num_machines=4) == (4, 5000)
+    assert estimate_job_resources(100, 100., 3600, max_num_machines=10) == (6, 3334)
+    assert estimate_job_resources(1000, 100., 3600, max_wallclock_seconds=7200) == (1, 7200)
+
+
+def test_estimate_wall_times():
+    """Test the ``estimate_wall_times`` function."""
+    serial, parallel = estimate_wall_times(20, 100., queue_seconds=10., collection_seconds=5.)
+    assert serial == 10. + 20 * 100.
+    assert parallel == 10. + 20 * 100. / 10. + 10. + 2 * 100. + 5.
+
+    serial, parallel = estimate_wall_times(1, 100.)
+    assert serial < parallel
@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+"""Tests for the :mod:`aiida_quantumespresso_ph.utils.history` module."""
+import numpy
+import pytest
+
+from aiida_quantumespresso_ph.utils.history import (
+    MIN_NUMBER_OF_SAMPLES,
+    estimate_number_of_irreps,
+    fit_cost_model,
+    get_cost_model,
+    get_number_of_cores,
+    predict_qpoint_wall_time,
+    query_ph_history,
+)
+
+
+@pytest.fixture
+def generate_ph_history(generate_calc_job_node):
+    """Generate finished ``PhCalculation`` nodes with a parent ``PwCalculation``."""
+
+    def _generate_ph_history(number_of_calculations, number_of_k_points=10):
+        from aiida.common import LinkType
+        from aiida.orm import Dict
+
+        pw_calculation = generate_calc_job_node('quantumespresso.pw')
+        output_parameters = Dict({'number_of_k_points': number_of_k_points})
+        output_parameters.base.links.add_incoming(pw_calculation, LinkType.CREATE, 'output_parameters')
+        output_parameters.store()
+
+        for index in range(number_of_calculations):
+            inputs = {
+                'parent_folder': pw_calculation.outputs.remote_folder,
+                'metadata': {
+                    'options': {
+                        'resources': {
+                            'num_machines': index + 1,
+                            'num_mpiprocs_per_machine': 4
+                        }
+                    }
+                },
+            }
+            node = generate_calc_job_node('quantumespresso.ph', inputs=inputs)
+            node.set_exit_status(0)
+            output_parameters = Dict({
+                'wall_time_seconds': 200.,
+                'number_of_atoms': 2,
+                'number_of_irr_representations_for_each_q': [2, 6],
+            })
+            output_parameters.base.links.add_incoming(node, LinkType.CREATE, 'output_parameters')
+            output_parameters.store()
+
+    return _generate_ph_history
+
+
+def test_get_number_of_cores():
+    """Test the ``get_number_of_cores`` function."""
+    assert get_number_of_cores({'num_machines': 2, 'num_mpiprocs_per_machine': 8}) == 16
+    assert get_number_of_cores({'num_machines': 2}) == 2
+    assert get_number_of_cores({'tot_num_mpiprocs': 12, 'num_machines': 1}) == 12
+
+
+def test_fit_cost_model():
+    """Test that ``fit_cost_model`` recovers a power law and requires a minimum number of samples."""
+    rng = numpy.random.default_rng(0)
+    samples = []
+
+    for atoms, irreps, kpoints, cores in rng.integers(1, 100, size=(20, 4)):
+        wall_time_seconds = 3. * atoms**2 * irreps * kpoints / cores
+        samples.append({
+            'wall_time_seconds': wall_time_seconds,
+            'number_of_atoms': atoms,
+            'number_of_irreps': irreps,
+            'number_of_k_points': kpoints,
+            'number_of_cores': cores,
+        })
+
+    model = fit_cost_model(samples)
+
+    assert model['number_of_samples'] == 20
+    assert numpy.allclose(model['coefficients'], [numpy.log(3.), 2, 1, 1, -1])
+    irreps_per_mode = [sample['number_of_irreps'] / (3 * sample['number_of_atoms']) for sample in samples]
+    assert numpy.isclose(estimate_number_of_irreps(model, 1), 3 * numpy.exp(numpy.mean(numpy.log(irreps_per_mode))))
+    assert estimate_number_of_irreps({'coefficients': []}, 2) == 6
+    assert numpy.isclose(predict_qpoint_wall_time(model, 2, 3, 4, 6), 3. * 4 * 3 * 4 / 6)
+    assert fit_cost_model(samples[:MIN_NUMBER_OF_SAMPLES - 1]) is None
+
+
+@pytest.mark.usefixtures('aiida_profile')
+def test_query_ph_history(generate_ph_history):
+    """Test the ``query_ph_history`` function."""
+    generate_ph_history(2, number_of_k_points=11)
+    samples = [sample for sample in query_ph_history() if sample['number_of_k_points'] == 11]
+
+    assert sorted(samples, key=lambda sample: sample['number_of_cores']) == [{
+        'wall_time_seconds': 100.,
+        'number_of_atoms': 2,
+        'number_of_irreps': 4.,
+        'number_of_k_points': 11,
+        'number_of_cores': cores,
+    } for cores in (4, 8)]
+
+
+@pytest.mark.usefixtures('aiida_profile')
+def test_get_cost_model(generate_ph_history, tmp_path):
+    """Test that ``get_cost_model`` caches the fitted model on disk."""
+    filepath = tmp_path / 'model.json'
+    generate_ph_history(MIN_NUMBER_OF_SAMPLES)
+    number_of_samples = len(query_ph_history())
+
+    assert get_cost_model(filepath)['number_of_samples'] == number_of_samples
+    assert filepath.exists()
+
+    generate_ph_history(1)
+
+    assert get_cost_model(filepath)['number_of_samples'] == number_of_samples
+    assert get_cost_model(filepath, refresh=True)['number_of_samples'] == number_of_samples + 1
+    assert get_cost_model(filepath, max_age=0)['number_of_samples'] == number_of_samples + 1
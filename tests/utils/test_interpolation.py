@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+"""Tests for the :mod:`aiida_quantumespresso_ph.utils.interpolation` module."""
+import itertools
+
+import numpy
+import pytest
+
+from aiida_quantumespresso_ph.utils.interpolation import (
+    RY_TO_CMM1,
+    get_density_of_states,
+    get_force_constants,
+    get_frequencies,
+    get_path_directions,
+    get_smearing,
+)
+
+MASS = 25598.3697299011
+SPRING = 0.1
+
+
+def simple_cubic(qpoint):
+    """Return the dynamical matrix of a simple cubic crystal with springs between nearest neighbours."""
+    return numpy.diag(SPRING * (2 - 2 * numpy.cos(2 * numpy.pi * qpoint))).astype(complex)
+
+
+def dimer(qpoint):
+    """Return the dynamical matrix of two atoms per cell coupled by springs within and between the cells."""
+    inter = -SPRING * numpy.diag(1 + 0.5 * numpy.exp(-2j * numpy.pi * qpoint))
+    intra = 1.5 * SPRING * numpy.eye(3) + numpy.diag(0.02 * numpy.cos(2 * numpy.pi * qpoint))
+    return numpy.block([[intra, inter], [inter.conj().T, intra]])
+
+
+def get_reference_frequencies(function, qpoints):
+    """Return the frequencies in cm^-1 of the dynamical matrices of ``function`` with the mass of all atoms."""
+    eigenvalues = numpy.array([numpy.linalg.eigvalsh(function(qpoint)) for qpoint in qpoints]) / MASS
+    return numpy.sign(eigenvalues) * numpy.sqrt(numpy.abs(eigenvalues)) * RY_TO_CMM1
+
+
+def test_interpolation_simple_cubic(generate_dynamical_matrix_data):
+    """Test that force constants within the supercell of the mesh are interpolated exactly at any q-point."""
+    force_constants = get_force_constants(generate_dynamical_matrix_data([4, 4, 4], [[0, 0, 0]], simple_cubic))
+    qpoints = numpy.random.default_rng(0).random((20, 3))
+
+    frequencies = get_frequencies(force_constants, qpoints, chunk_size=7)
+    numpy.testing.assert_allclose(frequencies, get_reference_frequencies(simple_cubic, qpoints), atol=1e-6)
+    numpy.testing.assert_allclose(get_frequencies(force_constants, [[0, 0, 0]]), 0, atol=1e-6)
+
+    node = generate_dynamical_matrix_data([2, 2, 2], [[0, 0, 0]], simple_cubic)
+    node.base.attributes.set('number_of_qpoints', 7)
+
+    with pytest.raises(ValueError, match='do not cover'):
+        get_force_constants(node)
+
+
+def test_acoustic_sum_rule(generate_dynamical_matrix_data):
+    """Test that the ``simple`` acoustic sum rule sets the acoustic frequencies at the Gamma point to zero."""
+    positions = [[0, 0, 0], [.5, .5, .5]]
+    node = generate_dynamical_matrix_data([2, 2, 2], positions, lambda qpoint: dimer(qpoint) + 1e-3 * numpy.eye(6))
+
+    assert get_frequencies(get_force_constants(node, asr='no'), [[0, 0, 0]])[0, 0] > 1
+    numpy.testing.assert_allclose(get_frequencies(get_force_constants(node), [[0, 0, 0]])[0, :3], 0, atol=1e-4)
+
+    with pytest.raises(ValueError, match='acoustic sum rule'):
+        get_force_constants(node, asr='crystal')
+
+
+def test_non_analytic_correction(generate_dynamical_matrix_data):
+    """Test that the dipole part is interpolated exactly at the mesh and splits the optical modes at Gamma."""
+    charges = [numpy.eye(3), -numpy.eye(3)]
+    node = generate_dynamical_matrix_data([2, 2, 2], [[0, 0, 0], [.5, .5, .5]], dimer, 4 * numpy.eye(3), charges)
+    force_constants = get_force_constants(node, asr='no')
+    qpoints = numpy.array(list(itertools.product([0, .5], repeat=3)))
+
+    numpy.testing.assert_allclose(
+        get_frequencies(force_constants, qpoints), get_reference_frequencies(dimer, qpoints), atol=1e-6
+    )
+
+    path = numpy.array([[0, 0, 0], [.1, 0, 0]])
+    directions = get_path_directions(path)
+    split = get_frequencies(force_constants, path, directions)[0]
+    frequencies = get_frequencies(force_constants, path)[0]
+
+    assert directions[0].tolist() == [.1, 0, 0]
+    assert split[-1] > frequencies[-1]
+    numpy.testing.assert_allclose(split[:-1], frequencies[:-1], atol=1e-6)
+
+
+def test_get_density_of_states():
+    """Test that the density of states is normalized to the number of modes."""
+    frequencies = numpy.random.default_rng(0).random((100, 6)) * 500
+    grid, density = get_density_of_states(frequencies, step=0.5, smearing=5.0)
+
+    assert grid[1] - grid[0] == pytest.approx(0.5)
+    assert density.sum() * 0.5 == pytest.approx(6, rel=0.05)
+
+
+def test_get_smearing():
+    """Test that the smearing of the density of states requires a ``degauss`` larger than zero."""
+    assert get_smearing({'INPUT': {'deltaE': 0.5, 'degauss': 3.0}}) == (0.5, 3.0)
+
+    with pytest.raises(ValueError, match='tetrahedron method is not implemented'):
+        get_smearing({'INPUT': {'deltaE': 0.5}})
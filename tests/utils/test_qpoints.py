@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+"""Tests for the :mod:`aiida_quantumespresso_ph.utils.qpoints` module."""
+from aiida_quantumespresso.parsers.parse_raw.pw import get_symmetry_mapping
+import numpy
+import pytest
+
+from aiida_quantumespresso_ph.utils.qpoints import (
+    get_irreducible_qpoints,
+    get_symmetry_rotations,
+    irreducible_bz,
+    kpoint_grid,
+)
+
+ALAT = 5.43
+CELL = ALAT / 2 * numpy.array([[-1, 0, 1], [0, 1, 1], [-1, 1, 0]])
+
+
+@pytest.fixture
+def cubic_symmetries():
+    """Return the indices of the cubic symmetries in the list returned by ``get_symmetry_mapping``."""
+    return list(range(24)) + list(range(32, 56))
+
+
+def test_get_irreducible_qpoints(cubic_symmetries):
+    """Test ``get_irreducible_qpoints`` against the q-points computed by ``ph.x`` for silicon on a 4x4x4 grid."""
+    parameters = {'symmetries': [{'symmetry_number': index, 't_rev': '0'} for index in cubic_symmetries]}
+    reference = [
+        [0.00, 0.00, 0.00],
+        [-0.25, 0.25, -0.25],
+        [0.50, -0.50, 0.50],
+        [0.00, 0.50, 0.00],
+        [0.75, -0.25, 0.75],
+        [0.50, 0.00, 0.50],
+        [0.00, -1.00, 0.00],
+        [-0.50, -1.00, 0.00],
+    ]
+    qpoints = get_irreducible_qpoints(parameters, CELL, [4, 4, 4])
+
+    assert numpy.allclose(qpoints / (2 * numpy.pi / ALAT), reference)
+
+
+@pytest.mark.parametrize('mesh', ([4, 4, 4], [3, 3, 3], [2, 4, 6]))
+def test_irreducible_bz(cubic_symmetries, mesh):
+    """Test that ``irreducible_bz`` returns a set of q-points of which the stars cover the grid exactly once."""
+    mapping = get_symmetry_mapping()
+    tetragonal = [index for index in cubic_symmetries if abs(mapping[index]['matrix'][2][2]) == 1]
+    lattice = [index for index in cubic_symmetries if index not in tetragonal]
+    parameters = {
+        'symmetries': [dict(symmetry_number=index) for index in tetragonal],
+        'lattice_symmetries': [dict(symmetry_number=index) for index in lattice],
+    }
+    rotations, nsym = get_symmetry_rotations(parameters, CELL)
+    qpoints = irreducible_bz(rotations, nsym, kpoint_grid(rotations, mesh), time_reversal=True)
+    grid = numpy.array([[i, j, k] for i in range(mesh[0]) for j in range(mesh[1]) for k in range(mesh[2])]) / mesh
+
+    for point in grid:
+        images = [sign * rotation @ qpoint for qpoint in qpoints for rotation in rotations[:nsym] for sign in (1, -1)]
+        equivalent = [numpy.allclose(image - point, numpy.rint(image - point)) for image in images]
+        assert sum(numpy.array(equivalent).reshape(len(qpoints), -1).any(axis=1)) == 1
+
+
+def test_get_symmetry_rotations():
+    """Test the exceptions raised by ``get_symmetry_rotations``."""
+    with pytest.raises(ValueError, match='do not contain the symmetries'):
+        get_symmetry_rotations({}, CELL)
+
+    with pytest.raises(ValueError, match='time reversal'):
+        get_symmetry_rotations({'symmetries': [{'symmetry_number': 0, 't_rev': '1'}]}, CELL)
@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+"""Tests for the :mod:`aiida_quantumespresso_ph.utils.query` module."""
+from aiida import orm
+from aiida.common import LinkType
+from plumpy import ProcessState
+import pytest
+
+from aiida_quantumespresso_ph.utils import query
+
+
+@pytest.mark.usefixtures('aiida_profile')
+def test_get_process_states(monkeypatch):
+    """Test that the states of process nodes are queried in chunks, also for those that did not finish."""
+    finished = orm.WorkflowNode().store()
+    finished.set_process_state(ProcessState.FINISHED)
+    finished.set_exit_status(0)
+    failed = orm.WorkflowNode().store()
+    failed.set_process_state(ProcessState.FINISHED)
+    failed.set_exit_status(300)
+    running = orm.WorkflowNode().store()
+    running.set_process_state(ProcessState.WAITING)
+    created = orm.WorkflowNode().store()
+
+    monkeypatch.setattr(query, 'QUERY_CHUNK_SIZE', 2)
+    states = query.get_process_states([node.pk for node in (finished, failed, running, created)])
+
+    assert states == {
+        finished.pk: (ProcessState.FINISHED, 0),
+        failed.pk: (ProcessState.FINISHED, 300),
+        running.pk: (ProcessState.WAITING, None),
+        created.pk: (None, None),
+    }
+    assert [query.is_finished_ok(state) for state in states.values()] == [True, False, False, False]
+
+
+@pytest.mark.usefixtures('aiida_profile')
+def test_get_outputs():
+    """Test that only the outputs with the given link labels are returned, for each process node."""
+    nodes = [orm.WorkflowNode().store() for _ in range(2)]
+    outputs = {'retrieved': orm.FolderData(), 'output_parameters': orm.Dict(), 'remote_folder': orm.Dict()}
+
+    for link_label, output in outputs.items():
+        output.store().base.links.add_incoming(nodes[0], link_type=LinkType.RETURN, link_label=link_label)
+
+    results = query.get_outputs([node.pk for node in nodes], ['retrieved', 'output_parameters'])
+
+    assert results[nodes[1].pk] == {}
+    assert {key: value.uuid for key, value in results[nodes[0].pk].items()} == {
+        'retrieved': outputs['retrieved'].uuid,
+        'output_parameters': outputs['output_parameters'].uuid,
+    }
@@ -92,3 +92,58 @@ def test_inspect_workchain(generate_workchain_main, generate_ph_workchain_node):
 
     process.ctx.workchain = generate_ph_workchain_node(exit_status=0)
     assert process.inspect_workchain() is None
+
+
+@pytest.mark.usefixtures('aiida_profile')
+def test_select_parallelization(generate_workchain, generate_inputs_ph):
+    """Test `PhWorkChain.select_parallelization`."""
+    from aiida.common import LinkType
+    from aiida.orm import Dict, Str
+    import numpy
+
+    inputs = generate_inputs_ph()
+    qpoints = inputs.pop('qpoints')
+    process = generate_workchain(
+        'quantumespresso_ph.ph.main', {
+            'ph': inputs,
+            'qpoints': qpoints,
+            'parallelize_qpoints': Str('auto')
+        }
+    )
+    assert process.should_select_parallelization()
+
+    # Without output parameters of the parent calculation, the serial mode is selected
+    process.select_parallelization()
+    assert not process.should_run_parallel()
+
+    output_parameters = Dict({'wall_time_seconds': 1000., 'number_of_k_points': 10})
+    output_parameters.base.links.add_incoming(inputs['parent_folder'].creator, LinkType.CREATE, 'output_parameters')
+    output_parameters.store()
+
+    process.select_parallelization()
+    assert process.should_run_parallel()
+    assert process.outputs['parallelization']['mode'] == 'parallel'
+    assert process.outputs['parallelization']['source'] == 'parent_calculation'
+
+    # The cost model is only used if it is passed as an input, such that the selection follows from the provenance
+    cost_model = Dict({'coefficients': [numpy.log(50.), 0, 0, 0, 0]})
+    process = generate_workchain(
+        'quantumespresso_ph.ph.main', {
+            'ph': inputs,
+            'qpoints': qpoints,
+            'parallelize_qpoints': Str('auto'),
+            'cost_model': cost_model,
+        }
+    )
+    process.select_parallelization()
+    assert process.outputs['parallelization']['source'] == 'cost_model'
+    assert process.outputs['parallelization'].creator.inputs.cost_model.uuid == cost_model.uuid
+
+
+def test_validate_parallelize_qpoints():
+    """Test `PhWorkChain.validate_parallelize_qpoints`."""
+    from aiida.orm import Bool, Str
+
+    assert PhWorkChain.validate_parallelize_qpoints(Bool(True), None) is None
+    assert PhWorkChain.validate_parallelize_qpoints(Str('auto'), None) is None
+    assert 'should be a' in PhWorkChain.validate_parallelize_qpoints(Str('yes'), None)
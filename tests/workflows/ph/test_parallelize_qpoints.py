@@ -1,22 +1,45 @@
 # -*- coding: utf-8 -*-
 # pylint: disable=no-member,redefined-outer-name
 """Tests for the `PhParallelizeQpointsWorkChain` class."""
+from aiida.common import AttributeDict
+from aiida.orm import load_node
+import numpy
 from plumpy import ProcessState
 import pytest
 
 from aiida_quantumespresso_ph.workflows.ph.parallelize_qpoints import PhParallelizeQpointsWorkChain
 
+PATTERNS = """<Root>
+  <IRREPS_INFO>
+    <QPOINT_GROUP_RANK>48</QPOINT_GROUP_RANK>
+    <NUMBER_IRR_REP>{number_of_irreps}</NUMBER_IRR_REP>
+  </IRREPS_INFO>
+</Root>
+"""
+
+
+def load_context_node(value):
+    """Return the node of a child work chain in the context, which is kept by its PK or is an awaitable."""
+    return load_node(value if isinstance(value, int) else value.pk)
+
+
+def get_awaited(process):
+    """Return the labels of the q-points or batches whose work chain the process waits for."""
+    from aiida.engine import Awaitable
+
+    return [key for key, value in process.ctx.workchains.items() if isinstance(value, Awaitable)]
+
 
 @pytest.fixture
 def generate_workchain_qpoints(generate_workchain, generate_inputs_ph):
     """Generate an instance of a `PhParallelizeQpointsWorkChain`."""
 
-    def _generate_workchain_qpoints(inputs=None):
+    def _generate_workchain_qpoints(inputs=None, **kwargs):
         entry_point = 'quantumespresso_ph.ph.parallelize_qpoints'
 
         inputs = generate_inputs_ph(inputs=inputs)
         qpoints = inputs.pop('qpoints')
-        process = generate_workchain(entry_point, {'ph': inputs, 'qpoints': qpoints})
+        process = generate_workchain(entry_point, {'ph': inputs, 'qpoints': qpoints, **kwargs})
 
         return process
 
@@ -27,11 +50,27 @@ def generate_workchain_qpoints(generate_workchain, generate_inputs_ph):
 def generate_ph_workchain_node(generate_calc_job_node):
     """Generate an instance of `WorkflowNode`."""
 
-    def _generate_ph_workchain_node(exit_status=0, use_retrieved=False):
+    def _generate_ph_workchain_node(
+        exit_status=0,
+        use_retrieved=False,
+        remote_path=None,
+        inputs=None,
+        caller=None,
+        call_link_label='CALL',
+        outputs=None,
+    ):
         from aiida.common import LinkType
-        from aiida.orm import WorkflowNode
+        from aiida.orm import RemoteData, WorkflowNode
+
+        node = WorkflowNode()
+
+        for link_label, input_node in (inputs or {}).items():
+            node.base.links.add_incoming(input_node.store(), link_type=LinkType.INPUT_WORK, link_label=link_label)
 
-        node = WorkflowNode().store()
+        if caller is not None:
+            node.base.links.add_incoming(caller, link_type=LinkType.CALL_WORK, link_label=call_link_label)
+
+        node.store()
         node.set_process_state(ProcessState.FINISHED)
         node.set_exit_status(exit_status)
 
@@ -41,6 +80,15 @@ def generate_ph_workchain_node(generate_calc_job_node):
             ).outputs.retrieved  # otherwise the PhCalculation will complain
             retrieved.base.links.add_incoming(node, link_type=LinkType.RETURN, link_label='retrieved')
 
+        if remote_path is not None:
+            remote_folder = RemoteData(computer=generate_calc_job_node('quantumespresso.ph').computer)
+            remote_folder.set_remote_path(remote_path)
+            remote_folder.store()
+            remote_folder.base.links.add_incoming(node, link_type=LinkType.RETURN, link_label='remote_folder')
+
+        for link_label, output_node in (outputs or {}).items():
+            output_node.store().base.links.add_incoming(node, link_type=LinkType.RETURN, link_label=link_label)
+
         return node
 
     return _generate_ph_workchain_node
@@ -69,7 +117,867 @@ def test_inspect_init(generate_workchain_qpoints, generate_ph_workchain_node):
 def test_inspect_qpoints(generate_workchain_qpoints, generate_ph_workchain_node):
     """Test `PhParallelizeQpointsWorkChain.inspect_qpoints`."""
     process = generate_workchain_qpoints()
-    process.ctx.workchains = [generate_ph_workchain_node(exit_status=300)]
+    process.ctx.workchains = {'qpoint_0': generate_ph_workchain_node(exit_status=300)}
+
+    result = process.inspect_qpoints()
+    assert result == PhParallelizeQpointsWorkChain.exit_codes.ERROR_QPOINT_WORKCHAIN_FAILED
+
+
+@pytest.mark.usefixtures('aiida_profile')
+def test_inspect_qpoints_irreps(generate_workchain_qpoints, generate_ph_workchain_node):
+    """Test `PhParallelizeQpointsWorkChain.inspect_qpoints` for q-points split over irreducible representations."""
+    process = generate_workchain_qpoints()
+    process.ctx.workchains = {'qpoint_0': generate_ph_workchain_node()}
+    process.ctx.irreps_workchains = {
+        'qpoint_1': {
+            'qpoint_1_irreps_1_3': generate_ph_workchain_node(),
+            'qpoint_1_irreps_4_5': generate_ph_workchain_node(300),
+        }
+    }
+
+    result = process.inspect_qpoints()
+    assert result == PhParallelizeQpointsWorkChain.exit_codes.ERROR_QPOINT_WORKCHAIN_FAILED
+
+
+@pytest.mark.usefixtures('aiida_profile')
+def test_inspect_qpoints_retry(generate_workchain_qpoints, generate_ph_workchain_node):
+    """Test that `PhParallelizeQpointsWorkChain.inspect_qpoints` relaunches failed jobs within the retry budget."""
+    from aiida.orm import Int
+
+    process = generate_workchain_qpoints(max_qpoint_retries=Int(1))
+    finished = generate_ph_workchain_node()
+    process.ctx.workchains = AttributeDict({
+        'qpoint_0': finished,
+        'qpoint_1': generate_ph_workchain_node(exit_status=300),
+    })
+    process.ctx.jobs = []
+    process.ctx.in_flight = ['workchains.qpoint_1']
+    process.ctx.submitted = {'workchains.qpoint_1': {'key': 'qpoint_1', 'cost': 2.}}
+
+    assert process.inspect_qpoints() is None
+    assert process.ctx.jobs == [{'key': 'qpoint_1', 'cost': 2., 'attempt': 1}]
+    assert process.ctx.workchains == {'qpoint_0': finished.pk}
+    assert not process.ctx.in_flight
+
+    process.ctx.workchains['qpoint_1'] = generate_ph_workchain_node(exit_status=300)
+    process.ctx.submitted['workchains.qpoint_1'] = process.ctx.jobs.pop()
+
+    result = process.inspect_qpoints()
+    assert result == PhParallelizeQpointsWorkChain.exit_codes.ERROR_QPOINT_WORKCHAIN_FAILED
+
+
+@pytest.mark.usefixtures('aiida_profile')
+def test_inspect_qpoints_walltime(
+    generate_workchain_qpoints, generate_ph_workchain_node, generate_calc_job_node, generate_kpoints_mesh
+):
+    """Test that `PhParallelizeQpointsWorkChain.inspect_qpoints` recovers jobs that ran out of wall time."""
+    from aiida.common import LinkType
+    from aiida.orm import CalcJobNode, Dict, Int, RemoteData
+
+    def generate_interrupted_workchain_node(exit_status=400):
+        """Return a failed work chain node of which the calculation ran out of wall time after 100 seconds."""
+        node = generate_ph_workchain_node(exit_status=401)
+        computer = generate_calc_job_node('quantumespresso.ph').computer
+        calculation = CalcJobNode(computer=computer, process_type='aiida.calculations:quantumespresso.ph')
+        calculation.base.links.add_incoming(node, link_type=LinkType.CALL_CALC, link_label='iteration_01')
+        calculation.store()
+        calculation.set_exit_status(exit_status)
+
+        remote_folder = RemoteData(computer=computer, remote_path='/tmp/interrupted')
+        output_parameters = Dict({'wall_time_seconds': 100.})
+        for link_label, output in (('remote_folder', remote_folder), ('output_parameters', output_parameters)):
+            output.base.links.add_incoming(calculation, link_type=LinkType.CREATE, link_label=link_label)
+            output.store()
+
+        return node, remote_folder
+
+    process = generate_workchain_qpoints(max_qpoint_retries=Int(0), max_walltime_recoveries=Int(1))
+    process.ctx.interrupted_wall_times = {}
+    process.ctx.in_flight = []
+    node, remote_folder = generate_interrupted_workchain_node()
+    process.ctx.workchains = AttributeDict({'qpoint_1': node})
+    process.ctx.jobs = []
+    process.ctx.submitted = {'workchains.qpoint_1': {'key': 'qpoint_1', 'cost': 2.}}
+
+    assert process.inspect_qpoints() is None
+    assert process.ctx.jobs == [{'key': 'qpoint_1', 'cost': 2., 'recoveries': 1, 'recover_folder': remote_folder.uuid}]
+    assert process.ctx.interrupted_wall_times == {'qpoint_1': 100.}
+    assert not process.ctx.workchains
+
+    # The recovery is a single calculation, since the child already restarted the interrupted ones itself
+    process.ctx.qpoints = {'qpoint_1': generate_kpoints_mesh(1)}
+    process.run_ph_qgrid()
+    recovery = load_context_node(process.ctx.workchains['qpoint_1'])
+    assert recovery.inputs.max_iterations.value == 1
+    assert recovery.inputs.ph.parameters['INPUTPH']['recover']
+    assert recovery.inputs.ph.parent_folder.uuid == remote_folder.uuid
+
+    process.ctx.workchains['qpoint_1'], _ = generate_interrupted_workchain_node()
+
+    result = process.inspect_qpoints()
+    assert result == PhParallelizeQpointsWorkChain.exit_codes.ERROR_QPOINT_WORKCHAIN_FAILED
+
+    # A calculation killed by the scheduler is not recovered from, since its scratch folder is not reliable
+    process = generate_workchain_qpoints(max_qpoint_retries=Int(0), max_walltime_recoveries=Int(1))
+    process.ctx.interrupted_wall_times = {}
+    process.ctx.in_flight = []
+    process.ctx.workchains = AttributeDict({'qpoint_1': generate_interrupted_workchain_node(exit_status=120)[0]})
+    process.ctx.jobs = []
+    process.ctx.submitted = {'workchains.qpoint_1': {'key': 'qpoint_1', 'cost': 2.}}
 
     result = process.inspect_qpoints()
     assert result == PhParallelizeQpointsWorkChain.exit_codes.ERROR_QPOINT_WORKCHAIN_FAILED
+
+
+@pytest.mark.usefixtures('aiida_profile')
+def test_collect_irreps(generate_workchain_qpoints, generate_ph_workchain_node, generate_kpoints_mesh):
+    """Test the collection of the q-points that are split over their irreducible representations."""
+    from aiida.orm import Dict
+
+    process = generate_workchain_qpoints()
+    partial_workchains = {}
+
+    for start_irr, last_irr in [[4, 5], [1, 3]]:
+        parameters = Dict({'INPUTPH': {'start_irr': start_irr, 'last_irr': last_irr}})
+        node = generate_ph_workchain_node(remote_path=f'/tmp/irreps_{start_irr}', inputs={'ph__parameters': parameters})
+        partial_workchains[f'qpoint_1_irreps_{start_irr}_{last_irr}'] = node
+
+    process.ctx.irreps_ranges = {'qpoint_1': [[1, 3], [4, 5]]}
+    process.ctx.irreps_workchains = {'qpoint_1': partial_workchains}
+    process.ctx.qpoints = {'qpoint_1': generate_kpoints_mesh(1)}
+    process.ctx.workchains = AttributeDict()
+    process.ctx.jobs = []
+    process.ctx.in_flight = []
+    process.ctx.submitted = {}
+
+    assert process.should_collect_irreps()
+    process.setup_collect_irreps()
+    assert process.ctx.jobs == [{'key': 'qpoint_1', 'collect': True}]
+
+    process.run_ph_qgrid()
+    assert process.ctx.in_flight == ['workchains.qpoint_1']
+
+    node = load_context_node(process.ctx.workchains['qpoint_1'])
+    parent_folder = partial_workchains['qpoint_1_irreps_1_3'].outputs.remote_folder
+    assert node.inputs.ph.parent_folder.uuid == parent_folder.uuid
+
+
+@pytest.mark.usefixtures('aiida_profile')
+def test_setup_ph_qgrid(generate_workchain_qpoints, generate_kpoints_mesh):
+    """Test that `PhParallelizeQpointsWorkChain.setup_ph_qgrid` sorts the jobs by cost and assigns scheduler tiers."""
+    from aiida.orm import FolderData, List
+
+    tiers = [{'queue_name': 'long', 'priority': '10'}, {'queue_name': 'short'}]
+    process = generate_workchain_qpoints(scheduler_tiers=List(tiers))
+    process.ctx.qpoints = {f'qpoint_{index}': generate_kpoints_mesh(1) for index in range(3)}
+    process.ctx.irreps_ranges = {}
+    process.ctx.initialization_folder = FolderData()
+
+    for index, number_of_irreps in enumerate([2, 6, 3], start=1):
+        process.ctx.initialization_folder.base.repository.put_object_from_bytes(
+            PATTERNS.format(number_of_irreps=number_of_irreps).encode(), f'patterns.{index}.xml'
+        )
+
+    process.setup_ph_qgrid()
+
+    assert [job['key'] for job in process.ctx.jobs] == ['qpoint_1', 'qpoint_2', 'qpoint_0']
+    assert [job['options'] for job in process.ctx.jobs] == [tiers[0], tiers[0], tiers[1]]
+
+
+@pytest.mark.usefixtures('aiida_profile')
+def test_setup_ph_qgrid_resources(generate_workchain_qpoints, generate_ph_workchain_node, generate_kpoints_mesh):
+    """Test that `PhParallelizeQpointsWorkChain.setup_ph_qgrid` sets the resources of the jobs from their cost."""
+    from aiida.common import LinkType
+    from aiida.orm import Dict, FolderData
+
+    model = {'target_wallclock_seconds': 3600, 'max_num_machines': 4, 'safety_factor': 1}
+    process = generate_workchain_qpoints(resources_model=Dict(model))
+    process.ctx.qpoints = {f'qpoint_{index}': generate_kpoints_mesh(1) for index in range(2)}
+    process.ctx.irreps_ranges = {}
+    process.ctx.initialization_folder = FolderData()
+    process.ctx.ph_init = generate_ph_workchain_node()
+
+    output_parameters = Dict({'wall_time_seconds': 200., 'number_of_qpoints': 2}).store()
+    output_parameters.base.links.add_incoming(process.ctx.ph_init, LinkType.RETURN, 'output_parameters')
+
+    for index, (rank, number_of_irreps) in enumerate([(48, 2), (8, 3)], start=1):
+        patterns = PATTERNS.format(number_of_irreps=number_of_irreps).replace('48', str(rank))
+        process.ctx.initialization_folder.base.repository.put_object_from_bytes(
+            patterns.encode(), f'patterns.{index}.xml'
+        )
+
+    process.setup_ph_qgrid()
+
+    # The stars have sizes 1 and 6, so a unit of cost takes 200 * 10 / 7 seconds, with costs of 36 and 2 units
+    options = {job['key']: job['options'] for job in process.ctx.jobs}
+    assert options['qpoint_1']['resources']['num_machines'] == 3
+    assert options['qpoint_1']['max_wallclock_seconds'] == 3429
+    assert options['qpoint_0']['resources']['num_machines'] == 1
+    assert options['qpoint_0']['max_wallclock_seconds'] == 600
+
+
+@pytest.mark.usefixtures('aiida_profile')
+def test_setup_ph_qgrid_tot_num_mpiprocs(
+    generate_workchain, generate_inputs_ph, generate_ph_workchain_node, generate_kpoints_mesh
+):
+    """Test that the `tot_num_mpiprocs` of the resources is kept consistent with the number of machines of a job."""
+    from aiida.common import LinkType
+    from aiida.orm import Dict, FolderData
+
+    inputs = generate_inputs_ph()
+    inputs['metadata']['options']['resources'] = {'num_machines': 2, 'tot_num_mpiprocs': 8}
+    qpoints = inputs.pop('qpoints')
+    model = {'target_wallclock_seconds': 3600, 'max_num_machines': 4, 'safety_factor': 1}
+    process = generate_workchain(
+        'quantumespresso_ph.ph.parallelize_qpoints', {
+            'ph': inputs,
+            'qpoints': qpoints,
+            'resources_model': Dict(model)
+        }
+    )
+    process.ctx.qpoints = {'qpoint_0': generate_kpoints_mesh(1)}
+    process.ctx.irreps_ranges = {}
+    process.ctx.initialization_folder = FolderData()
+    process.ctx.ph_init = generate_ph_workchain_node()
+
+    output_parameters = Dict({'wall_time_seconds': 20000., 'number_of_qpoints': 1}).store()
+    output_parameters.base.links.add_incoming(process.ctx.ph_init, LinkType.RETURN, 'output_parameters')
+
+    process.setup_ph_qgrid()
+
+    # The job needs more than the target wall time on the two machines of the initialization run
+    job_resources = process.ctx.jobs[0]['options']['resources']
+    assert job_resources['num_machines'] == 4
+    assert job_resources['tot_num_mpiprocs'] == 16
+
+
+@pytest.mark.usefixtures('aiida_profile')
+def test_run_ph_qgrid(generate_workchain_qpoints, generate_kpoints_mesh):
+    """Test that `PhParallelizeQpointsWorkChain.run_ph_qgrid` respects the `max_concurrent_qpoints` input."""
+    from aiida.orm import FolderData, Int
+
+    process = generate_workchain_qpoints(max_concurrent_qpoints=Int(2))
+    process.ctx.qpoints = {f'qpoint_{index}': generate_kpoints_mesh(1) for index in range(3)}
+    process.ctx.irreps_ranges = {}
+    process.ctx.initialization_folder = FolderData()
+    process.setup_ph_qgrid()
+
+    assert process.should_run_ph_qgrid()
+    process.run_ph_qgrid()
+
+    assert process.ctx.in_flight == ['workchains.qpoint_1', 'workchains.qpoint_2']
+    assert [job['key'] for job in process.ctx.jobs] == ['qpoint_0']
+
+
+@pytest.mark.usefixtures('aiida_profile')
+def test_run_ph_qgrid_refill(generate_workchain_qpoints, generate_ph_workchain_node, generate_kpoints_mesh):
+    """Test that the slot of a cheap work chain that finishes before the oldest one is refilled right away."""
+    from aiida.orm import FolderData, Int
+
+    process = generate_workchain_qpoints(max_concurrent_qpoints=Int(2))
+    process.ctx.qpoints = {f'qpoint_{index}': generate_kpoints_mesh(1) for index in range(3)}
+    process.ctx.irreps_ranges = {}
+    process.ctx.initialization_folder = FolderData()
+    process.setup_ph_qgrid()
+    process.ctx.jobs = [{'key': f'qpoint_{index}', 'cost': cost} for index, cost in enumerate([10., 1., 1.])]
+    process.run_ph_qgrid()
+
+    assert process.ctx.in_flight == ['workchains.qpoint_0', 'workchains.qpoint_1']
+    assert get_awaited(process) == ['qpoint_0', 'qpoint_1']
+
+    # The engine puts the node of the awaited work chain in the context once it has terminated
+    oldest = load_context_node(process.ctx.workchains['qpoint_0'])
+    process.ctx.workchains['qpoint_1'] = generate_ph_workchain_node()
+
+    assert process.inspect_qpoints() is None
+    assert process.should_run_ph_qgrid()
+    process.run_ph_qgrid()
+
+    assert process.ctx.in_flight == ['workchains.qpoint_0', 'workchains.qpoint_2']
+    assert not oldest.is_terminated
+    assert get_awaited(process) == ['qpoint_0', 'qpoint_2']
+
+
+@pytest.mark.usefixtures('aiida_profile')
+def test_run_ph_qgrid_wait_for_any(generate_workchain_qpoints, generate_kpoints_mesh):
+    """Test that the work chain stops waiting for the other running work chains once any of them has terminated."""
+    from aiida.orm import FolderData, Int
+
+    process = generate_workchain_qpoints(max_concurrent_qpoints=Int(2))
+    process.ctx.qpoints = {f'qpoint_{index}': generate_kpoints_mesh(1) for index in range(3)}
+    process.ctx.irreps_ranges = {}
+    process.ctx.initialization_folder = FolderData()
+    process.setup_ph_qgrid()
+    process.run_ph_qgrid()
+
+    awaitables = {awaitable.key: awaitable for awaitable in process._awaitables}  # pylint: disable=protected-access
+    finished, running = process.ctx.in_flight
+    assert sorted(awaitables) == sorted(process.ctx.in_flight)
+
+    node = load_context_node(awaitables[finished])
+    node.set_process_state(ProcessState.FINISHED)
+    process._on_awaitable_finished(awaitables[finished])  # pylint: disable=protected-access
+
+    assert not process._awaitables  # pylint: disable=protected-access
+    assert process.ctx.workchains[finished.split('.')[-1]].pk == node.pk
+    assert process.ctx.workchains[running.split('.')[-1]] == awaitables[running].pk
+
+    # The callback of the dropped awaitable is ignored once its work chain terminates
+    process._on_awaitable_finished(awaitables[running])  # pylint: disable=protected-access
+    assert process.ctx.workchains[running.split('.')[-1]] == awaitables[running].pk
+
+
+@pytest.mark.usefixtures('aiida_profile')
+def test_run_ph_qgrid_relaunch(generate_workchain_qpoints, generate_ph_workchain_node, generate_kpoints_mesh):
+    """Test that a failed job is launched again right away while the other work chains are still running."""
+    from aiida.orm import FolderData, Int
+
+    process = generate_workchain_qpoints(max_qpoint_retries=Int(1))
+    process.ctx.qpoints = {f'qpoint_{index}': generate_kpoints_mesh(1) for index in range(3)}
+    process.ctx.irreps_ranges = {}
+    process.ctx.initialization_folder = FolderData()
+    process.setup_ph_qgrid()
+    process.run_ph_qgrid()
+
+    assert not process.ctx.jobs
+    assert len(process.ctx.in_flight) == 3
+
+    failed = get_awaited(process)[0]
+    process.ctx.workchains[failed] = generate_ph_workchain_node(exit_status=300)
+
+    assert process.inspect_qpoints() is None
+    assert [job['key'] for job in process.ctx.jobs] == [failed]
+
+    process.run_ph_qgrid()
+
+    assert not process.ctx.jobs
+    assert sorted(process.ctx.in_flight) == [f'workchains.qpoint_{index}' for index in range(3)]
+    assert process.ctx.submitted[f'workchains.{failed}']['attempt'] == 1
+    assert not any(load_context_node(value).is_terminated for value in process.ctx.workchains.values())
+
+
+@pytest.mark.usefixtures('aiida_profile')
+def test_seed_from_initialization(generate_workchain_qpoints, generate_ph_workchain_node, generate_kpoints_mesh):
+    """Test that the jobs of individual q-points are started from the scratch folder of the initialization run."""
+    from aiida.orm import Bool, Dict, FolderData
+
+    process = generate_workchain_qpoints(seed_from_initialization=Bool(True))
+    process.ctx.qpoints = {'qpoint_2': generate_kpoints_mesh(1), 'batch_1': generate_kpoints_mesh(1)}
+    process.ctx.batches = Dict({'batch_1': [1, 2]})
+    process.ctx.irreps_ranges = {}
+    process.ctx.initialization_folder = FolderData()
+    process.ctx.ph_init = generate_ph_workchain_node(remote_path='/tmp/init')
+    process.setup_ph_qgrid()
+    process.run_ph_qgrid()
+
+    seeded = load_context_node(process.ctx.workchains['qpoint_2'])
+    assert seeded.inputs.ph.parent_folder.uuid == process.ctx.ph_init.outputs.remote_folder.uuid
+    assert seeded.inputs.qpoints.uuid == process.inputs.qpoints.uuid
+    assert seeded.inputs.ph.parameters['INPUTPH'] == {'start_q': 3, 'last_q': 3, 'recover': True}
+
+    batch = load_context_node(process.ctx.workchains['batch_1'])
+    assert batch.inputs.ph.parent_folder.uuid == process.inputs.ph.parent_folder.uuid
+    assert 'start_q' not in batch.inputs.ph.parameters['INPUTPH']
+
+    inputs = {'qpoints': generate_kpoints_mesh(2), 'skip_initialization': Bool(True)}
+    inputs['seed_from_initialization'] = Bool(True)
+    assert 'cannot be used' in PhParallelizeQpointsWorkChain.validate_inputs(inputs, None)
+
+
+@pytest.mark.usefixtures('aiida_profile')
+def test_num_images(generate_workchain_qpoints, generate_ph_workchain_node, generate_kpoints_mesh):
+    """Test that the batches are computed with images and that their dynamical matrices are collected afterwards."""
+    from aiida.orm import Dict, FolderData, Int
+
+    process = generate_workchain_qpoints(num_batches=Int(1), num_images=Int(2))
+    process.ctx.qpoints = {'batch_1': generate_kpoints_mesh(1)}
+    process.ctx.batches = Dict({'batch_1': [1, 2]})
+    process.ctx.irreps_ranges = {}
+    process.ctx.initialization_folder = FolderData()
+    process.setup_ph_qgrid()
+    process.run_ph_qgrid()
+
+    batch = load_context_node(process.ctx.workchains['batch_1'])
+    assert batch.inputs.ph.settings['CMDLINE'] == ['-nimage', '2']
+
+    node = generate_ph_workchain_node(remote_path='/tmp/images')
+    process.ctx.workchains['batch_1'] = node
+
+    assert process.inspect_qpoints() is None
+    assert process.ctx.jobs == [{
+        'key': 'batch_1',
+        'cost': process.ctx.submitted['workchains.batch_1']['cost'],
+        'recover_folder': node.outputs.remote_folder.uuid
+    }]
+    assert not process.ctx.workchains
+
+    process.run_ph_qgrid()
+    collect = load_context_node(process.ctx.workchains['batch_1'])
+    assert collect.inputs.ph.parent_folder.uuid == node.outputs.remote_folder.uuid
+    assert collect.inputs.ph.parameters['INPUTPH']['recover']
+    assert 'settings' not in collect.inputs.ph
+
+    message = PhParallelizeQpointsWorkChain.validate_inputs({'num_images': Int(2)}, None)
+    assert 'requires' in message
+
+
+@pytest.mark.usefixtures('aiida_profile')
+def test_num_batches(generate_workchain_qpoints, generate_ph_workchain_node, generate_initialization_folder):
+    """Test that the q-points are computed in batches and that their dynamical matrices are numbered afterwards."""
+    from aiida.orm import Dict, FolderData, Int, KpointsData
+
+    process = generate_workchain_qpoints(num_batches=Int(2))
+    retrieved = generate_initialization_folder()
+    qpoints = {}
+
+    # The q-points are distributed with labels starting at zero, their patterns files start at one
+    for index, number_of_irreps in enumerate([1, 6, 2, 5, 3]):
+        qpoints[f'qpoint_{index}'] = KpointsData()
+        qpoints[f'qpoint_{index}'].set_cell([[1, 0, 0], [0, 1, 0], [0, 0, 1]])
+        qpoints[f'qpoint_{index}'].set_kpoints([[0.1 * index, 0, 0]])
+        retrieved.base.repository.put_object_from_bytes(
+            PATTERNS.format(number_of_irreps=number_of_irreps).encode(), f'patterns.{index + 1}.xml'
+        )
+
+    process._distribute_qpoints(dict(qpoints), retrieved)  # pylint: disable=protected-access
+
+    # With costs 1, 12, 4, 10 and 6, the first batch gets the q-points with costs 12, 4 and 1, the second 10 and 6
+    assert process.ctx.batches.get_dict() == {'batch_1': [1, 2, 3], 'batch_2': [4, 5]}
+    assert sorted(process.ctx.qpoints) == ['batch_1', 'batch_2']
+
+    process.ctx.initialization_folder = retrieved
+    process.setup_ph_qgrid()
+    process.run_ph_qgrid()
+
+    # Each batch is passed as an explicit list of q-points, which ``ph.x`` computes with ``qplot``
+    for key, indices in process.ctx.batches.get_dict().items():
+        batch = load_context_node(process.ctx.workchains[key])
+        expected = [qpoints[f'qpoint_{index - 1}'].get_kpoints(cartesian=True)[0] for index in indices]
+        assert batch.inputs.qpoints.get_kpoints(cartesian=True).tolist() == numpy.array(expected).tolist()
+        assert 'start_q' not in batch.inputs.ph.parameters['INPUTPH']
+
+        with pytest.raises(AttributeError):
+            batch.inputs.qpoints.get_kpoints_mesh()
+
+    # The dynamical matrix files of a batch are numbered by their place in the batch
+    for key, indices in process.ctx.batches.get_dict().items():
+        folder = FolderData()
+        output_parameters = {'wall_time_seconds': 1., 'number_of_irr_representations_for_each_q': [3] * len(indices)}
+
+        for number, index in enumerate(indices, start=1):
+            folder.base.repository.put_object_from_bytes(f'{index}'.encode(), f'DYN_MAT/dynamical-matrix-{number}')
+            output_parameters[f'dynamical_matrix_{number}'] = {'q_point': [0.1 * index, 0., 0.], 'frequencies': [1.]}
+
+        outputs = {'retrieved': folder, 'output_parameters': Dict(output_parameters)}
+        process.ctx.workchains[key] = generate_ph_workchain_node(outputs=outputs).pk
+
+    process.run_recollect_qpoints()
+
+    repository = process.ctx.merged_retrieved.base.repository
+    assert sorted(repository.list_object_names('DYN_MAT')) == [f'dynamical-matrix-{index}' for index in range(6)]
+
+    for index in range(1, 6):
+        assert repository.get_object_content(f'DYN_MAT/dynamical-matrix-{index}') == f'{index}'
+
+    assert process.ctx.merged_frequencies.get_array('indices').tolist() == [1, 2, 3, 4, 5]
+    assert process.ctx.merged_output_parameters['number_of_qpoints'] == 5
+
+
+@pytest.mark.usefixtures('aiida_profile')
+def test_code_pool(generate_workchain_qpoints, generate_kpoints_mesh, fixture_code):
+    """Test that the jobs are spread over the codes of the `code_pool` by their expected finish time and capacity."""
+    from aiida.common import exceptions
+    from aiida.orm import Computer, Dict, FolderData, InstalledCode, RemoteData, load_computer
+
+    try:
+        computer = load_computer('cluster')
+    except exceptions.NotExistent:
+        computer = Computer('cluster', 'localhost', transport_type='core.local', scheduler_type='core.direct').store()
+
+    local_code = fixture_code('quantumespresso.ph')
+    cluster_code = InstalledCode(computer=computer, filepath_executable='/bin/true').store()
+    cluster_folder = RemoteData(computer=computer, remote_path='/tmp/cluster').store()
+    code_pool = {'local': local_code, 'cluster': cluster_code}
+    settings = {'local': {'capacity': 1}, 'cluster': {'capacity': 2, 'speed': 2., 'options': {'queue_name': 'cluster'}}}
+
+    process = generate_workchain_qpoints(
+        code_pool=code_pool,
+        code_pool_parent_folders={'cluster': cluster_folder},
+        code_pool_settings=Dict(settings),
+    )
+    process.ctx.qpoints = {f'qpoint_{index}': generate_kpoints_mesh(1) for index in range(4)}
+    process.ctx.irreps_ranges = {}
+    process.ctx.initialization_folder = FolderData()
+    process.setup_ph_qgrid()
+    process.run_ph_qgrid()
+
+    # The first two jobs are expected to finish first on the faster code, the third one only fits on the local code
+    codes = {key: process.ctx.submitted[f'workchains.{key}']['code'] for key in process.ctx.workchains}
+    assert sorted(codes.values()) == ['cluster', 'cluster', 'local']
+    assert len(process.ctx.jobs) == 1
+
+    for key, label in codes.items():
+        node = load_context_node(process.ctx.workchains[key])
+        assert node.inputs.ph.code.uuid == process.inputs.code_pool[label].uuid
+
+        if label == 'cluster':
+            assert node.inputs.ph.parent_folder.uuid == cluster_folder.uuid
+        else:
+            assert node.inputs.ph.parent_folder.uuid == process.inputs.ph.parent_folder.uuid
+
+    inputs = {'code_pool': {'cluster': cluster_code}, 'ph': {'parent_folder': process.inputs.ph.parent_folder}}
+    assert 'code_pool_parent_folders' in PhParallelizeQpointsWorkChain.validate_inputs(inputs, None)
+    assert 'capacity' in PhParallelizeQpointsWorkChain.validate_code_pool_settings(Dict({'a': {'capacity': 0}}), None)
+
+
+@pytest.mark.usefixtures('aiida_profile')
+def test_code_pool_options(generate_workchain_qpoints, generate_kpoints_mesh, fixture_code, monkeypatch):
+    """Test that the scheduler options of a code of the `code_pool` override those of the `scheduler_tiers`."""
+    from aiida.common import exceptions
+    from aiida.orm import Computer, Dict, FolderData, InstalledCode, List, RemoteData, load_computer
+
+    try:
+        computer = load_computer('cluster')
+    except exceptions.NotExistent:
+        computer = Computer('cluster', 'localhost', transport_type='core.local', scheduler_type='core.direct').store()
+
+    cluster_code = InstalledCode(computer=computer, filepath_executable='/bin/true').store()
+    cluster_folder = RemoteData(computer=computer, remote_path='/tmp/cluster').store()
+    code_pool = {'local': fixture_code('quantumespresso.ph'), 'cluster': cluster_code}
+    settings = {'local': {'capacity': 1}, 'cluster': {'capacity': 1, 'options': {'queue_name': 'cluster'}}}
+    tiers = [{'queue_name': 'long', 'priority': '10'}]
+
+    process = generate_workchain_qpoints(
+        code_pool=code_pool,
+        code_pool_parent_folders={'cluster': cluster_folder},
+        code_pool_settings=Dict(settings),
+        scheduler_tiers=List(tiers),
+    )
+    process.ctx.qpoints = {f'qpoint_{index}': generate_kpoints_mesh(1) for index in range(2)}
+    process.ctx.irreps_ranges = {}
+    process.ctx.initialization_folder = FolderData()
+    process.setup_ph_qgrid()
+
+    submit = process.submit
+    options = {}
+
+    def submit_spy(process_class, **inputs):
+        node = submit(process_class, **inputs)
+        options[inputs['ph']['code'].uuid] = inputs['ph']['metadata']['options']
+        return node
+
+    monkeypatch.setattr(process, 'submit', submit_spy)
+    process.run_ph_qgrid()
+
+    assert options[cluster_code.uuid]['queue_name'] == 'cluster'
+    assert options[cluster_code.uuid]['priority'] == '10'
+    assert options[code_pool['local'].uuid]['queue_name'] == 'long'
+
+
+@pytest.fixture
+def generate_finished_node(generate_ph_workchain_node):
+    """Generate a successfully finished `WorkflowNode` with the outputs of a single q-point."""
+
+    def _generate_finished_node(frequencies=(100.,)):
+        from aiida.orm import Dict, FolderData
+
+        retrieved = FolderData()
+        retrieved.base.repository.put_object_from_bytes(b'', 'DYN_MAT/dynamical-matrix-')
+        output_parameters = Dict({
+            'wall_time_seconds': 1.,
+            'number_of_irr_representations_for_each_q': [3],
+            'dynamical_matrix_1': {
+                'q_point': [0., 0., 0.],
+                'frequencies': list(frequencies)
+            },
+        })
+        return generate_ph_workchain_node(outputs={'retrieved': retrieved, 'output_parameters': output_parameters})
+
+    return _generate_finished_node
+
+
+@pytest.fixture
+def generate_initialization_folder():
+    """Generate the `FolderData` of an initialization run with the dynamical matrix file that lists the q-points."""
+
+    def _generate_initialization_folder():
+        from aiida.orm import FolderData
+
+        folder = FolderData()
+        folder.base.repository.put_object_from_bytes(b'', 'DYN_MAT/dynamical-matrix-0')
+        return folder
+
+    return _generate_initialization_folder
+
+
+@pytest.mark.usefixtures('aiida_profile')
+def test_instability_threshold(
+    generate_workchain_qpoints, generate_ph_workchain_node, generate_finished_node, generate_initialization_folder
+):
+    """Test that the work chain stops with the finished q-points once one of them is dynamically unstable."""
+    from aiida.orm import Float
+
+    process = generate_workchain_qpoints(instability_threshold=Float(20.))
+    process.ctx.initialization_folder = generate_initialization_folder()
+    process.ctx.stable_qpoints = []
+    process.ctx.in_flight = []
+    process.ctx.jobs = [{'key': 'qpoint_2', 'cost': 1.}]
+    process.ctx.workchains = AttributeDict({
+        'qpoint_0': generate_finished_node([-10., 100.]),
+        'qpoint_1': generate_ph_workchain_node(exit_status=300),
+    })
+
+    # The imaginary frequency of the first q-point is within the threshold, so only the failure is handled
+    result = process.inspect_qpoints()
+    assert result == PhParallelizeQpointsWorkChain.exit_codes.ERROR_QPOINT_WORKCHAIN_FAILED
+    assert process.ctx.stable_qpoints == ['qpoint_0']
+
+    process.ctx.workchains['qpoint_1'] = generate_finished_node([-50., 100.])
+
+    result = process.inspect_qpoints()
+    assert result.status == PhParallelizeQpointsWorkChain.exit_codes.ERROR_DYNAMICALLY_UNSTABLE.status
+    assert not process.ctx.jobs
+    assert process.outputs['output_parameters']['number_of_qpoints'] == 2
+    assert 'dynamical-matrix-2' in process.outputs['retrieved'].base.repository.list_object_names('DYN_MAT')
+
+
+@pytest.mark.usefixtures('aiida_profile')
+def test_instability_threshold_overflow(
+    generate_workchain_qpoints, generate_finished_node, generate_initialization_folder
+):
+    """Test that a frequency printed as asterisks by `ph.x`, which is parsed as `None`, is counted as unstable."""
+    from aiida.orm import Float
+
+    process = generate_workchain_qpoints(instability_threshold=Float(20.))
+    process.ctx.initialization_folder = generate_initialization_folder()
+    process.ctx.stable_qpoints = []
+    process.ctx.in_flight = []
+    process.ctx.jobs = []
+    process.ctx.workchains = AttributeDict({
+        'qpoint_0': generate_finished_node([10., 100.]),
+        'qpoint_1': generate_finished_node([None, 100.]),
+    })
+
+    result = process.inspect_qpoints()
+    assert result.status == PhParallelizeQpointsWorkChain.exit_codes.ERROR_DYNAMICALLY_UNSTABLE.status
+    assert process.ctx.stable_qpoints == ['qpoint_0']
+    assert process.outputs['output_parameters']['number_of_qpoints'] == 2
+
+
+@pytest.mark.usefixtures('aiida_profile')
+def test_instability_threshold_early(
+    generate_workchain_qpoints, generate_finished_node, generate_initialization_folder, generate_kpoints_mesh
+):
+    """Test that an unstable q-point that finishes before the oldest running work chain stops the work chain."""
+    from aiida.orm import Float, Int
+
+    process = generate_workchain_qpoints(max_concurrent_qpoints=Int(2), instability_threshold=Float(20.))
+    process.ctx.qpoints = {f'qpoint_{index}': generate_kpoints_mesh(1) for index in range(3)}
+    process.ctx.irreps_ranges = {}
+    process.ctx.initialization_folder = generate_initialization_folder()
+    process.setup_ph_qgrid()
+    process.ctx.jobs = [{'key': f'qpoint_{index}', 'cost': cost} for index, cost in enumerate([10., 1., 1.])]
+    process.run_ph_qgrid()
+
+    assert get_awaited(process) == ['qpoint_0', 'qpoint_1']
+
+    oldest = load_context_node(process.ctx.workchains['qpoint_0'])
+    process.ctx.workchains['qpoint_1'] = generate_finished_node([-50., 100.])
+
+    result = process.inspect_qpoints()
+    assert result.status == PhParallelizeQpointsWorkChain.exit_codes.ERROR_DYNAMICALLY_UNSTABLE.status
+    assert not oldest.is_terminated
+    assert not process.ctx.jobs
+    assert process.outputs['output_parameters']['number_of_qpoints'] == 1
+
+
+@pytest.mark.usefixtures('aiida_profile')
+def test_merge_chunk_size(generate_workchain_qpoints, generate_finished_node, generate_initialization_folder):
+    """Test that the output parameters are merged incrementally once `merge_chunk_size` work chains have finished."""
+    from aiida.orm import Int
+
+    process = generate_workchain_qpoints(merge_chunk_size=Int(2))
+    process.ctx.initialization_folder = generate_initialization_folder()
+    process.ctx.in_flight = []
+    process.ctx.merged_qpoints = []
+    process.ctx.workchains = AttributeDict({'qpoint_0': generate_finished_node()})
+
+    assert process.inspect_qpoints() is None
+    assert 'merged_output_parameters' not in process.ctx
+
+    process.ctx.workchains['qpoint_1'] = generate_finished_node()
+    assert process.inspect_qpoints() is None
+    assert process.ctx.merged_qpoints == ['qpoint_0', 'qpoint_1']
+    assert load_node(process.ctx.partial_outputs[0][0])['number_of_qpoints'] == 2
+
+    process.ctx.workchains['qpoint_2'] = generate_finished_node()
+    assert process.inspect_qpoints() is None
+    assert process.ctx.merged_qpoints == ['qpoint_0', 'qpoint_1']
+
+    process.ctx.workchains['qpoint_3'] = generate_finished_node()
+    assert process.inspect_qpoints() is None
+    assert process.ctx.merged_qpoints == ['qpoint_0', 'qpoint_1', 'qpoint_2', 'qpoint_3']
+
+    # Every partial merge only contains its own chunk, the partial merges are only combined at the end
+    partial = load_node(process.ctx.partial_outputs[1][0])
+    assert partial['number_of_qpoints'] == 2
+    assert sorted(partial.creator.base.links.get_incoming().all_link_labels()) == ['output_3', 'output_4']
+
+    process.ctx.workchains['qpoint_4'] = generate_finished_node()
+    assert process.inspect_qpoints() is None
+
+    process.run_recollect_qpoints()
+    merged = process.ctx.merged_output_parameters
+    labels = ['merged_1', 'merged_2', 'merged_frequencies_1', 'merged_frequencies_2', 'output_5']
+    assert merged['number_of_qpoints'] == 5
+    assert merged['number_of_irr_representations_for_each_q'] == [3] * 5
+    assert sorted(merged.creator.base.links.get_incoming().all_link_labels()) == labels
+    assert process.ctx.merged_frequencies.get_array('indices').tolist() == [1, 2, 3, 4, 5]
+
+
+@pytest.mark.usefixtures('aiida_profile')
+def test_reduction_chunk_size(generate_workchain_qpoints, generate_finished_node, generate_initialization_folder):
+    """Test that with `reduction_chunk_size` the outputs are merged in a tree of calls with bounded input links."""
+    from aiida.orm import Int
+
+    workchains = AttributeDict({f'qpoint_{index}': generate_finished_node([10. * index]) for index in range(5)})
+    results = []
+
+    for kwargs in ({}, {'reduction_chunk_size': Int(4)}):
+        process = generate_workchain_qpoints(**kwargs)
+        process.ctx.initialization_folder = generate_initialization_folder()
+        process.ctx.workchains = workchains
+        process.run_recollect_qpoints()
+        results.append(process.ctx)
+
+    reference, merged = results
+    retrieved = merged.merged_retrieved
+    incoming = retrieved.creator.base.links.get_incoming()
+    partial = incoming.get_node_by_label('merged_1')
+    filenames = retrieved.base.repository.list_object_names('DYN_MAT')
+
+    # The six folders are collected in calls with four and two folders, whose outputs are collected in the final call
+    assert sorted(incoming.all_link_labels()) == ['merged_1', 'merged_2']
+    assert len(partial.creator.base.links.get_incoming().all()) == 4
+    assert sorted(filenames) == [f'dynamical-matrix-{index}' for index in range(6)]
+    assert merged.merged_output_parameters.get_dict() == reference.merged_output_parameters.get_dict()
+    assert merged.merged_frequencies.get_array('frequencies').tolist() == [[0.], [10.], [20.], [30.], [40.]]
+
+    # The five outputs are merged in two calls, whose outputs count as two input links each in the final call
+    final = merged.merged_output_parameters.creator.base.links.get_incoming()
+    assert sorted(final.all_link_labels()) == ['merged_1', 'merged_2', 'merged_frequencies_1', 'merged_frequencies_2']
+    assert len(final.get_node_by_label('merged_1').creator.base.links.get_incoming().all()) == 4
+
+    assert PhParallelizeQpointsWorkChain.validate_reduction_chunk_size(Int(3), None) is not None
+    assert PhParallelizeQpointsWorkChain.validate_reduction_chunk_size(Int(4), None) is None
+
+
+@pytest.mark.usefixtures('aiida_profile')
+def test_restart_from(generate_workchain_qpoints, generate_ph_workchain_node, generate_inputs_ph):
+    """Test that the successfully finished child work chains of the `restart_from` work chain are reused."""
+    from aiida.orm import Dict, FolderData, KpointsData, Log, WorkChainNode
+
+    process_type = PhParallelizeQpointsWorkChain.build_process_type()
+    oldest = WorkChainNode(process_type=process_type).store()
+    previous = WorkChainNode(process_type=process_type).store()
+    previous.base.extras.set('restart_from', oldest.uuid)
+
+    qpoints = {}
+    for index in range(3):
+        qpoints[f'qpoint_{index}'] = KpointsData()
+        qpoints[f'qpoint_{index}'].set_cell([[1, 0, 0], [0, 1, 0], [0, 0, 1]])
+        qpoints[f'qpoint_{index}'].set_kpoints([[0.1 * index, 0, 0]])
+
+    parameters = generate_inputs_ph()['parameters']
+    other_parameters = Dict({'INPUTPH': {'tr2_ph': 1.0e-10}})
+
+    # Only the first q-point finished successfully with the same q-point and parameters, in the oldest work chain
+    for key, qpoint, exit_status, ph_parameters, caller in (
+        ('qpoint_0', qpoints['qpoint_0'], 0, parameters, oldest),
+        ('qpoint_1', qpoints['qpoint_1'], 300, parameters, previous),
+        ('qpoint_2', qpoints['qpoint_2'], 0, other_parameters, previous),
+    ):
+        inputs = {'qpoints': qpoint, 'ph__parameters': ph_parameters}
+        generate_ph_workchain_node(exit_status, inputs=inputs, caller=caller, call_link_label=key)
+
+    process = generate_workchain_qpoints(restart_from=previous)
+    process.setup()
+
+    assert process.ctx.restart_lineage == [previous.uuid, oldest.uuid]
+    assert process.node.base.extras.get('restart_from') == previous.uuid
+    assert any(f'<{previous.pk}>, <{oldest.pk}>' in log.message for log in Log.collection.get_logs_for(process.node))
+
+    process.ctx.qpoints = qpoints
+    process.ctx.irreps_ranges = {}
+    process.ctx.initialization_folder = FolderData()
+    process.setup_ph_qgrid()
+
+    assert list(process.ctx.workchains) == ['qpoint_0']
+    assert sorted(job['key'] for job in process.ctx.jobs) == ['qpoint_1', 'qpoint_2']
+
+    # The initialization run is only reused if it ran with the same parameters
+    init_parameters = Dict(process._get_init_parameters())  # pylint: disable=protected-access
+    for ph_parameters in (other_parameters, init_parameters):
+        inputs = {'qpoints': process.inputs.qpoints, 'ph__parameters': ph_parameters}
+        init = generate_ph_workchain_node(inputs=inputs, caller=previous, call_link_label='phonon_initialization')
+
+        process = generate_workchain_qpoints(restart_from=previous)
+        process.setup()
+        process.run_ph_init()
+        assert (process.ctx.ph_init.pk == init.pk) == (ph_parameters is init_parameters)
+
+    assert PhParallelizeQpointsWorkChain.validate_restart_from(previous, None) is None
+    assert 'should be a' in PhParallelizeQpointsWorkChain.validate_restart_from(WorkChainNode(), None)
+
+
+def test_validate_scheduler_tiers():
+    """Test `PhParallelizeQpointsWorkChain.validate_scheduler_tiers`."""
+    from aiida.orm import List
+
+    assert PhParallelizeQpointsWorkChain.validate_scheduler_tiers(List([{'queue_name': 'debug'}]), None) is None
+    assert PhParallelizeQpointsWorkChain.validate_scheduler_tiers(List([]), None) is not None
+    assert PhParallelizeQpointsWorkChain.validate_scheduler_tiers(List([{'resources': {}}]), None) is not None
+
+
+@pytest.mark.usefixtures('aiida_profile')
+def test_validate_inputs(generate_workchain_qpoints, generate_kpoints_mesh):
+    """Test `PhParallelizeQpointsWorkChain.validate_inputs`."""
+    from aiida.orm import Bool, KpointsData
+
+    qpoints = KpointsData()
+    qpoints.set_kpoints([[0., 0., 0.]])
+    message = PhParallelizeQpointsWorkChain.validate_inputs({
+        'skip_initialization': Bool(True),
+        'qpoints': qpoints
+    }, None)
+    assert 'mesh' in message
+
+    qpoints = generate_kpoints_mesh(2)
+    assert PhParallelizeQpointsWorkChain.validate_inputs({
+        'skip_initialization': Bool(True),
+        'qpoints': qpoints
+    }, None) is None
+
+
+@pytest.mark.usefixtures('aiida_profile')
+def test_verify_qpoints(generate_workchain_qpoints, generate_ph_workchain_node):
+    """Test `PhParallelizeQpointsWorkChain.verify_qpoints`."""
+    from aiida.common import LinkType
+    from aiida.orm import FolderData
+
+    dynmat_file = 'DYN_MAT/dynamical-matrix-0'
+    process = generate_workchain_qpoints()
+    process.ctx.ph_init = generate_ph_workchain_node()
+
+    retrieved = FolderData()
+    retrieved.base.repository.put_object_from_bytes(b'   2   2   2\n   2\n 0. 0. 0.\n 0.5 0.5 0.5\n', dynmat_file)
+    retrieved.store().base.links.add_incoming(process.ctx.ph_init, link_type=LinkType.RETURN, link_label='retrieved')
+
+    process.ctx.initialization_folder = FolderData()
+    process.ctx.initialization_folder.base.repository.put_object_from_bytes(
+        b'   2   2   2\n   2\n 0. 0. 0.\n -0.5 0.5 0.5\n', dynmat_file
+    )
+    assert process.verify_qpoints() == PhParallelizeQpointsWorkChain.exit_codes.ERROR_QPOINTS_MISMATCH
+
+    process.ctx.initialization_folder = retrieved
+    assert process.verify_qpoints() is None
@@ -47,3 +47,59 @@ def test_options(fixture_code):
     builder = PhWorkChain.get_builder_from_protocol(code, options=options)
 
     assert builder.ph.metadata['options']['queue_name'] == queue_name  # pylint: disable=no-member
+
+
+def test_cost_model(fixture_code, generate_calc_job_node, generate_inputs_pw, monkeypatch):
+    """Test that ``PhWorkChain.get_builder_from_protocol`` uses the cost model to choose the mode and wall time."""
+    from aiida.common import LinkType
+    from aiida.orm import Dict
+    import numpy
+
+    from aiida_quantumespresso_ph.workflows.ph import main
+
+    code = fixture_code('quantumespresso.ph')
+    parent = generate_calc_job_node('quantumespresso.pw', inputs=generate_inputs_pw())
+    output_parameters = Dict({'number_of_k_points': 10})
+    output_parameters.base.links.add_incoming(parent, LinkType.CREATE, 'output_parameters')
+    output_parameters.store()
+
+    # A model with a constant wall time of 100 seconds per q-point, there are 27 q-points without symmetries
+    model = {'coefficients': [numpy.log(100.), 0, 0, 0, 0]}
+    monkeypatch.setattr(main, 'get_cost_model', lambda: model)
+    overrides = {'qpoints_distance': 2.0}
+
+    kwargs = {'parent_folder': parent.outputs.remote_folder, 'overrides': overrides}
+
+    # The cost model is only used on request, since it queries the database and writes to the configuration folder
+    builder = PhWorkChain.get_builder_from_protocol(code, **kwargs)
+    assert not builder.parallelize_qpoints.value
+    assert builder.ph.metadata.options.max_wallclock_seconds == 43200  # pylint: disable=no-member
+
+    builder = PhWorkChain.get_builder_from_protocol(code, use_cost_model=True, **kwargs)
+    assert not builder.parallelize_qpoints.value
+    assert builder.ph.metadata.options.max_wallclock_seconds == 5400  # pylint: disable=no-member
+
+    model['coefficients'][0] = numpy.log(1000.)
+    builder = PhWorkChain.get_builder_from_protocol(code, use_cost_model=True, **kwargs)
+    assert builder.parallelize_qpoints.value
+    assert builder.ph.metadata.options.max_wallclock_seconds == 2000  # pylint: disable=no-member
+
+    overrides['parallelize_qpoints'] = False
+    builder = PhWorkChain.get_builder_from_protocol(code, use_cost_model=True, **kwargs)
+    assert not builder.parallelize_qpoints.value
+    assert builder.ph.metadata.options.max_wallclock_seconds == 43200  # pylint: disable=no-member
+
+    # With `auto`, the model is passed to the work chain, which selects the mode with the same wall time for both
+    overrides['parallelize_qpoints'] = 'auto'
+    builder = PhWorkChain.get_builder_from_protocol(code, use_cost_model=True, **kwargs)
+    assert builder.cost_model.get_dict() == model
+    assert builder.ph.metadata.options.max_wallclock_seconds == 43200  # pylint: disable=no-member
+
+    # Without `max_wallclock_seconds`, the mode is kept and the wall time is set from the prediction only
+    overrides.pop('parallelize_qpoints')
+    builder = PhWorkChain.get_builder_from_protocol(code, **kwargs)
+    del builder.ph.metadata.options['max_wallclock_seconds']  # pylint: disable=no-member
+    set_inputs_from_cost_model = PhWorkChain._set_inputs_from_cost_model  # pylint: disable=protected-access
+    set_inputs_from_cost_model(builder, model, kwargs['parent_folder'], overrides, {})
+    assert not builder.parallelize_qpoints.value
+    assert builder.ph.metadata.options.max_wallclock_seconds == 54000  # pylint: disable=no-member
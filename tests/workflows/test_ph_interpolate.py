@@ -0,0 +1,287 @@
+# -*- coding: utf-8 -*-
+"""Tests for the ``PhInterpolateWorkChain`` class."""
+from aiida import orm
+from aiida.common import LinkType
+from aiida.engine import run_get_node
+import numpy
+from plumpy import ProcessState
+import pytest
+
+from aiida_quantumespresso_ph.workflows.ph_interpolate import PhInterpolateWorkChain
+
+
+def simple_cubic(qpoint):
+    """Return the dynamical matrix of a simple cubic crystal with springs between nearest neighbours."""
+    return numpy.diag(0.1 * (2 - 2 * numpy.cos(2 * numpy.pi * qpoint))).astype(complex)
+
+
+@pytest.fixture
+def generate_inputs_matdyn(fixture_code, generate_force_constants):
+    """Return the inputs of a ``PhInterpolateWorkChain`` in the ``qe`` mode and the force constants."""
+
+    def _generate_inputs_matdyn():
+        kpoints_dispersion = orm.KpointsData()
+        kpoints_dispersion.set_kpoints([[0., 0., 0.], [.5, 0., 0.]])
+        kpoints_dos = orm.KpointsData()
+        kpoints_dos.set_kpoints_mesh([4, 4, 4])
+        parameters = orm.Dict({'INPUT': {'asr': 'simple'}})
+        options = {'resources': {'num_machines': 1}, 'append_text': 'echo done'}
+
+        inputs = {
+            'dynmat_folder': orm.FolderData(),
+            'kpoints_dispersion': kpoints_dispersion,
+            'kpoints_dos': kpoints_dos,
+            'q2r': {
+                'q2r': {
+                    'code': fixture_code('quantumespresso.q2r')
+                }
+            },
+            'matdyn': {
+                'matdyn': {
+                    'code': fixture_code('quantumespresso.matdyn'),
+                    'parameters': parameters,
+                    'metadata': {
+                        'options': options
+                    },
+                }
+            },
+        }
+        return inputs, generate_force_constants()
+
+    return _generate_inputs_matdyn
+
+
+def generate_finished_workflow_node(outputs):
+    """Return a stored ``WorkflowNode`` that finished successfully with the given outputs."""
+    node = orm.WorkflowNode().store()
+    node.set_process_state(ProcessState.FINISHED)
+    node.set_exit_status(0)
+
+    for link_label, output in outputs.items():
+        output.store().base.links.add_incoming(node, link_type=LinkType.RETURN, link_label=link_label)
+
+    return node
+
+
+@pytest.mark.usefixtures('aiida_profile')
+def test_run_matdyn(generate_workchain, generate_inputs_matdyn, monkeypatch):
+    """Test that ``run_matdyn`` submits the work chains of the dispersion and of the DOS in the same step."""
+    inputs, force_constants = generate_inputs_matdyn()
+    process = generate_workchain('quantumespresso.ph_interpolate', inputs)
+    process.ctx.force_constants = force_constants.store()
+    submitted = []
+    monkeypatch.setattr(process, 'submit', lambda _, **kwargs: submitted.append(kwargs) or orm.WorkflowNode().store())
+
+    awaitables = process.run_matdyn()
+
+    assert set(awaitables) == {'workflow_matdyn', 'workflow_matdyn_dos'}
+    assert [inputs['matdyn']['parameters']['INPUT']['dos'] for inputs in submitted] == [False, True]
+    assert submitted[1]['matdyn']['kpoints'] == inputs['kpoints_dos']
+    assert submitted[1]['matdyn']['metadata']['options']['append_text'] == 'echo done'
+
+
+@pytest.mark.usefixtures('aiida_profile')
+def test_fuse_matdyn(generate_workchain, generate_inputs_matdyn, monkeypatch):
+    """Test that with ``fuse_matdyn`` the DOS is computed in the job script of the dispersion and parsed."""
+    inputs, force_constants = generate_inputs_matdyn()
+    inputs['fuse_matdyn'] = orm.Bool(True)
+    inputs['matdyn']['matdyn']['settings'] = orm.Dict({'cmdline': ['-nk', '1']})
+    inputs['matdyn']['matdyn']['metadata']['options']['mpirun_extra_params'] = ['--bind-to', 'core']
+    process = generate_workchain('quantumespresso.ph_interpolate', inputs)
+    process.ctx.force_constants = force_constants.store()
+    submitted = []
+    monkeypatch.setattr(process, 'submit', lambda _, **kwargs: submitted.append(kwargs) or orm.WorkflowNode().store())
+
+    awaitables = process.run_matdyn()
+
+    assert set(awaitables) == {'workflow_matdyn'}
+
+    # The user's append text is kept and the DOS is run with the MPI launcher and command line of the dispersion
+    append_text = submitted[0]['matdyn']['metadata']['options']['append_text']
+    command = "'mpirun' '-np' '1' '--bind-to' 'core' '/bin/true' '-nk' '1' -in 'dos_aiida.in' > 'dos_aiida.out'"
+    assert append_text.startswith('echo done\n')
+    assert "fldos = 'phonon_dos.dat'" in append_text
+    assert "flfrc = 'real_space_force_constants.dat'" in append_text
+    assert 'nk1 = 4' in append_text
+    assert append_text.endswith(f'\n{command}')
+
+    retrieved = orm.FolderData()
+    retrieved.base.repository.put_object_from_bytes(b'0.0 0.5\n1.0 1.5\n', 'phonon_dos.dat')
+    process.ctx.workflow_matdyn = generate_finished_workflow_node({
+        'output_parameters': orm.Dict(),
+        'output_phonon_bands': orm.BandsData(),
+        'retrieved': retrieved,
+    })
+
+    assert process.results() is None
+    assert process.outputs['output_phonon_dos'].get_y()[0][1].tolist() == [0.5, 1.5]
+
+    process.ctx.workflow_matdyn = generate_finished_workflow_node({
+        'output_parameters': orm.Dict(),
+        'output_phonon_bands': orm.BandsData(),
+        'retrieved': orm.FolderData(),
+    })
+
+    assert process.results() == PhInterpolateWorkChain.exit_codes.ERROR_MATDYN_DOS_FAILED  # pylint: disable=no-member
+
+
+@pytest.mark.usefixtures('aiida_profile')
+def test_num_chunks(generate_workchain, generate_inputs_matdyn, monkeypatch):
+    """Test that with ``num_chunks`` the k-points are computed in chunks whose frequencies are merged."""
+    inputs, force_constants = generate_inputs_matdyn()
+    inputs['num_chunks'] = orm.Int(2)
+
+    # The tetrahedron method of the DOS cannot be split over chunks
+    with pytest.raises(ValueError, match='requires a `degauss`'):
+        generate_workchain('quantumespresso.ph_interpolate', inputs)
+
+    inputs['matdyn']['matdyn']['parameters'] = orm.Dict({'INPUT': {'asr': 'simple', 'degauss': 5.0}})
+    process = generate_workchain('quantumespresso.ph_interpolate', inputs)
+    process.ctx.force_constants = force_constants.store()
+    submitted = {}
+
+    def submit(_, **kwargs):
+        submitted[kwargs['metadata']['call_link_label']] = kwargs
+        return orm.WorkflowNode().store()
+
+    monkeypatch.setattr(process, 'submit', submit)
+
+    assert process.run_matdyn() is None
+    assert sorted(submitted) == ['dispersion_1', 'dispersion_2', 'dos_1', 'dos_2']
+    assert len(submitted['dos_1']['matdyn']['kpoints'].get_kpoints()) == 32
+    assert not submitted['dos_1']['matdyn']['parameters']['INPUT']['dos']
+
+    # The second chunk of the dispersion starts with the Gamma point of the first, which is dropped when merging
+    assert submitted['dispersion_2']['matdyn']['kpoints'].get_kpoints().tolist() == [[0., 0., 0.], [.5, 0., 0.]]
+
+    chunks = {}
+
+    for key, value in submitted.items():
+        bands = orm.BandsData()
+        bands.set_kpoints(value['matdyn']['kpoints'].get_kpoints())
+        bands.set_bands(numpy.ones((len(value['matdyn']['kpoints'].get_kpoints()), 3)), units='THz')
+        outputs = {'output_parameters': orm.Dict({'wall_time_seconds': 1.}), 'output_phonon_bands': bands}
+        chunks[key] = generate_finished_workflow_node(outputs)
+
+    process.ctx.matdyn_chunks = chunks
+
+    assert process.results() is None
+    assert process.outputs['output_phonon_bands'].get_bands().shape == (2, 3)
+    assert process.outputs['output_parameters']['number_of_kpoints'] == 2
+    assert process.outputs['output_parameters']['wall_time_seconds'] == 4.
+    assert 'output_phonon_dos' in process.outputs
+
+    inputs['fuse_matdyn'] = orm.Bool(True)
+
+    with pytest.raises(ValueError, match='cannot be specified at the same time'):
+        generate_workchain('quantumespresso.ph_interpolate', inputs)
+
+
+@pytest.mark.usefixtures('aiida_profile')
+def test_force_constants_cache(generate_workchain, generate_inputs_matdyn):
+    """Test that the force constants of ``q2r.x`` are reused for dynamical matrix files with the same content."""
+
+    def generate_inputs():
+        inputs, force_constants = generate_inputs_matdyn()
+        inputs['dynmat_folder'] = orm.FolderData()
+        inputs['dynmat_folder'].base.repository.put_object_from_bytes(b'content', 'DYN_MAT/dynamical-matrix-1')
+        inputs['use_force_constants_cache'] = orm.Bool(True)
+        return inputs, force_constants
+
+    inputs, force_constants = generate_inputs()
+    process = generate_workchain('quantumespresso.ph_interpolate', inputs)
+    process.get_cached_force_constants()
+
+    assert process.should_run_q2r()
+
+    process.ctx.workflow_q2r = generate_finished_workflow_node({'force_constants': force_constants})
+    process.inspect_q2r()
+
+    process = generate_workchain('quantumespresso.ph_interpolate', generate_inputs()[0])
+    process.get_cached_force_constants()
+
+    assert not process.should_run_q2r()
+    assert process.ctx.force_constants.pk == force_constants.pk
+
+    inputs = generate_inputs()[0]
+    inputs['q2r']['q2r']['parameters'] = orm.Dict({'INPUT': {'zasr': 'crystal'}})
+    process = generate_workchain('quantumespresso.ph_interpolate', inputs)
+    process.get_cached_force_constants()
+
+    assert process.should_run_q2r()
+
+    # The cache is only used if it is enabled explicitly
+    inputs = generate_inputs()[0]
+    inputs.pop('use_force_constants_cache')
+    process = generate_workchain('quantumespresso.ph_interpolate', inputs)
+    process.get_cached_force_constants()
+
+    assert process.should_run_q2r()
+
+
+@pytest.mark.usefixtures('aiida_profile')
+def test_mode_python(generate_dynamical_matrix_data):
+    """Test that the ``python`` mode computes the dispersion and the density of states without any ``CalcJob``."""
+    kpoints_dispersion = orm.KpointsData()
+    kpoints_dispersion.set_cell([[10., 0., 0.], [0., 10., 0.], [0., 0., 10.]])
+    kpoints_dispersion.set_kpoints([[0., 0., 0.], [.25, 0., 0.], [.5, 0., 0.]])
+    kpoints_dos = orm.KpointsData()
+    kpoints_dos.set_kpoints_mesh([4, 4, 4])
+
+    parameters = orm.Dict({'INPUT': {'asr': 'simple', 'deltaE': 2.0, 'degauss': 4.0}})
+    inputs = {
+        'mode': orm.Str('python'),
+        'dynamical_matrices': generate_dynamical_matrix_data([2, 2, 2], [[0., 0., 0.]], simple_cubic).store(),
+        'kpoints_dispersion': kpoints_dispersion,
+        'kpoints_dos': kpoints_dos,
+        'matdyn': {
+            'matdyn': {
+                'parameters': parameters
+            }
+        },
+    }
+    results, node = run_get_node(PhInterpolateWorkChain, **inputs)
+
+    assert node.is_finished_ok
+    assert results['output_parameters']['asr'] == 'simple'
+    assert results['output_phonon_bands'].get_bands().shape == (3, 3)
+    assert results['output_phonon_bands'].get_bands()[0] == pytest.approx(numpy.zeros(3), abs=1e-6)
+    assert results['output_phonon_dos'].get_x()[1][1] - results['output_phonon_dos'].get_x()[1][0] == 2.0
+    assert not [child for child in node.called_descendants if isinstance(child, orm.CalcJobNode)]
+
+
+@pytest.mark.usefixtures('aiida_profile')
+def test_validate_inputs(generate_dynamical_matrix_data, fixture_localhost):
+    """Test the validation of the inputs of the ``qe`` and ``python`` modes."""
+    kpoints = orm.KpointsData()
+    kpoints.set_kpoints([[0., 0., 0.]])
+    builder = PhInterpolateWorkChain.get_builder()
+    builder.kpoints_dispersion = kpoints
+    builder.dos = orm.Bool(False)
+
+    with pytest.raises(ValueError, match='are required if the `mode` is `qe`'):
+        run_get_node(builder)
+
+    builder.mode = orm.Str('python')
+    builder.dynmat_folder = orm.RemoteData(computer=fixture_localhost, remote_path='/tmp')
+
+    with pytest.raises(ValueError, match='is required if the `mode` is `python`'):
+        run_get_node(builder)
+
+    builder.dynamical_matrices = generate_dynamical_matrix_data([1, 1, 1], [[0., 0., 0.]], simple_cubic).store()
+    builder.matdyn.matdyn.parameters = orm.Dict({'INPUT': {'asr': 'crystal'}})
+
+    with pytest.raises(ValueError, match='acoustic sum rule `crystal` is not supported'):
+        run_get_node(builder)
+
+    builder.dos = orm.Bool(True)
+    builder.matdyn.matdyn.parameters = orm.Dict({'INPUT': {'asr': 'simple'}})
+
+    with pytest.raises(ValueError, match='requires a `degauss` larger than zero'):
+        run_get_node(builder)
+
+    builder.dos = orm.Bool(False)
+
+    del builder.matdyn
+    _, node = run_get_node(builder)
+    assert node.process_state == ProcessState.FINISHED